@@ -0,0 +1,106 @@
+"""
+Checkpoint write and restore speed.
+
+    PYTHONPATH=src python benchmarks/bench_checkpoints.py
+    PYTHONPATH=src python benchmarks/bench_checkpoints.py --sessions 1000 --batch 1,64,256
+
+Records real negotiations (FakeOpenAI, procedural maps) once, then for each
+batch size writes their records out to `--sessions` sessions in a fresh sqlite
+file and reports records/s and commits. Restore is measured on the result:
+one scan for every session (`load_many`), one `load` per session (what each
+resumed chat does) and full resumes through the engine, which replay every
+stage to a NullSink without calling the model.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from checkpoints import CheckpointStore
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+
+# Rejected maps and renders are logged as warnings by the agents; expected here, not part of the report
+logging.getLogger("agents").setLevel(logging.ERROR)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def record_sources(n):
+    store = CheckpointStore()
+    engine = build_engine(client=LLMClient(FakeOpenAI(), base_delay=0.001), stream=False, checkpoints=store)
+
+    async def run_all():
+        await asyncio.gather(*(engine.run(session_id=f"src{i}", city_mode="procedural", seed=i) for i in range(n)))
+    asyncio.run(run_all())
+    return list(store.load_many().values())
+
+
+def write(path, sources, sessions, batch):
+    store = CheckpointStore(path, batch_size=batch)
+    start = time.perf_counter()
+    for i in range(sessions):
+        source, session_id = sources[i % len(sources)], f"s{i:05}"
+        store.append(session_id, "city", source.city)
+        for record in source.stages:
+            store.append(session_id, record["stage"], {k: v for k, v in record.items() if k not in ("stage", "created")})
+        store.append(session_id, "done", source.done)
+    store.close()
+    elapsed = time.perf_counter() - start
+    return store.writes / elapsed, store.flushes
+
+
+def restore(path, sessions):
+    store = CheckpointStore(path)
+    start = time.perf_counter()
+    store.load_many()
+    scan_s = time.perf_counter() - start
+
+    loads = []
+    for i in range(sessions):
+        start = time.perf_counter()
+        store.load(f"s{i:05}")
+        loads.append(time.perf_counter() - start)
+
+    fake = FakeOpenAI()
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False, checkpoints=store)
+    start = time.perf_counter()
+    for i in range(sessions):
+        asyncio.run(engine.run(session_id=f"s{i:05}", resume=True))
+    resume_s = time.perf_counter() - start
+    store.close()
+    assert not fake.calls, f"resumed sessions called the model: {fake.calls}"
+    return scan_s, loads, resume_s
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--batch", default="1,64,256", help="batch sizes to write with")
+    parser.add_argument("--sources", type=int, default=20, help="real negotiations to copy the records from")
+    args = parser.parse_args()
+
+    sources = record_sources(args.sources)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"writing {args.sessions} sessions:")
+        for batch in (int(x) for x in args.batch.split(",")):
+            path = os.path.join(tmp, f"batch{batch}.sqlite")
+            rate, flushes = write(path, sources, args.sessions, batch)
+            print(f"  batch {batch:>4}: {rate:>9,.0f} records/s, {flushes} commits, "
+                  f"{os.path.getsize(path) / args.sessions:,.0f} bytes/session")
+
+        scan_s, loads, resume_s = restore(path, args.sessions)
+        print(f"\nrestoring {args.sessions} sessions:")
+        print(f"  load_many       {scan_s * 1000:>8.1f}ms ({args.sessions / scan_s:,.0f} sessions/s)")
+        print(f"  load each       p50 {percentile(loads, 0.5) * 1e6:.0f}us  p95 {percentile(loads, 0.95) * 1e6:.0f}us")
+        print(f"  engine resume   {resume_s:>8.2f}s ({args.sessions / resume_s:,.0f} sessions/s, no LLM calls)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Procedural city generator throughput.
+
+    PYTHONPATH=src python benchmarks/bench_city_generator.py
+    PYTHONPATH=src python benchmarks/bench_city_generator.py --sizes 10x20,100x200 --seconds 2
+
+Reports generated maps/second and the share of maps passing validate_city
+(validation time is reported separately, not included in the rate).
+"""
+import argparse
+import time
+
+from city_generator import generate_city, validate_city
+
+
+def bench(rows, cols, seconds, max_maps):
+    grids, start = [], time.perf_counter()
+    seed = 0
+    while time.perf_counter() - start < seconds and seed < max_maps:
+        grids.append(generate_city(rows, cols, seed)["grid"])
+        seed += 1
+    gen_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    valid = sum(not validate_city(g, rows, cols) for g in grids)
+    val_elapsed = time.perf_counter() - start
+    return len(grids), gen_elapsed, valid, val_elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10x20,100x200,1000x2000")
+    parser.add_argument("--seconds", type=float, default=3.0, help="time budget per size")
+    parser.add_argument("--max-maps", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'maps':>6} {'maps/s':>10} {'valid':>7} {'validate/map':>13}")
+    for size in args.sizes.split(","):
+        rows, cols = (int(x) for x in size.split("x"))
+        n, gen, valid, val = bench(rows, cols, args.seconds, args.max_maps)
+        print(f"{size:>10} {n:>6} {n / gen:>10.1f} {valid / n:>7.0%} {val / n * 1000:>11.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
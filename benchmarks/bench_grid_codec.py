@@ -0,0 +1,119 @@
+"""
+Tokens per payload and proposal accuracy for each grid codec.
+
+    PYTHONPATH=src python benchmarks/bench_grid_codec.py
+    PYTHONPATH=src python benchmarks/bench_grid_codec.py --sizes 10x20,100x200 --rounds 8 --out codecs.json
+    PYTHONPATH=src python benchmarks/bench_grid_codec.py --live --model gpt-4o-mini   # needs OPENAI_API_KEY
+
+Offline, each codec is scored on the base map message (sent once per request,
+identical every round), the per-round proposal payload, and the total grid
+tokens of `--rounds` reasoning calls. That total is compared with the legacy
+payload, which sent the grid twice as JSON in every call. Round trips
+(decode(encode(grid)) == grid) are checked too. Tokens are counted with
+`--model`'s tiktoken encoding when tiktoken is installed, else estimated at
+~4 characters per token (the report says which). The codec that codec_for()
+picks for each of `--models` is printed at the end.
+
+With --live, the render agent runs once per codec on the reasoning corpus over
+the example city. It reports the share of replies that were valid as returned
+(no repair, no re-ask) and the mean cell overlap with the local placement engine.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from city_generator import generate_city
+from grid_codec import CODECS, base_map_message, get_codec, measured_codec, token_counter
+from placement import LocalPlacementEngine
+from utils import apply_cells_as_new_houses
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def overlap(a, b):
+    a, b = {tuple(x) for x in a}, {tuple(x) for x in b}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def measure(grid, proposal_grid, rounds, count_tokens):
+    legacy = rounds * count_tokens(json.dumps({"grid": proposal_grid, "proposal_grid": proposal_grid}))
+    rows = {}
+    for name in CODECS:
+        codec = get_codec(name)
+        base = count_tokens(base_map_message(codec, grid)["content"])
+        proposal_payload = codec.encode_proposal(grid, proposal_grid)
+        proposal = count_tokens(json.dumps({"proposal_grid": proposal_payload}))
+        round_trip = (codec.decode(codec.encode(grid)) == grid
+                      and codec.decode_proposal(grid, proposal_payload) == proposal_grid)
+        rows[name] = {"base_tokens": base, "proposal_tokens": proposal,
+                      "total_tokens": rounds * (base + proposal), "round_trip": round_trip}
+    return legacy, rows
+
+
+async def live_accuracy(model, grid, texts):
+    from agents.render_proposal_agent import RenderProposalAgent
+    engine = LocalPlacementEngine()
+    results = {}
+    for name in CODECS:
+        agent = RenderProposalAgent(model=model, codec=get_codec(name), max_reasks=0)
+        valid, overlaps = 0, []
+        for text in texts:
+            proposal = await agent.render_proposal(grid, text)
+            valid += proposal.source == "llm"
+            overlaps.append(overlap(proposal.cells, engine.propose(grid, text, allow_ambiguous=True) or []))
+        results[name] = {"valid_as_returned": valid / len(texts), "overlap_with_local": sum(overlaps) / len(overlaps)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10x20,50x100,100x200")
+    parser.add_argument("--rounds", type=int, default=8, help="reasoning calls per negotiation")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--live", action="store_true", help="also measure proposal accuracy with the model")
+    parser.add_argument("--model", default="gpt-4o-mini", help="tokenizer for the counts, and model for --live")
+    parser.add_argument("--models", default="gpt-5,gpt-4o,gpt-4o-mini", help="models to show codec_for's pick for")
+    args = parser.parse_args()
+
+    counter, count_tokens = token_counter(args.model)
+    print(f"token counts: {counter}")
+    results = {"token_counter": counter, "sizes": {}}
+    engine = LocalPlacementEngine()
+    for size in args.sizes.split(","):
+        rows, cols = (int(x) for x in size.split("x"))
+        grid = generate_city(rows, cols, seed=0)["grid"]
+        cells = engine.propose(grid, "next to the river, near the existing houses", allow_ambiguous=True) or []
+        legacy, by_codec = measure(grid, apply_cells_as_new_houses(grid, cells), args.rounds, count_tokens)
+        results["sizes"][size] = {"legacy_tokens": legacy, "codecs": by_codec}
+
+        print(f"\n{size}: legacy (grid twice as JSON, {args.rounds} calls) {legacy:,} tokens")
+        print(f"{'codec':>8} {'base':>8} {'proposal':>9} {'total':>9} {'vs legacy':>10} {'round trip':>11}")
+        for name, r in by_codec.items():
+            print(f"{name:>8} {r['base_tokens']:>8,} {r['proposal_tokens']:>9,} {r['total_tokens']:>9,} "
+                  f"{r['total_tokens'] / legacy:>10.0%} {'ok' if r['round_trip'] else 'FAIL':>11}")
+
+    results["picked"] = {model: {"codec": measured_codec(model), "token_counter": token_counter(model)[0]}
+                         for model in args.models.split(",")}
+    print("\ncodec_for() per model (example city):")
+    for model, pick in results["picked"].items():
+        print(f"  {model:<14} {pick['codec']:<7} ({pick['token_counter']})")
+
+    if args.live:
+        with open(os.path.join(DATA, "example_city.json")) as f:
+            grid = json.load(f)["grid"]
+        with open(os.path.join(DATA, "reasoning_corpus.jsonl")) as f:
+            texts = [json.loads(line)["text"] for line in f if line.strip()]
+        results["accuracy"] = asyncio.run(live_accuracy(args.model, grid, texts))
+        print(f"\naccuracy on {len(texts)} corpus texts ({args.model}):")
+        for name, r in results["accuracy"].items():
+            print(f"{name:>8} valid as returned {r['valid_as_returned']:.0%}, "
+                  f"overlap with local engine {r['overlap_with_local']:.2f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Prompt tokens per reasoning call: legacy string history vs NegotiationHistory.
+
+    PYTHONPATH=src python benchmarks/bench_history_tokens.py --rounds 10
+
+The legacy history appended the initial grid and every proposal grid as list
+reprs to one string, and each reasoning payload re-sent all of it. Token counts
+use tiktoken when installed, otherwise history.estimate_tokens (~4 chars/token).
+Only the user payload is counted; the static system prompt is the same for both.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from history import NegotiationHistory, estimate_tokens
+from placement import LocalPlacementEngine
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+try:
+    import tiktoken
+    _enc = tiktoken.get_encoding("o200k_base")
+    count_tokens = lambda text: len(_enc.encode(text))
+except ImportError:
+    count_tokens = estimate_tokens
+
+
+def payload(grid, proposal_grid, history_text):
+    # Same shape as DeveloperReasoningAgent's user payload
+    return json.dumps({
+        "legend": {"0": "grass", "1": "forest", "2": "river", "3": "house", "10": "proposed new house"},
+        "grid_shape": [len(grid), len(grid[0])],
+        "grid": proposal_grid,
+        "negotiation_history": history_text,
+        "proposal_grid": proposal_grid,
+        "constraints": {"place_on": 0, "avoid": [1, 2, 3], "prefer_near_houses": True, "prefer_near_rivers": True},
+    })
+
+
+async def run(rounds, budget):
+    with open(os.path.join(DATA, "example_city.json")) as f:
+        grid = json.load(f)["grid"]
+    with open(os.path.join(DATA, "reasoning_corpus.jsonl")) as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    texts = {sp: [r["text"] for r in corpus if r["speaker"] == sp and "TERMINATE" not in r["text"]]
+             for sp in ("developer", "resident")}
+    engine = LocalPlacementEngine()
+
+    legacy = f"\n\nInitial city map: {grid}"
+    history = NegotiationHistory(token_budget=budget)
+    proposal = grid
+    rows = []
+    for round_no in range(rounds):
+        for speaker in ("developer", "resident"):
+            legacy_tokens = count_tokens(payload(grid, proposal, legacy))
+            new_tokens = count_tokens(payload(grid, proposal, history.render()))
+            rows.append((round_no, speaker, legacy_tokens, new_tokens))
+
+            text = texts[speaker][round_no % len(texts[speaker])]
+            cells = engine.propose(grid, text, allow_ambiguous=True)
+            proposal = [row[:] for row in grid]
+            for r, c in cells:
+                proposal[r][c] = 10
+            legacy += f"\n\n{speaker.title()} reasoning round {round_no}: {text}"
+            if speaker == "resident":
+                legacy += f"\n\nDeveloper proposal grid round {round_no}: {proposal}"
+            history.add(round_no, speaker, text)
+            history.set_cells(cells)
+            await history.compact()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=1200, help="history token budget")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args.rounds, args.budget))
+    print(f"{'round':>5} {'speaker':>9} {'legacy':>8} {'new':>8}")
+    legacy_total = new_total = 0
+    for round_no, speaker, legacy, new in rows:
+        legacy_total += legacy
+        new_total += new
+        print(f"{round_no:>5} {speaker:>9} {legacy:>8} {new:>8}")
+    print(f"total prompt tokens over {args.rounds} rounds: legacy {legacy_total}, new {new_total} "
+          f"({1 - new_total / legacy_total:.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Bytes sent and render time per session: whole emoji maps vs cached base + proposal windows.
+
+    PYTHONPATH=src python benchmarks/bench_map_render.py
+    PYTHONPATH=src python benchmarks/bench_map_render.py --sizes 10x20,200x400 --sessions 10 --out maps.json
+
+Runs seeded negotiations offline against FakeOpenAI on procedural maps of each
+size, once per map render mode: "full" (the whole emoji map for the base and
+every proposal, as before), "emoji" (base once, then proposal windows) and
+"auto" (the same, with the base as SVG on large maps). Reports per session the
+map bytes posted (emoji text and images), all bytes posted, chat messages
+created (in "full" every status note was a new message; otherwise one status
+message is edited in place) and time spent rendering maps (emoji_render spans).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+
+from agents.city_builder_agent import CityBuilderAgent
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+from sinks import OutputSink
+
+MAP_AUTHORS = ("city_builder_agent", "Proposal_render_agent")
+
+# Rejected maps and renders are logged as warnings by the agents; expected here, not part of the report
+logging.getLogger("agents").setLevel(logging.ERROR)
+
+
+class MeteredSink(OutputSink):
+    def __init__(self):
+        self.map_bytes = 0
+        self.total_bytes = 0
+        self.messages = 0
+        self.statuses = 0
+
+    async def send(self, author, content):
+        size = len(content.encode())
+        self.total_bytes += size
+        self.messages += 1
+        if author in MAP_AUTHORS:
+            self.map_bytes += size
+
+    async def status(self, content):
+        self.statuses += 1
+        self.total_bytes += len(content.encode())
+
+    async def image(self, author, name, content, mime):
+        self.map_bytes += len(content)
+        self.total_bytes += len(content)
+        self.messages += 1
+
+
+async def run_size(args, rows, cols, mode):
+    fake = FakeOpenAI(seed=args.seed, terminate_after=args.terminate_after)
+    engine = build_engine(client=LLMClient(fake, max_concurrency=64, base_delay=0.001), stream=False,
+                          placement_backend=args.placement, max_rounds=args.max_rounds, map_mode=mode)
+    engine.post_telemetry = False
+    engine.agents.add("city_builder", CityBuilderAgent(client=engine.client, rows=rows, cols=cols))
+
+    async def one(i):
+        sink = MeteredSink()
+        result = await engine.run(sink=sink, session_id=f"bench-{i}", city_mode="procedural", seed=args.seed + i)
+        render_s = sum(s["total_s"] for key, s in result.telemetry["stages"].items()
+                       if key.startswith("emoji_render"))
+        # Before, every status note was a message of its own
+        messages = sink.messages + (sink.statuses if mode == "full" else min(sink.statuses, 1))
+        return sink, messages, render_s
+
+    runs = await asyncio.gather(*(one(i) for i in range(args.sessions)))
+    return {
+        "size": f"{rows}x{cols}",
+        "mode": mode,
+        "map_bytes": statistics.mean(s.map_bytes for s, _, _ in runs),
+        "total_bytes": statistics.mean(s.total_bytes for s, _, _ in runs),
+        "messages": statistics.mean(m for _, m, _ in runs),
+        "render_ms": statistics.mean(r for _, _, r in runs) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10x20,50x100,100x200,200x400", help="rows x cols of the maps")
+    parser.add_argument("--modes", default="full,emoji,auto")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per size and mode")
+    parser.add_argument("--max-rounds", type=int, default=4)
+    parser.add_argument("--terminate-after", type=int, default=3)
+    parser.add_argument("--placement", choices=["llm", "local"], default="llm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    rows_out = []
+    print(f"{'size':>8} {'mode':>6} {'map bytes':>11} {'all bytes':>11} {'messages':>9} {'render':>9}")
+    for size in args.sizes.split(","):
+        rows, cols = (int(x) for x in size.split("x"))
+        full = None
+        for mode in args.modes.split(","):
+            row = asyncio.run(run_size(args, rows, cols, mode))
+            rows_out.append(row)
+            full = full or (row if mode == "full" else None)
+            versus = f"  ({row['map_bytes'] / full['map_bytes']:.1%} of full)" if full and row is not full else ""
+            print(f"{row['size']:>8} {mode:>6} {row['map_bytes']:>11,.0f} {row['total_bytes']:>11,.0f} "
+                  f"{row['messages']:>9.1f} {row['render_ms']:>7.2f}ms{versus}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": vars(args), "results": rows_out}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Agent pipeline benchmarks against the offline FakeOpenAI backend.
+
+    PYTHONPATH=src python benchmarks/bench_pipeline.py --out bench_pipeline.json
+    PYTHONPATH=src python benchmarks/bench_pipeline.py --concurrency 1,10,100 --latency 0.2 --compare old.json
+
+Three sections, all written to one JSON file so runs can be diffed between commits:
+  overhead    - per-call cost of the local work each agent does around its LLM call
+                (the agents' own prompt building, response parsing and validation,
+                numbers_to_emojis, apply_cells_as_new_houses), in microseconds
+  session     - end-to-end latency of single negotiations (p50/p95), i.e. the
+                orchestration cost on top of the fake's simulated latency
+  throughput  - sessions/second and latency percentiles with 1..1000 concurrent sessions
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+
+from agents.developer_reasoning_agent import DeveloperReasoningAgent
+from agents.render_proposal_agent import RenderProposalAgent
+from agents.resident_reasoning_agent import ResidentReasoningAgent
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from city_features import CityFeatures
+from llm_client import LLMClient
+from proposal import parse_cells, validate_cells
+from utils import apply_cells_as_new_houses, numbers_to_emojis
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+CELLS = [[8, 15], [8, 16], [8, 17], [8, 18], [9, 15], [9, 16], [9, 17], [9, 18]]
+
+# Rejected maps and renders are logged as warnings by the agents; expected here, not part of the report
+logging.getLogger("agents").setLevel(logging.ERROR)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def bench_overhead(number):
+    with open(os.path.join(DATA, "example_city.json")) as f:
+        grid = json.load(f)["grid"]
+    proposal_grid = apply_cells_as_new_houses(grid, CELLS)
+    history = "Round 0 developer: build by the river.\n\nRound 0 resident: far from the houses." * 3
+    # The agents' real prompt building, as each turn calls it (the client is never used here)
+    client = LLMClient(FakeOpenAI())
+    developer, resident = DeveloperReasoningAgent(client=client), ResidentReasoningAgent(client=client)
+    renderer = RenderProposalAgent(client=client)
+    features = CityFeatures(grid)
+    reply = json.dumps({"cells": [{"row": r, "col": c} for r, c in CELLS], "justification": "fake placement"})
+    return {
+        "developer_prompt_us": per_call_us(
+            lambda: developer.prompt(proposal_grid, history, False, features, grid).messages(), number),
+        "resident_prompt_us": per_call_us(
+            lambda: resident.prompt(proposal_grid, history, features, grid).messages(), number),
+        "render_prompt_us": per_call_us(lambda: renderer.prompt(grid, history).messages(), number),
+        "parse_response_us": per_call_us(lambda: parse_cells(json.loads(reply)), number),
+        "validate_cells_us": per_call_us(lambda: validate_cells(features, CELLS), number),
+        "numbers_to_emojis_us": per_call_us(lambda: numbers_to_emojis(proposal_grid), number),
+        "apply_cells_as_new_houses_us": per_call_us(lambda: apply_cells_as_new_houses(grid, CELLS), number),
+    }
+
+
+def make_engine(args, max_concurrency):
+    fake = FakeOpenAI(latency=args.latency, jitter=args.latency / 4, seed=args.seed)
+    client = LLMClient(fake, max_concurrency=max_concurrency, base_delay=0.01)
+    return build_engine(client=client, stream=args.stream, placement_backend=args.placement), fake
+
+
+async def run_sessions(engine, n, city_mode):
+    results = await asyncio.gather(*(
+        engine.run(session_id=f"bench-{i}", city_mode=city_mode, seed=i) for i in range(n)
+    ))
+    return [r.latency_s for r in results], [r.rounds for r in results]
+
+
+def bench_session(args):
+    engine, fake = make_engine(args, max_concurrency=16)
+    latencies = []
+    for _ in range(args.sessions):
+        lat, _ = asyncio.run(run_sessions(engine, 1, args.city_mode))
+        latencies += lat
+    calls = sum(fake.calls.values()) / args.sessions
+    return {
+        "sessions": args.sessions,
+        "calls_per_session": calls,
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+        # Everything above the fake's simulated wait (and its own reply-building) is ours
+        "overhead_per_call_ms": ((sum(latencies) - fake.reply_s) / sum(fake.calls.values()) - args.latency) * 1000,
+    }
+
+
+def bench_throughput(args, concurrency):
+    engine, _ = make_engine(args, max_concurrency=args.max_concurrency)
+    start = time.perf_counter()
+    latencies, rounds = asyncio.run(run_sessions(engine, concurrency, args.city_mode))
+    elapsed = time.perf_counter() - start
+    stats = engine.client.stats()
+    return {
+        "concurrency": concurrency,
+        "wall_s": elapsed,
+        "sessions_per_s": concurrency / elapsed,
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+        "mean_rounds": statistics.mean(rounds),
+        "max_queue_depth": stats["max_queue_depth"],
+        "wait_p95_s": stats["wait_p95_s"],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, path=""):
+    """Prints numeric fields that moved by more than 10%."""
+    if isinstance(new, dict):
+        for key, value in new.items():
+            if isinstance(old, dict) and key in old:
+                compare(old[key], value, f"{path}.{key}" if path else key)
+    elif isinstance(new, list):
+        for i, (a, b) in enumerate(zip(old, new)):
+            compare(a, b, f"{path}[{i}]")
+    elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+        change = (new - old) / abs(old)
+        if abs(change) > 0.10:
+            print(f"  {path}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="bench_pipeline.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake seconds per LLM call")
+    parser.add_argument("--concurrency", default="1,10,100,1000")
+    parser.add_argument("--max-concurrency", type=int, default=256, help="LLMClient in-flight budget")
+    parser.add_argument("--sessions", type=int, default=20, help="sequential sessions for the latency section")
+    parser.add_argument("--number", type=int, default=2000, help="calls per overhead timing")
+    parser.add_argument("--city-mode", choices=["llm", "procedural"], default="llm")
+    parser.add_argument("--placement", choices=["llm", "local"], default="llm")
+    parser.add_argument("--stream", action="store_true", help="stream the reasoning agents")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "overhead": bench_overhead(args.number),
+    }
+    for name, value in results["overhead"].items():
+        print(f"{name:>30} {value:>9.1f}")
+
+    results["session"] = bench_session(args)
+    s = results["session"]
+    print(f"\nsession: p50 {s['p50_s']:.3f}s p95 {s['p95_s']:.3f}s, {s['calls_per_session']:.1f} calls, "
+          f"overhead {s['overhead_per_call_ms']:.2f}ms/call")
+
+    print(f"\n{'sessions':>9} {'wall':>8} {'sess/s':>8} {'p50':>8} {'p95':>8} {'queue':>6}")
+    results["throughput"] = []
+    for n in (int(x) for x in args.concurrency.split(",")):
+        row = bench_throughput(args, n)
+        results["throughput"].append(row)
+        print(f"{n:>9} {row['wall_s']:>7.2f}s {row['sessions_per_s']:>8.1f} {row['p50_s']:>7.2f}s "
+              f"{row['p95_s']:>7.2f}s {row['max_queue_depth']:>6}")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print(f"changes vs {args.compare} ({old.get('commit')}):")
+        compare(old, results)
+
+
+if __name__ == "__main__":
+    main()
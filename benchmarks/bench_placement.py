@@ -0,0 +1,99 @@
+"""
+Local placement engine vs the LLM render path.
+
+    PYTHONPATH=src python benchmarks/bench_placement.py
+    PYTHONPATH=src python benchmarks/bench_placement.py --record   # fill reference_cells from the LLM
+
+Reports proposals/second for the local engine. Agreement with the LLM render
+path (exact match and cell overlap) is reported only against reference cells
+that --record took from the model; the committed corpus has none yet, so run
+--record first. --record and --live need OPENAI_API_KEY; --live also times the
+LLM path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from placement import LocalPlacementEngine, parse_intent
+from proposal import parse_cells
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def overlap(a, b):
+    a, b = {tuple(x) for x in a}, {tuple(x) for x in b}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+async def llm_cells(grid, texts):
+    from agents.render_proposal_agent import RenderProposalAgent
+    agent = RenderProposalAgent(model="gpt-4o-mini")
+    out = []
+    for text in texts:
+        raw = await agent.llm_cells(grid, text)
+        out.append(parse_cells(json.loads(raw)))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=os.path.join(DATA, "reasoning_corpus.jsonl"))
+    parser.add_argument("--city", default=os.path.join(DATA, "example_city.json"))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--record", action="store_true", help="store LLM cells as reference_cells")
+    parser.add_argument("--live", action="store_true", help="also time the LLM path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    with open(args.city) as f:
+        grid = json.load(f)["grid"]
+
+    engine = LocalPlacementEngine()
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for rec in corpus:
+            engine.propose(grid, rec["text"], allow_ambiguous=True)
+    elapsed = time.perf_counter() - start
+    local_rate = args.iterations * len(corpus) / elapsed
+
+    ambiguous = sum(parse_intent(rec["text"]).ambiguous for rec in corpus)
+    print(f"local engine: {local_rate:,.0f} proposals/s over {len(corpus)} texts")
+    print(f"ambiguous (would fall back to LLM): {ambiguous}/{len(corpus)}")
+
+    if args.record or args.live:
+        start = time.perf_counter()
+        cells = asyncio.run(llm_cells(grid, [rec["text"] for rec in corpus]))
+        elapsed = time.perf_counter() - start
+        print(f"llm path: {len(corpus) / elapsed:,.2f} proposals/s")
+        if args.record:
+            for rec, c in zip(corpus, cells):
+                rec["reference_cells"] = c
+                rec["reference_source"] = "llm"
+            with open(args.corpus, "w") as f:
+                for rec in corpus:
+                    f.write(json.dumps(rec) + "\n")
+
+    # Only model output counts as a reference; anything else says nothing about the LLM path
+    scored = [rec for rec in corpus if rec.get("reference_cells") and rec.get("reference_source") == "llm"]
+    if not scored:
+        print("no LLM-recorded reference cells in corpus; run with --record to measure agreement")
+        return
+    exact, overlaps = 0, []
+    for rec in scored:
+        local = engine.propose(grid, rec["text"], allow_ambiguous=True) or []
+        ov = overlap(local, rec["reference_cells"])
+        overlaps.append(ov)
+        exact += ov == 1.0
+    print(f"agreement with reference: exact {exact}/{len(scored)}, "
+          f"mean cell overlap {sum(overlaps) / len(overlaps):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Rounds to agreement and wall-clock time: serial renders vs speculative candidates.
+
+    PYTHONPATH=src python benchmarks/bench_speculative.py
+    PYTHONPATH=src python benchmarks/bench_speculative.py --k 2,4,8 --tolerance 0.1 --latency 0.2 --out spec.json
+
+Runs the same seeded negotiations against FakeOpenAI for the serial loop (one
+render per turn, no local compromise check) and for each k in both candidate
+modes (one n=k request, or k gathered requests), with early termination at
+`--tolerance` from the local compromise. Reports mean rounds, how negotiations
+ended, LLM calls per session and session wall time (mean, p50, p95). In the fake, the
+developer accepts after `--terminate-after` resident turns, standing in for
+agreement reached by talking; render choices are the fake's k best blocks.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+from collections import Counter
+
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+
+# Rejected maps and renders are logged as warnings by the agents; expected here, not part of the report
+logging.getLogger("agents").setLevel(logging.ERROR)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run_config(args, candidates, mode, tolerance):
+    fake = FakeOpenAI(latency=args.latency, jitter=args.latency / 4, seed=args.seed,
+                      terminate_after=args.terminate_after)
+    engine = build_engine(client=LLMClient(fake, max_concurrency=256, base_delay=0.01), stream=False,
+                          placement_backend=args.placement, max_rounds=args.max_rounds,
+                          candidates=candidates, candidate_mode=mode, compromise_tolerance=tolerance)
+    results = await asyncio.gather(*(
+        engine.run(session_id=f"bench-{i}", city_mode="procedural", seed=args.seed + i)
+        for i in range(args.sessions)
+    ))
+    latencies = [r.latency_s for r in results]
+    return {
+        "candidates": candidates,
+        "mode": mode,
+        "tolerance": tolerance,
+        "mean_rounds": statistics.mean(r.rounds for r in results),
+        "terminated_by": dict(Counter(str(r.terminated_by) for r in results)),
+        "calls_per_session": sum(fake.calls.values()) / args.sessions,
+        "mean_s": statistics.mean(latencies),
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", default="2,4,8", help="candidate counts to try")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="distance from the compromise that ends a run")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake seconds per LLM call")
+    parser.add_argument("--terminate-after", type=int, default=3)
+    parser.add_argument("--max-rounds", type=int, default=4)
+    parser.add_argument("--placement", choices=["llm", "local"], default="llm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    configs = [(1, "gather", None), (1, "gather", args.tolerance)]
+    configs += [(k, mode, args.tolerance) for k in (int(x) for x in args.k.split(",")) for mode in ("n", "gather")]
+    rows = []
+    print(f"{'k':>3} {'mode':>7} {'tol':>5} {'rounds':>7} {'calls':>6} {'mean':>8} {'p50':>8} {'p95':>8}  ended by")
+    for candidates, mode, tolerance in configs:
+        row = asyncio.run(run_config(args, candidates, mode, tolerance))
+        rows.append(row)
+        label = "serial" if candidates == 1 else mode
+        print(f"{candidates:>3} {label:>7} {tolerance if tolerance is not None else '-':>5} "
+              f"{row['mean_rounds']:>7.2f} {row['calls_per_session']:>6.1f} {row['mean_s']:>7.2f}s {row['p50_s']:>7.2f}s "
+              f"{row['p95_s']:>7.2f}s  {row['terminated_by']}")
+
+    serial = rows[0]
+    print(f"\nvs serial loop ({serial['mean_rounds']:.2f} rounds, mean {serial['mean_s']:.2f}s):")
+    for row in rows[1:]:
+        label = "serial" if row["candidates"] == 1 else row["mode"]
+        print(f"  k={row['candidates']} {label:>6}: rounds {row['mean_rounds'] / serial['mean_rounds'] - 1:+.0%}, "
+              f"mean wall {row['mean_s'] / serial['mean_s'] - 1:+.0%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
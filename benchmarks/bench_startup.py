@@ -0,0 +1,108 @@
+"""
+Cold start of a worker: import and construction times in fresh interpreters.
+
+    PYTHONPATH=src python benchmarks/bench_startup.py
+    PYTHONPATH=src python benchmarks/bench_startup.py --repeat 10 --budget-ms 250 --out startup.json
+
+Each step runs in a new interpreter `--repeat` times (median reported), so
+nothing is already imported: the grid utilities, the engine module,
+build_engine() with the agents only registered, the first session's agents
+actually built, and the Chainlit app (main) when chainlit is installed. The
+top modules by self import time come from `python -X importtime`.
+
+With --budget-ms, exits non-zero if `import engine` + build_engine() is slower
+than that, so a cold-start regression fails CI.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+TIMER = "import time; _t = time.perf_counter()\n{code}\nprint((time.perf_counter() - _t) * 1000)"
+
+STEPS = [
+    ("import utils", "import utils, grid_codec"),
+    ("import engine", "import engine"),
+    ("build_engine()", "import engine; engine.build_engine()"),
+    ("first session agents", "import engine; e = engine.build_engine()\n"
+                             "for role in ('city_builder', 'developer', 'resident', 'renderer'): e.agents.get(role)"),
+]
+HEAVY = ("openai", "chainlit", "httpx", "numpy")
+
+
+def env():
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    return {**os.environ, "PYTHONPATH": src + os.pathsep + os.environ.get("PYTHONPATH", "")}
+
+
+def time_step(code, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", TIMER.format(code=code)], env=env(),
+                             capture_output=True, text=True, check=True)
+        runs.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(runs)
+
+
+def loaded_heavy(code):
+    out = subprocess.run([sys.executable, "-c", code + "\nimport sys\n"
+                          f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"],
+                         env=env(), capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.rstrip("\n").split("\n")[-1].split(",") if m]
+
+
+def import_profile(code, top):
+    """(module, self µs, cumulative µs) of the slowest imports, from -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env(),
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return sorted(rows, key=lambda r: -r[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per step")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if import engine + build_engine() exceeds this")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    steps = list(STEPS)
+    if importlib.util.find_spec("chainlit") is not None:
+        steps.append(("import main", "import main"))
+
+    rows = []
+    print(f"{'step':<22} {'median':>9}  heavy modules loaded")
+    for label, code in steps:
+        row = {"step": label, "ms": time_step(code, args.repeat), "heavy": loaded_heavy(code)}
+        rows.append(row)
+        print(f"{label:<22} {row['ms']:>7.1f}ms  {', '.join(row['heavy']) or '-'}")
+
+    profile = import_profile("import engine; engine.build_engine()", args.top)
+    print("\nslowest imports for build_engine() (self time):")
+    for name, own, cumulative in profile:
+        print(f"  {name:<40} {own / 1000:>7.1f}ms  (cumulative {cumulative / 1000:.1f}ms)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"config": vars(args), "results": rows,
+                       "profile": [{"module": n, "self_us": s, "cumulative_us": c} for n, s, c in profile]}, f, indent=2)
+
+    if args.budget_ms is not None:
+        cold = next(r["ms"] for r in rows if r["step"] == "build_engine()")
+        if cold > args.budget_ms:
+            print(f"\nFAIL: build_engine() cold start {cold:.1f}ms > budget {args.budget_ms:.1f}ms")
+            sys.exit(1)
+        print(f"\nOK: build_engine() cold start {cold:.1f}ms within budget {args.budget_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
 # agents/city_builder_agent.py
 import json
-from openai import AsyncOpenAI
-from utils import update_msg
+import logging
+from typing import Optional
+from llm_client import LLMClient
+from sinks import current_sink
+from city_generator import generate_city, validate_city
+from response_cache import CacheMiss
+from telemetry import span
+
+logger = logging.getLogger(__name__)
 
 class CityBuilderAgent:
-    def __init__(self, client: AsyncOpenAI, model: str = "gpt-4o-mini"):
+    """
+    Builds the city map. mode="llm" asks the model for the map; mode="procedural"
+    uses the seeded local generator. An LLM map that fails to parse or breaks
+    the rules falls back to the generator, so callers always get a "grid".
+    """
+
+    def __init__(self, client: LLMClient, model: str = "gpt-4o-mini", mode: str = "llm",
+                 rows: int = 10, cols: int = 20):
+        if mode not in ("llm", "procedural"):
+            raise ValueError(f"Unknown city builder mode: {mode}")
         self.client = client
         self.model = model
+        self.mode = mode
+        self.rows = rows
+        self.cols = cols
         self.system_prompt = """
             Imagine a grid-based city with a river, forest, grassland, and houses.
             Generate a compact city map.
@@ -34,9 +53,12 @@ class CityBuilderAgent:
             [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 2, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 2, 0, 0, 2, 2], [0, 0, 0, 3, 3, 3, 3, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 0, 2, 2, 0, 0], [0, 0, 0, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
             """
 
-    async def build_city_json(self) -> dict:
+    async def build_city_json(self, mode: Optional[str] = None, seed: Optional[int] = None) -> dict:
 
-        await update_msg("⏳ Building map")
+        await current_sink.get().status("⏳ Building map")
+
+        if (mode or self.mode) == "procedural":
+            return self.generate(seed)
 
         try:
             resp = await self.client.chat.completions.create(
@@ -49,13 +71,37 @@ class CityBuilderAgent:
                 response_format={"type": "json_object"},  # force JSON
             )
             txt = resp.choices[0].message.content.strip()
-            data = json.loads(txt)
-           
+            with span("parse"):
+                data = json.loads(txt)
+
             grid = data.get("grid")
-            
-            if not isinstance(grid, list) or len(grid) != 10:
-                raise ValueError("grid must be a list of 10 strings")
 
+            # Only the shape and legend are enforced here: the model's maps are
+            # looser than the generator's (e.g. 1-cell river bends) but usable
+            with span("validate"):
+                errors = validate_city(grid, rows=10, cols=20, structure_only=True)
+            if errors:
+                raise ValueError("; ".join(errors))
+
+            data["source"] = "llm"
             return data
+        except CacheMiss:
+            raise  # replaying a recording: a different city would be a different run
         except Exception as e:
-            return {"error": f"⚠️ Parse error: {e}"}
+            logger.warning("City builder LLM map rejected, generating locally: %s", e)
+            city = self.generate(seed, rows=10, cols=20)
+            city["error"] = f"⚠️ Parse error: {e}"
+            return city
+
+    def generate(self, seed: Optional[int] = None, rows: Optional[int] = None,
+                 cols: Optional[int] = None, attempts: int = 5) -> dict:
+        """Procedural map; re-rolls (deterministically from seed) the rare map that breaks a rule."""
+        rows, cols = rows or self.rows, cols or self.cols
+        city = generate_city(rows, cols, seed)
+        base_seed = city["seed"]
+        for attempt in range(1, attempts):
+            if not validate_city(city["grid"], rows, cols):
+                break
+            city = generate_city(rows, cols, base_seed + attempt)
+        city["source"] = "procedural"
+        return city
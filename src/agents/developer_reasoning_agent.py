@@ -1,9 +1,13 @@
 # agents/developer_agent_reasoning.py
-import os, json
-from typing import List
-from openai import AsyncOpenAI
-from utils import update_msg
-import chainlit as cl
+from dataclasses import replace
+from typing import List, Optional
+from llm_client import LLMClient, get_client
+from streaming import StreamResult, stream_chat, complete_chat
+from utils import EXAMPLE_GRID, new_house_cells
+from grid_codec import GridCodec, base_map_message, codec_for, legend_text, strip_proposal
+from prompt_layout import PromptLayout
+from sinks import current_sink
+from city_features import CityFeatures
 
 class DeveloperReasoningAgent:
     """
@@ -11,14 +15,33 @@ class DeveloperReasoningAgent:
     in plain language. It does NOT return coordinates or JSON — just reasoning.
     """
 
-    def __init__(self, model: str = "gpt-5", temperature: float = 1.0):
+    author = "Developer Agent"
+
+    def __init__(self, model: str = "gpt-5", temperature: float = 1.0, client: Optional[LLMClient] = None,
+                 stream: bool = True, codec: Optional[GridCodec] = None):
         self.model = model
         self.temperature = temperature
-        self.client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Shared, pooled client (uses OPENAI_API_KEY from env)
+        self.client = client or get_client()
+        # Stream tokens into the chat as they arrive, cutting off at TERMINATE
+        self.stream = stream
+        # How grids are written into the prompt (chosen per model, see grid_codec)
+        self.codec = codec or codec_for(model)
+        # Legend and constraints never change, so they sit in the cached prompt prefix
+        symbol = self.codec.symbol
+        self.static = {
+            "legend": self.codec.legend,
+            "constraints": {
+                "place_on": symbol(0),
+                "avoid": [symbol(1), symbol(2), symbol(3)],
+                "prefer_near_houses": True,
+                "prefer_near_rivers": True
+            }
+        }
 
         self.system = (
             "You are a planning-savvy developer agent. You receive a 2D grid map with values:\n"
-            "0=grass, 1=forest, 2=river, 3=house.\n"
+            f"{legend_text(self.codec, (0, 1, 2, 3))}.\n"
             "Your task: verbally explain the best place for a contiguous 8-cell housing block "
             "On grass, close to existing houses, and with views of rivers and forests.\n"
             "Output REQUIREMENTS:\n"
@@ -34,45 +57,54 @@ class DeveloperReasoningAgent:
             "- Always be explicit about your intended location of the new houses. Do not just say eg. 'it should stay where it was previously'. \n"            
             "- Answer as though you are a housing developer, using the term 'I'. If previous proposals are provided in the negotiation history, bargain with the residents to get the best deal you can.\n"
             "Example: \n "
-            "Given grid:    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 2, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 2, 0, 0, 2, 2], [0, 0, 0, 3, 3, 3, 3, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 0, 2, 2, 0, 0], [0, 0, 0, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]] \n" 
+            f"Given grid:\n{self.codec.dumps(EXAMPLE_GRID)}\n" 
             "You might say: The best place for houses is close to the existing houses on the bottom two rows on the right, aligned with the water. This will allow for river views and good access. \n"
         )
 
-    async def reason(self, grid: List[List[int]], negotiation_history:str, first_turn:bool):
-
-        await update_msg("⏳ Developer Agent considering locations")
-
-        if first_turn:
-            negotiation_history = "There have not been any previous proposals" 
+    async def reason(self, grid: List[List[int]], negotiation_history:str, first_turn:bool,
+                     features: Optional[CityFeatures] = None,
+                     base_grid: Optional[List[List[int]]] = None) -> StreamResult:
 
-        user_payload = {
-            "legend": {"0": "grass", "1": "forest", "2": "river", "3": "house", '10': 'proposed new house'},
-            "grid_shape": [len(grid), len(grid[0]) if grid else 0],
-            "grid": grid,
-            "negotiation_history": negotiation_history,
-            "proposal_grid": grid,
-            "constraints": {
-                "place_on": 0,
-                "avoid": [1, 2, 3],
-                "prefer_near_houses": True,
-                "prefer_near_rivers": True
-            }
-        }
+        sink = current_sink.get()
+        await sink.status("⏳ Developer Agent considering locations")
 
-        resp = await self.client.chat.completions.create(
+        request = dict(
             model=self.model,
             temperature=self.temperature,
-            messages=[
-                {"role": "system", "content": self.system},
-                {"role": "user", "content": json.dumps(user_payload)},
-            ],
+            messages=self.prompt(grid, negotiation_history, first_turn, features, base_grid).messages(),
         )
 
-        developer_reasoning = resp.choices[0].message.content.strip()
+        if self.stream:
+            msg = sink.stream(self.author)
+            result = await stream_chat(self.client, msg.token, **request)
+            await msg.end()
+        else:
+            result = await complete_chat(self.client, **request)
+            await sink.send(self.author, result.text.strip())
 
-        await cl.Message(
-            author="Developer Agent",
-            content=developer_reasoning
-        ).send()
+        # Text and timings together: the agent is shared by concurrent sessions, so nothing per call lives on it
+        return replace(result, text=result.text.strip())
+
+    def prompt(self, grid: List[List[int]], negotiation_history: str, first_turn: bool,
+               features: Optional[CityFeatures] = None,
+               base_grid: Optional[List[List[int]]] = None) -> PromptLayout:
+        if first_turn:
+            negotiation_history = "There have not been any previous proposals" 
+
+        # Stable prefix (system, legend/constraints, base map), then history, then the proposal
+        base_grid = base_grid or strip_proposal(grid)
+        layout = PromptLayout(
+            system=self.system,
+            static=self.static,
+            base=base_map_message(self.codec, base_grid),
+            history=negotiation_history,
+            current={"proposal_grid": self.codec.encode_proposal(base_grid, grid)},
+        )
 
-        return developer_reasoning
+        # Precomputed distances (in cells) from the current proposal, so the model
+        # doesn't have to work out "near water" / "away from houses" itself
+        if features is not None:
+            proposal_cells = new_house_cells(grid)
+            if proposal_cells:
+                layout.current["proposal_distances"] = features.describe_cells(proposal_cells)
+        return layout
@@ -1,103 +1,261 @@
 # agents/developer_agent.py
-from typing import List, Dict, Any, Optional
-from openai import AsyncOpenAI
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+from llm_client import LLMClient, get_client
 import json
-import chainlit as cl
-from utils import numbers_to_emojis, apply_cells_as_new_houses, update_msg
+from prompt_layout import PromptLayout
+from utils import EXAMPLE_GRID, apply_cells_as_new_houses
+from map_render import MapView, current_map
+from grid_codec import GridCodec, base_map_message, codec_for
+from sinks import current_sink
+from placement import LocalPlacementEngine
+from city_features import CityFeatures
+from proposal import PROPOSAL_SCHEMA, Proposal, ProposalStats, parse_cells, repair_cells, validate_cells
+from telemetry import span
+
+logger = logging.getLogger(__name__)
 
 class RenderProposalAgent:
-    def __init__(self, model: str = "gpt-5", client: Optional[AsyncOpenAI] = None):
+    """
+    Turns reasoning text into 8 cells on the map.
+
+    backend="llm" asks the model for the cells every time. backend="local" uses
+    the LocalPlacementEngine and only falls back to the model (if llm_fallback)
+    when the spatial intent in the text is ambiguous.
+
+    Model cells come back under a strict JSON schema and are validated locally
+    (terrain, uniqueness, contiguity). Invalid cells are snapped to the nearest
+    valid block; only if that fails is the model re-asked, at most max_reasks times.
+
+    render_candidates returns k alternative proposals instead, for the engine to
+    choose from (see candidates.py); the chosen one is shown with publish.
+    """
+
+    author = "Proposal_render_agent"
+    # For alternative samples; the main render stays near-deterministic at 0.2
+    sample_temperature = 0.8
+
+    def __init__(self, model: str = "gpt-5", client: Optional[LLMClient] = None,
+                 backend: str = "llm", llm_fallback: bool = True, max_reasks: int = 1,
+                 codec: Optional[GridCodec] = None):
+        if backend not in ("llm", "local"):
+            raise ValueError(f"Unknown placement backend: {backend}")
         self.model = model
-        self.client = client or AsyncOpenAI()
+        self.client = client or get_client()
+        self.backend = backend
+        self.llm_fallback = llm_fallback
+        self.local_engine = LocalPlacementEngine()
+        self.max_reasks = max_reasks
+        self.stats = ProposalStats()
+        # How grids are written into the prompt (chosen per model, see grid_codec)
+        self.codec = codec or codec_for(model)
+        self.system = (
+            "You are an assistant that generates housing proposals on a grid map."
+            "You are given the textual reasoning from a resident or developer agent about where to place new houses as the variable: prosposal_as_text"
+            "You must strictly return JSON with the following structure:\n\n"
+            "{\n"
+            "  \"cells\": [{\"row\": row, \"col\": col}, ...],\n"
+            "  \"justification\": \"...\"\n"
+            "}\n\n"
+            "Rules:\n"
+            "- The 'cells' key must contain exactly 8 unique cells forming one contiguous block.\n"
+            f"- Each cell must be within the grid bounds and on grass ({self.codec.symbol(0)}).\n"
+            "- coordinates are zero indexed"
+            "- The 'justification' key must explain why these cells were chosen.\n"
+            "Do not include any additional text outside the JSON structure."
+            "Example: \n"
+            f"Given grid:\n{self.codec.dumps(EXAMPLE_GRID)}\n\n"
+            "And proposal_as_text: The best place for houses is close to the existing houses on the bottom two rows on the right, aligned with the water. \n"
+            "You might reply with: {\"cells\": [{\"row\": 8, \"col\": 15}, {\"row\": 8, \"col\": 16}, {\"row\": 8, \"col\": 17}, {\"row\": 8, \"col\": 18}, "
+            "{\"row\": 9, \"col\": 15}, {\"row\": 9, \"col\": 16}, {\"row\": 9, \"col\": 17}, {\"row\": 9, \"col\": 18}], \"justification\": \"Next to the existing houses and the water.\"}"
+        )
+        # Task, legend and constraints never change, so they sit in the cached prompt prefix
+        symbol = self.codec.symbol
+        self.static = {
+            "task": "Propose 8 cells for new houses on the map. NEVER place houses on river or existing houses.",
+            "legend": self.codec.legend,
+            "constraints": {
+                "cells_required": 8,
+                "place_on": symbol(0),
+                "avoid": [symbol(1), symbol(2), symbol(3)],
+                "clustered": True,
+                "avoid_river_cells": True,   # Do not overwrite river cells
+                "avoid_existing_houses": True # Do not overwrite existing houses
+            },
+        }
 
-    async def render_proposal(self, grid: List[List[int]], prosposal_as_text: Optional[str] = None) -> Dict[str, Any]:
+    async def render_proposal(self, grid: List[List[int]], prosposal_as_text: Optional[str] = None,
+                              features: Optional[CityFeatures] = None) -> Proposal:
         """
-        rows: 10x20 grid of ints {0,1,2,3}
-        context: str (optional) - reasoning from the reasoning agent
-        returns: {"cells": [[r,c], ... 8 total], "justification": "..."}
+        grid: base city grid of ints {0,1,2,3}
+        prosposal_as_text: str (optional) - reasoning from the reasoning agent
+        features: CityFeatures of grid (optional) - computed here if not given
+        returns: a Proposal; proposal.grid is None when no valid cells could be had
         """
+        features = features or self.local_engine.features_for(grid)
+
+        await current_sink.get().status("⏳ Adding proposal to map.")
 
-        # Ensure update_msg is awaited
-        await update_msg("⏳ Adding proposal to map.")
-
-        system_msg = {
-            "role": "system",
-            "content": (
-                "You are an assistant that generates housing proposals on a 10x20 grid."
-                "You are given the textual reasoning from a resident or developer agent about where to place new houses as the variable: prosposal_as_text"
-                "You must strictly return JSON with the following structure:\n\n"
-                "{\n"
-                "  \"cells\": [[row, col], [row, col], ...],\n"
-                "}\n\n"
-                "Rules:\n"
-                "- The 'cells' key must contain exactly 8 unique [row, col] pairs.\n"
-                "- Each [row, col] pair must be within the grid bounds.\n"
-                "- coordinates are zero indexed"
-                "- The 'justification' key must explain why these cells were chosen.\n"
-                "Do not include any additional text outside the JSON structure."
-                "Example: \n"
-                "Given grid:    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 2, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 2, 0, 0, 2, 2], [0, 0, 0, 3, 3, 3, 3, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 0, 2, 2, 0, 0], [0, 0, 0, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]] \n \n "
-                "And proposal_as_text: The best place for houses is close to the existing houses on the bottom two rows on the right, aligned with the water. \n"
-                "You might reply with: {\"cells\": [[8, 15], [8, 16], [8, 17], [8, 18], [9, 15], [9, 16], [9, 17], [9, 18]]}"
+        proposal = None
+        if self.backend == "local":
+            cells = self.local_engine.propose(
+                grid, prosposal_as_text, allow_ambiguous=not self.llm_fallback, features=features
             )
-        }
+            if cells is not None:
+                proposal = Proposal(cells=cells, source="local", justification="local placement engine")
+        if proposal is None:
+            proposal = await self._llm_proposal(grid, prosposal_as_text, features)
+        return await self.publish(grid, proposal)
 
-        user_msg = {
-            "role": "user",
-            "content": json.dumps({
-                "task": "Propose 8 cells for new houses on the map. NEVER place houses on river or existing houses.",
-                "prosposal_as_text": prosposal_as_text,
-                "legend": {"0": "grass", "1": "forest", "2": "river", "3": "existing house", "10": "new house"},
-                "grid_shape": [len(grid), len(grid[0]) if grid else 0],
-                "grid": grid,
-                "constraints": {
-                    "cells_required": 8,
-                    "place_on": 0,
-                    "avoid": [1, 2, 3],                    
-                    "clustered": True,
-                    "avoid_river_cells": True,   # Do not overwrite river cells
-                    "avoid_existing_houses": True # Do not overwrite existing houses
-                },
-                
-            })
-        }
+    async def render_candidates(self, grid: List[List[int]], prosposal_as_text: Optional[str], k: int,
+                                features: Optional[CityFeatures] = None, mode: str = "gather") -> List[Proposal]:
+        """
+        Up to k different proposals for the same text, none of them published yet.
+        The local backend takes its k best blocks; the model is sampled either with
+        one n=k request (mode="n") or with k concurrent requests (mode="gather").
+        """
+        if mode not in ("gather", "n"):
+            raise ValueError(f"Unknown candidate mode: {mode}")
+        features = features or self.local_engine.features_for(grid)
+
+        await current_sink.get().status("⏳ Adding proposal to map.")
+
+        proposals: List[Proposal] = []
+        if self.backend == "local":
+            ranked = self.local_engine.candidates(
+                grid, prosposal_as_text, k, allow_ambiguous=not self.llm_fallback, features=features
+            )
+            proposals = [Proposal(cells=cells, source="local", justification="local placement engine")
+                         for cells in ranked or []]
+        if not proposals:
+            with span("candidates", mode=mode, k=k) as s:
+                if mode == "n":
+                    proposals = await self._llm_samples(grid, prosposal_as_text, features, k)
+                else:
+                    proposals = list(await asyncio.gather(*(
+                        self._llm_proposal(grid, prosposal_as_text, features, sample=i) for i in range(k)
+                    )))
+                s.set(valid=sum(1 for p in proposals if p.cells))
+
+        unique, seen = [], set()
+        for proposal in proposals:
+            key = frozenset(map(tuple, proposal.cells))
+            if key not in seen:
+                seen.add(key)
+                unique.append(proposal)
+        return unique
+
+    async def publish(self, grid: List[List[int]], proposal: Proposal) -> Proposal:
+        """Applies the proposal's cells (if any), counts it and sends the map."""
+        if proposal.cells:
+            proposal.grid = apply_cells_as_new_houses(grid, proposal.cells)
+        self.stats.add(proposal)  # after the grid is set: a proposal without one counts as failed
+        if proposal.ok:
+            await self._show(grid, proposal.cells)
+        else:
+            logger.warning("Error rendering proposal: %s", "; ".join(proposal.errors))
+        return proposal
+
+    async def replay(self, grid: List[List[int]], proposal: Proposal) -> Proposal:
+        """Shows a proposal rendered earlier (e.g. restored from a checkpoint) without counting it again."""
+        if proposal.cells:
+            proposal.grid = apply_cells_as_new_houses(grid, proposal.cells)
+            await self._show(grid, proposal.cells)
+        return proposal
+
+    async def _show(self, grid: List[List[int]], cells: List[List[int]]):
+        # Only the cells around the proposal, against the session's cached base map (see map_render)
+        view = current_map.get() or MapView(grid)
+        await view.show_proposal(current_sink.get(), self.author, cells)
+
+    def _check(self, raw: str, features: CityFeatures, reask: int) -> Tuple[Optional[Proposal], List[str]]:
+        """A valid or locally repaired Proposal from one reply, else (None, errors)."""
+        with span("parse"):
+            try:
+                data = json.loads(raw)
+            except (TypeError, ValueError) as e:
+                data = {"error": str(e)}
+        cells = parse_cells(data)
+        justification = data.get("justification", "") if isinstance(data, dict) else ""
+
+        with span("validate") as s:
+            errors = validate_cells(features, cells) if cells else ["No [row, col] cells in the reply."]
+            s.set(valid=not errors)
+        if not errors:
+            return Proposal(cells=cells, source="llm", justification=justification, reasks=reask), errors
+
+        with span("repair") as s:
+            repaired = repair_cells(features, cells)
+            s.set(repaired=repaired is not None)
+        if repaired is not None:
+            return Proposal(cells=repaired, source="repaired", justification=justification,
+                            reasks=reask, errors=errors), errors
+        return None, errors
+
+    async def _llm_proposal(self, grid: List[List[int]], prosposal_as_text: Optional[str],
+                            features: CityFeatures, sample: int = 0) -> Proposal:
+        """Model cells, validated; repaired locally if possible, re-asked (bounded) if not."""
+        retry = None
+        for reask in range(self.max_reasks + 1):
+            raw = await self.llm_cells(grid, prosposal_as_text, retry=retry, sample=sample)
+            proposal, errors = self._check(raw, features, reask)
+            if proposal is not None:
+                return proposal
+            retry = (raw, errors)
+
+        return Proposal(cells=[], source="failed", reasks=self.max_reasks, errors=errors)
+
+    async def _llm_samples(self, grid: List[List[int]], prosposal_as_text: Optional[str],
+                           features: CityFeatures, k: int) -> List[Proposal]:
+        """k choices from one request; the usual re-ask path only if none of them is usable."""
+        raws = await self.llm_choices(grid, prosposal_as_text, n=k)
+        proposals = [p for p, _ in (self._check(raw, features, 0) for raw in raws) if p is not None]
+        return proposals or [await self._llm_proposal(grid, prosposal_as_text, features)]
+
+    async def llm_cells(self, grid: List[List[int]], prosposal_as_text: Optional[str],
+                        retry: Optional[Tuple[str, List[str]]] = None, sample: int = 0) -> str:
+        """
+        Asks the model for the cells; returns the raw JSON string.
+        retry: (previous reply, what was wrong with it) for a targeted re-ask
+        sample: 0 for the usual render, i > 0 for the i-th alternative sample
+        """
+        return (await self.llm_choices(grid, prosposal_as_text, retry=retry, sample=sample))[0]
+
+    async def llm_choices(self, grid: List[List[int]], prosposal_as_text: Optional[str],
+                          retry: Optional[Tuple[str, List[str]]] = None, n: int = 1,
+                          sample: int = 0) -> List[str]:
+        """The raw JSON string of each of the n choices."""
+        messages = self.prompt(grid, prosposal_as_text).messages()
+        if retry is not None:
+            previous, errors = retry
+            messages += [
+                {"role": "assistant", "content": previous},
+                {"role": "user", "content": "Those cells are invalid: " + "; ".join(errors)
+                    + " Return 8 different grass cells forming one contiguous block."},
+            ]
+
+        # Alternatives are sampled hotter; a seed per sample keeps gathered requests apart
+        sampling = {"temperature": 0.2}
+        if n > 1:
+            sampling = {"temperature": self.sample_temperature, "n": n}
+        elif sample:
+            sampling = {"temperature": self.sample_temperature, "seed": sample}
 
         resp = await self.client.chat.completions.create(
             model=self.model,
-            messages=[system_msg, user_msg],
-            temperature=0.2,
-            response_format={"type": "json_object"}  # Force JSON response
+            messages=messages,
+            response_format=PROPOSAL_SCHEMA,  # strict structured output
+            **sampling
         )
 
-        proposal_json = resp.choices[0].message.content
-
-        # Defensive parsing
-        try:
-            print("Raw proposal_json:", proposal_json)  # Debugging
-            data = json.loads(proposal_json)
-            cells = data.get("cells", [])
-            justification = data.get("justification", "").strip()
-
-            # Basic validation: exactly 8 cells, each [r, c] in-bounds
-            if len(cells) != 8:
-                raise ValueError("Expected exactly 8 cells.")
-            R, C = len(grid), len(grid[0]) if grid else 0
-            for rc in cells:
-                if not (isinstance(rc, list) and len(rc) == 2):
-                    raise ValueError("Each cell must be [row, col].")
-                r, c = rc
-                if not (0 <= r < R and 0 <= c < C):
-                    raise ValueError(f"Cell out of bounds: {rc}")
-
-            proposal_grid = apply_cells_as_new_houses(grid, cells)
-            print("proposal_grid:", proposal_grid)  # Debugging
-            emoji_map = numbers_to_emojis(proposal_grid)
-            print("emoji_map:", emoji_map)  # Debugging
-            await cl.Message(author="Proposal_render_agent", content=emoji_map).send()
-
-            return proposal_grid
-
-        except Exception as e:
-            print(f"Error parsing proposal: {e}")
-            # Fallback: return empty result with error message (so caller can handle gracefully)
-            return {"cells": [], "justification": f"⚠️ Failed to parse proposal: {e}"}
\ No newline at end of file
+        return [choice.message.content for choice in resp.choices]
+
+    def prompt(self, grid: List[List[int]], prosposal_as_text: Optional[str]) -> PromptLayout:
+        # Stable prefix (system, task/legend/constraints, base map), then the reasoning text
+        return PromptLayout(
+            system=self.system,
+            static=self.static,
+            base=base_map_message(self.codec, grid),
+            current={"prosposal_as_text": prosposal_as_text},
+        )
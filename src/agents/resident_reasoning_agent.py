@@ -1,8 +1,13 @@
 # agents/developer_agent_reasoning.py
-import os, json
-from typing import List
-from openai import AsyncOpenAI
-import chainlit as cl
+from dataclasses import replace
+from typing import List, Optional
+from llm_client import LLMClient, get_client
+from streaming import StreamResult, stream_chat, complete_chat
+from sinks import current_sink
+from utils import EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS, apply_cells_as_new_houses, new_house_cells
+from grid_codec import GridCodec, base_map_message, codec_for, legend_text, strip_proposal
+from prompt_layout import PromptLayout
+from city_features import CityFeatures
 
 class ResidentReasoningAgent:
     """
@@ -10,15 +15,32 @@ class ResidentReasoningAgent:
     in plain language. It does NOT return coordinates or JSON — just reasoning.
     """
 
-    def __init__(self, model: str = "gpt-5", temperature: float = 1):
+    author = "Resident Agent (Reasoning)"
+
+    def __init__(self, model: str = "gpt-5", temperature: float = 1, client: Optional[LLMClient] = None,
+                 stream: bool = True, codec: Optional[GridCodec] = None):
         self.model = model
         self.temperature = temperature
-        # Uses OPENAI_API_KEY from env
-        self.client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        # Shared, pooled client (uses OPENAI_API_KEY from env)
+        self.client = client or get_client()
+        # Stream tokens into the chat as they arrive, cutting off at TERMINATE
+        self.stream = stream
+        # How grids are written into the prompt (chosen per model, see grid_codec)
+        self.codec = codec or codec_for(model)
+        # Legend and constraints never change, so they sit in the cached prompt prefix
+        symbol = self.codec.symbol
+        self.static = {
+            "legend": self.codec.legend,
+            "constraints": {
+                "place_on": symbol(0),
+                "avoid": [symbol(1), symbol(2), symbol(3)],
+                "prefer_away_from_existing_houses": True,
+            }
+        }
 
         self.system = (
             "You are a resident of an imaginary village. You are provided with a 2D grid map with of the village with values:\n"
-            "0=grass, 1=forest, 2=river, 3=house, 10=proposed new house.\n"
+            f"{legend_text(self.codec)}.\n"
             "Your task: verbally explain the best place for a contiguous 8-cell housing block in your village.\n"
             "You should try to position the proposed houses away from existing houses.\n"
             "Please take into account the previous proposals provided in the negotiation history.\n"
@@ -31,45 +53,56 @@ class ResidentReasoningAgent:
             "- If previous proposals are provided in the negotiation history, bargain with the developer to get the new, proposed houses as far away from te existing houses as possible.\n"
             "- Always be explicit about your intended location of the new houses. Do not just say eg. 'it should stay where it was previously'. \n"
             "Example: \n "
-            "Given grid:    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 2, 2, 2, 2, 2], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 2, 0, 0, 2, 2], [0, 0, 0, 3, 3, 3, 3, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 0, 2, 2, 0, 0], [0, 0, 0, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 10, 10, 10, 10, 0], [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 10, 10, 10, 10, 0]] \n" 
+            f"Given grid:\n{self.codec.dumps(apply_cells_as_new_houses(EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS))}\n" 
             "You might say: This proposal is unacceptable, the houses are too close to existing houses, which will be adversely affected. I propose the new houses should go in the top left corner, because it is as far as possible from existing houses. \n"
 
         )
 
-    async def reason(self, grid: List[List[int]], negotiation_history:str) -> str:
+    async def reason(self, grid: List[List[int]], negotiation_history:str,
+                     features: Optional[CityFeatures] = None,
+                     base_grid: Optional[List[List[int]]] = None) -> StreamResult:
         """
-        Returns a short verbal rationale (markdown bullets + short recommendation).
+        Returns a short verbal rationale (markdown bullets + short recommendation)
+        as the result's text, with the call's timings.
         """
 
-        reasoning_spinner = cl.Message(content="⏳ Resident Agent considering locations.")
-        await reasoning_spinner.send()
-
-        user_payload = {
-            "legend": {"0": "grass", "1": "forest", "2": "river", "3": "house", '10': 'proposed new house'},
-            "grid_shape": [len(grid), len(grid[0]) if grid else 0],
-            "proposed_grid": grid,
-            "Negotiation_history": negotiation_history,
-            "constraints": {
-                "place_on": 0,
-                "avoid": [1,2,3],
-                "prefer_away_from_existing_houses": True,               
-            }
-        }
+        sink = current_sink.get()
+        await sink.status("⏳ Resident Agent considering locations.")
 
-        resp = await self.client.chat.completions.create(
+        request = dict(
             model=self.model,
             temperature=self.temperature,
-            messages=[
-                {"role": "system", "content": self.system},
-                {"role": "user", "content": json.dumps(user_payload)},
-            ],
+            messages=self.prompt(grid, negotiation_history, features, base_grid).messages(),
         )
 
-        resident_reasoning = resp.choices[0].message.content.strip()
+        if self.stream:
+            msg = sink.stream(self.author)
+            result = await stream_chat(self.client, msg.token, **request)
+            await msg.end()
+        else:
+            result = await complete_chat(self.client, **request)
+            await sink.send(self.author, result.text.strip())
 
-        await cl.Message(
-            author="Resident Agent (Reasoning)",
-            content=resident_reasoning
-        ).send()
+        # Text and timings together: the agent is shared by concurrent sessions, so nothing per call lives on it
+        return replace(result, text=result.text.strip())
+
+    def prompt(self, grid: List[List[int]], negotiation_history: str,
+               features: Optional[CityFeatures] = None,
+               base_grid: Optional[List[List[int]]] = None) -> PromptLayout:
+        # Stable prefix (system, legend/constraints, base map), then history, then the proposal
+        base_grid = base_grid or strip_proposal(grid)
+        layout = PromptLayout(
+            system=self.system,
+            static=self.static,
+            base=base_map_message(self.codec, base_grid),
+            history=negotiation_history,
+            current={"proposed_grid": self.codec.encode_proposal(base_grid, grid)},
+        )
 
-        return resident_reasoning
+        # Precomputed distances (in cells) from the current proposal, so the model
+        # doesn't have to work out "near water" / "away from houses" itself
+        if features is not None:
+            proposal_cells = new_house_cells(grid)
+            if proposal_cells:
+                layout.current["proposal_distances"] = features.describe_cells(proposal_cells)
+        return layout
@@ -0,0 +1,126 @@
+# batch.py
+"""
+Headless batch runner: N negotiations concurrently, results to JSONL.
+
+    PYTHONPATH=src python src/batch.py -n 200 --workers 20 --out results.jsonl
+    PYTHONPATH=src python src/batch.py -n 5 --city-mode procedural --placement local --sink log
+    PYTHONPATH=src python src/batch.py -n 1000 --workers 1000 --fake 0.2 --out /dev/null
+    PYTHONPATH=src python src/batch.py -n 1 --cache run.sqlite --cache-policy record
+    PYTHONPATH=src python src/batch.py -n 1 --cache run.sqlite --cache-policy replay   # no network
+
+Each line holds the final cells, rounds, who terminated, latency and tokens
+for one negotiation (or the error it failed with).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from engine import NegotiationEngine, build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+from response_cache import ResponseCache, parse_policy
+from sinks import LogSink, NullSink
+import telemetry
+
+SINKS = {"null": NullSink, "log": LogSink}
+
+
+async def run_batch(engine: NegotiationEngine, n: int, workers: int, out, sink: str = "null",
+                    city_mode: str = "procedural", seed: int = 0) -> dict:
+    """Runs n negotiations with at most `workers` in flight; writes one JSON line per run."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(n):
+        queue.put_nowait(i)
+    summary = {"runs": 0, "errors": 0, "latency_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            record = {"run": i}
+            try:
+                result = await engine.run(sink=SINKS[sink](), session_id=f"batch-{i}",
+                                          city_mode=city_mode, seed=seed + i)
+                record.update(result.to_dict())
+                summary["latency_s"] += result.latency_s
+                summary["prompt_tokens"] += result.tokens.get("prompt_tokens", 0)
+                summary["cached_tokens"] += result.tokens.get("cached_tokens", 0)
+                summary["completion_tokens"] += result.tokens.get("completion_tokens", 0)
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                summary["errors"] += 1
+            summary["runs"] += 1
+            out.write(json.dumps(record) + "\n")
+
+    # Each worker is its own task, so engine.run's context variables stay per negotiation
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    out.flush()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=10, help="number of negotiations")
+    parser.add_argument("--workers", type=int, default=10, help="negotiations in flight at once")
+    parser.add_argument("--out", default="-", help="JSONL output path ('-' for stdout)")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--city-mode", choices=["llm", "procedural"], default="procedural")
+    parser.add_argument("--placement", choices=["llm", "local"], default="llm")
+    parser.add_argument("--max-rounds", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first procedural map")
+    parser.add_argument("--sink", choices=sorted(SINKS), default="null")
+    parser.add_argument("--fake", type=float, metavar="LATENCY", default=None,
+                        help="answer offline with FakeOpenAI, LATENCY seconds per call")
+    parser.add_argument("--cache", metavar="PATH", help="sqlite response cache (':memory:' for memory only)")
+    parser.add_argument("--cache-policy", help="e.g. 'replay' or 'render=read_through,developer=record'")
+    parser.add_argument("--candidates", type=int, default=1, help="speculative render candidates per turn")
+    parser.add_argument("--candidate-mode", choices=["gather", "n"], default="gather")
+    parser.add_argument("--compromise-tolerance", type=float, default=None,
+                        help="stop once a proposal is this close to the local compromise")
+    parser.add_argument("--map-render", choices=["auto", "emoji", "svg", "full"], default="auto",
+                        help="how maps are posted to the sink (see map_render)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.sink == "log" else logging.WARNING)
+    client = None
+    if args.fake is not None:
+        client = LLMClient(FakeOpenAI(latency=args.fake, jitter=args.fake / 4, seed=args.seed),
+                           max_concurrency=max(16, args.workers))
+    cache = None
+    if args.cache:
+        cache = ResponseCache(None if args.cache == ":memory:" else args.cache)
+    engine = build_engine(model=args.model, placement_backend=args.placement, stream=False,
+                          max_rounds=args.max_rounds, client=client, cache=cache,
+                          cache_policy=parse_policy(args.cache_policy), candidates=args.candidates,
+                          candidate_mode=args.candidate_mode, compromise_tolerance=args.compromise_tolerance,
+                          map_mode=args.map_render)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    start = time.perf_counter()
+    try:
+        summary = asyncio.run(run_batch(engine, args.n, args.workers, out, args.sink, args.city_mode, args.seed))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    done = summary["runs"] - summary["errors"]
+    print(f"{summary['runs']} negotiations in {elapsed:.1f}s ({summary['runs'] / elapsed:.2f}/s), "
+          f"{summary['errors']} errors, mean latency {summary['latency_s'] / max(done, 1):.2f}s, "
+          f"tokens {summary['prompt_tokens']} prompt ({summary['cached_tokens']} cached) / {summary['completion_tokens']} completion",
+          file=sys.stderr)
+    print("LLM client stats:", engine.client.stats(), file=sys.stderr)
+    print("Proposal render stats:", engine.renderer.stats.snapshot(), file=sys.stderr)
+    for stage, s in telemetry.aggregate.snapshot().items():
+        print(f"  {stage:<28} n={s['count']:<6} p50 {s['p50_s']:.3f}s  p95 {s['p95_s']:.3f}s", file=sys.stderr)
+    if cache is not None:
+        print("Response cache stats:", cache.stats(), file=sys.stderr)
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# candidates.py
+"""
+Speculative proposals: pick one of k candidate placements, and spot a
+compromise, without asking the model.
+
+Each candidate is scored locally on the two objectives the agents argue
+about, both in grid steps scaled by the map size (higher is better):
+
+    developer   close to the river and to the existing houses
+    resident    far from the existing houses
+
+`select_candidate` keeps the Pareto front of the candidates and forwards the
+one most acceptable to both sides: the best worst-side score once each
+objective is normalised over every valid block on the map. `Compromise` is
+that same maximin choice made over every block, so the engine can stop as
+soon as a proposal gets within `tolerance` of it on both objectives.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from city_features import CityFeatures
+from placement import block_cells, enumerate_blocks
+from proposal import Proposal
+
+SPEAKERS = ("developer", "resident")
+
+
+def objectives(features: CityFeatures, cells: Sequence[Sequence[int]]) -> Tuple[float, float]:
+    """(developer, resident) scores of a set of cells on the base city."""
+    scale = float(max(features.rows, features.cols)) * len(cells)
+    water = sum(features.dist("water", r, c) for r, c in cells)
+    houses = sum(features.dist("houses", r, c) for r, c in cells)
+    return -(water + houses) / scale, houses / scale
+
+
+@dataclass
+class Scored:
+    proposal: Proposal
+    developer: float
+    resident: float
+
+    def dominates(self, other: "Scored") -> bool:
+        return (self.developer >= other.developer and self.resident >= other.resident
+                and (self.developer, self.resident) != (other.developer, other.resident))
+
+
+def pareto_front(scored: List[Scored]) -> List[Scored]:
+    return [s for s in scored if not any(o.dominates(s) for o in scored)]
+
+
+class Compromise:
+    """The maximin block over the whole map, and the ranges used to normalise scores."""
+
+    def __init__(self, features: CityFeatures):
+        scale = float(max(features.rows, features.cols))
+        blocks = enumerate_blocks(features)
+        # Same objectives as `objectives`, via the O(1) block means
+        scores = [(-(features.block_mean("water", *b) + features.block_mean("houses", *b)) / scale,
+                   features.block_mean("houses", *b) / scale) for b in blocks]
+        self.ranges = [(min(s[i] for s in scores), max(s[i] for s in scores)) if scores else (0.0, 0.0)
+                       for i in range(2)]
+        self.cells: List[List[int]] = []
+        self.developer = self.resident = 0.0
+        if scores:
+            best = max(range(len(blocks)), key=lambda i: (min(self.normalise(*scores[i])), blocks[i]))
+            self.cells = block_cells(blocks[best])
+            self.developer, self.resident = self.normalise(*scores[best])
+
+    def normalise(self, developer: float, resident: float) -> Tuple[float, float]:
+        """Both scores in [0, 1]: 0 is the worst block on the map for that side, 1 the best."""
+        return tuple((v - lo) / (hi - lo) if hi > lo else 1.0
+                     for v, (lo, hi) in zip((developer, resident), self.ranges))
+
+    def reached(self, developer: float, resident: float, tolerance: float) -> bool:
+        """Whether raw `objectives` scores are within tolerance of the compromise on both sides."""
+        developer, resident = self.normalise(developer, resident)
+        return developer >= self.developer - tolerance and resident >= self.resident - tolerance
+
+
+def score_candidates(features: CityFeatures, proposals: List[Proposal]) -> List[Scored]:
+    return [Scored(p, *objectives(features, p.cells)) for p in proposals if p.cells]
+
+
+def select_candidate(features: CityFeatures, proposals: List[Proposal], compromise: Compromise,
+                     speaker: str) -> Optional[Scored]:
+    """
+    The Pareto-best candidate: on the front, the best worst-side normalised
+    score, ties going to the speaker's own objective. None if no candidate had cells.
+    """
+    if speaker not in SPEAKERS:
+        raise ValueError(f"Unknown speaker: {speaker}")
+    front = pareto_front(score_candidates(features, proposals))
+    if not front:
+        return None
+    return max(front, key=lambda s: (min(compromise.normalise(s.developer, s.resident)), getattr(s, speaker)))
@@ -0,0 +1,172 @@
+# checkpoints.py
+"""
+Durable negotiation checkpoints, so a reconnect or a restart resumes a
+negotiation instead of starting over.
+
+The engine appends one compact record per completed stage to an append-only
+sqlite log:
+
+    city        {"grid": <rle rows>, "source", "seed"}
+    reasoning   {"round", "speaker", "text"}
+    render      {"round", "speaker", "cells", "source"}
+    done        {"rounds", "terminated_by"}
+
+Writes are buffered and committed in batches (every `batch_size` records or
+`max_delay` seconds), so a busy server does one transaction for many sessions;
+a crash loses at most the unflushed tail, which is then simply re-run. The
+engine flushes when a negotiation finishes and the app when a chat ends. `load`
+folds a session's records back into a Checkpoint that
+NegotiationEngine.run(resume=True) continues from.
+
+    store = CheckpointStore("checkpoints.sqlite")
+    engine = build_engine(checkpoints=store)
+    await engine.run(session_id=thread_id, resume=True)
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from grid_codec import RleCodec
+
+STAGES = ("city", "reasoning", "render", "done")
+_rle = RleCodec()
+
+
+@dataclass
+class Checkpoint:
+    """Everything a session completed, in order."""
+    session_id: str
+    city: Optional[Dict[str, Any]] = None  # grid decoded, plus source and seed
+    stages: List[Dict[str, Any]] = field(default_factory=list)  # reasoning/render records, with "created"
+    done: Optional[Dict[str, Any]] = None
+    city_created: Optional[float] = None
+
+    def get(self, round_no: int, speaker: str, stage: str) -> Optional[Dict[str, Any]]:
+        for record in self.stages:
+            if (record["round"], record["speaker"], record["stage"]) == (round_no, speaker, stage):
+                return record
+        return None
+
+    def add(self, stage: str, record: Dict[str, Any], created: Optional[float] = None):
+        """created: when the record was appended (epoch seconds)."""
+        if stage == "city":
+            self.city = {**record, "grid": _rle.decode(record["grid"])}
+            self.city_created = created
+        elif stage == "done":
+            self.done = record
+        else:
+            self.stages.append({**record, "stage": stage, "created": created})
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, separators=(",", ":"))
+
+
+class CheckpointStore:
+    """
+    path: sqlite file (None = memory only, for tests)
+    batch_size / max_delay: flush the write buffer after this many records or seconds
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 64, max_delay: float = 1.0):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        import sqlite3  # only when checkpoints are on; keeps it out of the cold start
+        self.db = sqlite3.connect(path or ":memory:")
+        if path:
+            # Appends only; WAL keeps readers off the writer and NORMAL skips an fsync per commit
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                        "session TEXT, seq INTEGER, stage TEXT, record TEXT, created REAL, "
+                        "PRIMARY KEY (session, seq))")
+        self.db.commit()
+        self._pending: List[Tuple[str, int, str, str, float]] = []
+        self._seq: Dict[str, int] = {}
+        self._last_flush = time.monotonic()
+        self.writes = 0
+        self.flushes = 0
+
+    def _next_seq(self, session_id: str) -> int:
+        seq = self._seq.get(session_id)
+        if seq is None:
+            row = self.db.execute("SELECT MAX(seq) FROM checkpoints WHERE session = ?", (session_id,)).fetchone()
+            seq = row[0] + 1 if row[0] is not None else 0
+        self._seq[session_id] = seq + 1
+        return seq
+
+    def append(self, session_id: str, stage: str, record: Dict[str, Any]):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown checkpoint stage: {stage}")
+        if stage == "city":
+            record = {**record, "grid": _rle.encode(record["grid"])}
+        self._pending.append((session_id, self._next_seq(session_id), stage, _dumps(record), time.time()))
+        self.writes += 1
+        if stage == "done":
+            self._seq.pop(session_id, None)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)", self._pending)
+            self._pending = []
+            self.flushes += 1
+        self._last_flush = time.monotonic()
+
+    def load(self, session_id: str) -> Optional[Checkpoint]:
+        """The session's checkpoint, or None if nothing was recorded for it."""
+        self.flush()
+        rows = self.db.execute("SELECT stage, record, created FROM checkpoints WHERE session = ? ORDER BY seq",
+                               (session_id,)).fetchall()
+        if not rows:
+            return None
+        checkpoint = Checkpoint(session_id)
+        for stage, record, created in rows:
+            checkpoint.add(stage, json.loads(record), created)
+        return checkpoint
+
+    def load_many(self, session_ids: Optional[Iterable[str]] = None) -> Dict[str, Checkpoint]:
+        """Checkpoints of several sessions (all of them by default) in one scan."""
+        self.flush()
+        if session_ids is None:
+            rows = self.db.execute("SELECT session, stage, record, created FROM checkpoints ORDER BY session, seq")
+        else:
+            ids = list(session_ids)
+            marks = ",".join("?" * len(ids))
+            rows = self.db.execute(f"SELECT session, stage, record, created FROM checkpoints WHERE session IN ({marks}) "
+                                   "ORDER BY session, seq", ids)
+        checkpoints: Dict[str, Checkpoint] = {}
+        for session_id, stage, record, created in rows:
+            checkpoint = checkpoints.get(session_id)
+            if checkpoint is None:
+                checkpoint = checkpoints[session_id] = Checkpoint(session_id)
+            checkpoint.add(stage, json.loads(record), created)
+        return checkpoints
+
+    def unfinished(self) -> List[str]:
+        """Sessions with records but no 'done' (e.g. interrupted by a restart)."""
+        self.flush()
+        rows = self.db.execute("SELECT session FROM checkpoints GROUP BY session "
+                               "HAVING SUM(stage = 'done') = 0 ORDER BY session")
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"writes": self.writes, "flushes": self.flushes, "pending": len(self._pending),
+                "records_per_flush": self.writes / self.flushes if self.flushes else 0.0}
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+def checkpoints_from_env() -> Optional[CheckpointStore]:
+    """CheckpointStore at $CHECKPOINT_PATH, or None when unset."""
+    path = os.environ.get("CHECKPOINT_PATH")
+    if not path:
+        return None
+    return CheckpointStore(None if path == ":memory:" else path,
+                           batch_size=int(os.environ.get("CHECKPOINT_BATCH", "64")))
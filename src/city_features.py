@@ -0,0 +1,133 @@
+# city_features.py
+"""
+Spatial features of a city map, computed once per city and shared by the
+agents, the placement engine and proposal validation.
+
+The grid is stored as flat row-major lists. Distance fields are Chebyshev
+distances (8-neighbour BFS) to the nearest river, house and forest cell, and
+each field has a summed-area table so the mean over any rectangle is an O(1)
+lookup.
+"""
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+GRASS, FOREST, RIVER, HOUSE, NEW_HOUSE = 0, 1, 2, 3, 10
+
+# Codes each distance field measures to
+FIELDS: Dict[str, Tuple[int, ...]] = {
+    "water": (RIVER,),
+    "houses": (HOUSE, NEW_HOUSE),
+    "forest": (FOREST,),
+}
+
+_NEIGHBOURS_8 = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+
+def _summed_area(values: List[int], rows: int, cols: int) -> List[int]:
+    """(rows+1) x (cols+1) flat summed-area table of a flat rows x cols list."""
+    width = cols + 1
+    table = [0] * ((rows + 1) * width)
+    for r in range(rows):
+        running = 0
+        base = r * cols
+        above = r * width
+        here = (r + 1) * width
+        for c in range(cols):
+            running += values[base + c]
+            table[here + c + 1] = table[above + c + 1] + running
+    return table
+
+
+class CityFeatures:
+    """Precomputed distance fields and buildable mask for one grid."""
+
+    def __init__(self, grid: Sequence[Sequence[int]]):
+        self.rows = len(grid)
+        self.cols = len(grid[0]) if grid else 0
+        self.cells: List[int] = [v for row in grid for v in row]
+        self.buildable: List[int] = [1 if v == GRASS else 0 for v in self.cells]
+        self.distance: Dict[str, List[int]] = {
+            name: self._distance_transform(codes) for name, codes in FIELDS.items()
+        }
+        self._tables: Dict[str, List[int]] = {}
+        self._rebuild_tables()
+
+    @classmethod
+    def from_city(cls, city: dict) -> "CityFeatures":
+        """Build from CityBuilderAgent.build_city_json output."""
+        return cls(city["grid"])
+
+    # --- construction -------------------------------------------------------
+
+    def _distance_transform(self, codes: Tuple[int, ...]) -> List[int]:
+        far = self.rows + self.cols
+        dist = [far] * len(self.cells)
+        queue = deque(i for i, v in enumerate(self.cells) if v in codes)
+        for i in queue:
+            dist[i] = 0
+        self._relax(dist, queue)
+        return dist
+
+    def _relax(self, dist: List[int], queue: deque):
+        R, C = self.rows, self.cols
+        while queue:
+            i = queue.popleft()
+            r, c = divmod(i, C)
+            d = dist[i] + 1
+            for dr, dc in _NEIGHBOURS_8:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < R and 0 <= nc < C:
+                    j = nr * C + nc
+                    if dist[j] > d:
+                        dist[j] = d
+                        queue.append(j)
+
+    def _rebuild_tables(self):
+        for name in ("buildable", *FIELDS):
+            values = self.buildable if name == "buildable" else self.distance[name]
+            self._tables[name] = _summed_area(values, self.rows, self.cols)
+
+    # --- lookups ------------------------------------------------------------
+
+    def index(self, r: int, c: int) -> int:
+        return r * self.cols + c
+
+    def in_bounds(self, r: int, c: int) -> bool:
+        return 0 <= r < self.rows and 0 <= c < self.cols
+
+    def code(self, r: int, c: int) -> int:
+        return self.cells[r * self.cols + c]
+
+    def is_buildable(self, r: int, c: int) -> bool:
+        return self.in_bounds(r, c) and self.buildable[r * self.cols + c] == 1
+
+    def dist(self, name: str, r: int, c: int) -> int:
+        return self.distance[name][r * self.cols + c]
+
+    def rect_sum(self, name: str, r: int, c: int, h: int, w: int) -> int:
+        """Sum of a field over the h x w rectangle at (r, c), in O(1)."""
+        t, width = self._tables[name], self.cols + 1
+        r2, c2 = r + h, c + w
+        return t[r2 * width + c2] - t[r * width + c2] - t[r2 * width + c] + t[r * width + c]
+
+    def block_buildable(self, r: int, c: int, h: int, w: int) -> bool:
+        if r < 0 or c < 0 or r + h > self.rows or c + w > self.cols:
+            return False
+        return self.rect_sum("buildable", r, c, h, w) == h * w
+
+    def block_mean(self, name: str, r: int, c: int, h: int, w: int) -> float:
+        return self.rect_sum(name, r, c, h, w) / (h * w)
+
+    def describe_cells(self, cells: Sequence[Sequence[int]]) -> dict:
+        """
+        Nearest distances from a set of cells, in grid steps (diagonals count
+        as 1). Call on the base city's features, before the cells are built.
+        """
+        own = [r * self.cols + c for r, c in cells if self.in_bounds(r, c)]
+        if not own:
+            return {}
+        return {f"distance_to_{name}": min(self.distance[name][i] for i in own) for name in FIELDS}
+
+    def to_grid(self) -> List[List[int]]:
+        C = self.cols
+        return [self.cells[r * C:(r + 1) * C] for r in range(self.rows)]
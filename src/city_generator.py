@@ -0,0 +1,189 @@
+# city_generator.py
+"""
+Seeded procedural city generator: the same legend and rules as the
+CityBuilderAgent prompt, produced locally in milliseconds.
+
+    city = generate_city(rows=10, cols=20, seed=42)   # {"grid": [[...], ...], "seed": 42}
+    errors = validate_city(city["grid"])               # [] when every rule holds
+"""
+import random
+from collections import deque
+from typing import List, Optional
+
+GRASS, FOREST, RIVER, HOUSE = 0, 1, 2, 3
+
+_NEIGHBOURS_4 = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def _river(cells: List[int], rows: int, cols: int, rng: random.Random, width: int):
+    """Meandering river from one edge to the opposite edge, `width` cells wide."""
+    horizontal = cols >= rows if rng.random() < 0.75 else cols < rows
+    length, span = (cols, rows) if horizontal else (rows, cols)
+    width = min(width, span)
+    pos = rng.randrange(0, span - width + 1)
+    held = 0
+    for step in range(length):
+        for k in range(width):
+            r, c = (pos + k, step) if horizontal else (step, pos + k)
+            cells[r * cols + c] = RIVER
+        held += 1
+        # Drift by at most one cell, and only after holding for two slices (with
+        # two more to come), so the bed stays continuous and 2 cells wide throughout
+        if held >= 2 and step + 2 < length:
+            new_pos = max(0, min(span - width, pos + rng.choice((-1, 0, 0, 1))))
+            if new_pos != pos:
+                pos, held = new_pos, 0
+
+
+def _grow(cells: List[int], rows: int, cols: int, rng: random.Random,
+          code: int, target: int, seeds: int):
+    """Grows `seeds` blobs of `code` over grass until `target` cells are covered."""
+    n = rows * cols
+    rand = rng.random
+    frontier: List[int] = []
+    placed = misses = 0
+    while placed < target:
+        if seeds > 0 or not frontier:
+            # Start a new blob (initially, or when every blob has been boxed in)
+            i = int(rand() * n)
+            if cells[i] != GRASS:
+                misses += 1
+                if misses < 1000:
+                    continue
+                # Map is nearly full: pick from whatever grass is left
+                free = [j for j in range(n) if cells[j] == GRASS]
+                if not free:
+                    return
+                i = free[int(rand() * len(free))]
+            misses = 0
+            cells[i] = code
+            frontier.append(i)
+            placed += 1
+            seeds -= 1
+            continue
+
+        k = int(rand() * len(frontier))
+        i = frontier[k]
+        r, c = divmod(i, cols)
+        free = []
+        if r > 0 and cells[i - cols] == GRASS:
+            free.append(i - cols)
+        if r < rows - 1 and cells[i + cols] == GRASS:
+            free.append(i + cols)
+        if c > 0 and cells[i - 1] == GRASS:
+            free.append(i - 1)
+        if c < cols - 1 and cells[i + 1] == GRASS:
+            free.append(i + 1)
+        if not free:
+            frontier[k] = frontier[-1]
+            frontier.pop()
+            continue
+        j = free[int(rand() * len(free))]
+        cells[j] = code
+        frontier.append(j)
+        placed += 1
+
+
+def generate_city(rows: int = 10, cols: int = 20, seed: Optional[int] = None,
+                  houses: Optional[int] = None) -> dict:
+    """
+    Returns {"grid": rows x cols, "seed": seed} following the CityBuilderAgent rules:
+    a continuous river at least 2 cells wide touching the edges, clustered houses
+    (about 10 on a 10x20 map, scaled with area) and roughly equal grass and forest.
+    """
+    if rows < 6 or cols < 6:
+        raise ValueError("grid must be at least 6x6")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    rng = random.Random(seed)
+    area = rows * cols
+    cells = [GRASS] * area
+
+    _river(cells, rows, cols, rng, width=2 + (min(rows, cols) >= 50))
+
+    if houses is None:
+        houses = max(4, round(area / 20))
+    # Clusters of roughly 5 houses, so they read as a village, not scattered cells
+    _grow(cells, rows, cols, rng, HOUSE, houses, seeds=max(1, houses // 5))
+
+    _grow(cells, rows, cols, rng, FOREST, cells.count(GRASS) // 2, seeds=max(1, area // 60))
+
+    grid = [cells[r * cols:(r + 1) * cols] for r in range(rows)]
+    return {"grid": grid, "seed": seed}
+
+
+def _components(grid: List[List[int]], code: int) -> List[List[tuple]]:
+    R, C = len(grid), len(grid[0])
+    seen = [[False] * C for _ in range(R)]
+    components = []
+    for r in range(R):
+        for c in range(C):
+            if grid[r][c] != code or seen[r][c]:
+                continue
+            seen[r][c] = True
+            queue, cells = deque([(r, c)]), []
+            while queue:
+                cr, cc = queue.popleft()
+                cells.append((cr, cc))
+                for dr, dc in _NEIGHBOURS_4:
+                    nr, nc = cr + dr, cc + dc
+                    if 0 <= nr < R and 0 <= nc < C and not seen[nr][nc] and grid[nr][nc] == code:
+                        seen[nr][nc] = True
+                        queue.append((nr, nc))
+            components.append(cells)
+    return components
+
+
+def validate_city(grid, rows: Optional[int] = None, cols: Optional[int] = None,
+                  structure_only: bool = False) -> List[str]:
+    """
+    Checks a grid against the city rules; returns a list of problems (empty if valid).
+    structure_only checks just the shape and legend codes.
+    """
+    errors = []
+    if not isinstance(grid, list) or not grid or not all(isinstance(row, list) for row in grid):
+        return ["grid must be a non-empty list of rows"]
+    R, C = len(grid), len(grid[0])
+    if rows is not None and R != rows:
+        errors.append(f"expected {rows} rows, got {R}")
+    if cols is not None and C != cols:
+        errors.append(f"expected {cols} columns, got {C}")
+    if any(len(row) != C for row in grid):
+        return errors + ["rows have different lengths"]
+    if any(v not in (GRASS, FOREST, RIVER, HOUSE) for row in grid for v in row):
+        return errors + ["grid may only contain the codes 0, 1, 2, 3"]
+    if structure_only:
+        return errors
+
+    river = _components(grid, RIVER)
+    if len(river) != 1:
+        errors.append(f"river must be one continuous course, found {len(river)} pieces")
+    elif not any(r in (0, R - 1) or c in (0, C - 1) for r, c in river[0]):
+        errors.append("river must touch an edge of the map")
+    if river:
+        cells = set(river[0]) if len(river) == 1 else {rc for part in river for rc in part}
+        # At least 2 wide: every river cell is part of some 2x2 river square
+        thin = [
+            (r, c) for r, c in cells
+            if not any(all((r + a, c + b) in cells for a in (0, dr) for b in (0, dc))
+                       for dr in (-1, 1) for dc in (-1, 1))
+        ]
+        if thin:
+            errors.append(f"river must be at least 2 cells wide ({len(thin)} narrow cells)")
+
+    houses = _components(grid, HOUSE)
+    n_houses = sum(len(h) for h in houses)
+    if n_houses == 0:
+        errors.append("map has no houses")
+    elif max(len(h) for h in houses) < min(n_houses, 3):
+        errors.append("houses must be clustered, not scattered")
+
+    grass = sum(row.count(GRASS) for row in grid)
+    forest = sum(row.count(FOREST) for row in grid)
+    if grass and forest:
+        ratio = forest / grass
+        if not 0.5 <= ratio <= 2.0:
+            errors.append(f"grass and forest should be roughly equal ({grass} grass, {forest} forest)")
+    else:
+        errors.append("map needs both grass and forest")
+    return errors
@@ -0,0 +1,373 @@
+# engine.py
+"""
+Negotiation engine: builds a city and runs the developer/resident rounds,
+independent of Chainlit.
+
+    engine = NegotiationEngine(city_builder, developer, resident, renderer)
+    result = await engine.run(sink=LogSink())
+
+The Chainlit app runs it with a ChainlitSink; batch.py runs thousands of them
+concurrently with a NullSink.
+
+With candidates=k > 1 each render asks for k placements at once and the
+Pareto-best goes forward (see candidates.py). With compromise_tolerance set,
+the negotiation also ends as soon as a rendered proposal is within that
+tolerance of the locally computed compromise.
+
+With a CheckpointStore, every completed stage is recorded, and
+run(resume=True) picks a session up where it stopped (see checkpoints.py).
+Restored stages are replayed to the sink unless the chat already shows them
+(run(shown_until=...)).
+
+Maps are posted through a per-session MapView: the base city once, then each
+proposal as the cells around it (see map_render.py).
+
+build_engine registers the agents in an AgentRegistry instead of constructing
+them: each is imported and built the first time a negotiation needs it, then
+shared by every session (see registry.py).
+"""
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from candidates import Compromise, objectives, select_candidate
+from checkpoints import Checkpoint, CheckpointStore
+from city_features import CityFeatures
+from history import NegotiationHistory
+from llm_client import LLMClient, current_session, get_client
+from map_render import MapView, current_map
+from proposal import Proposal
+from registry import AgentRegistry
+from response_cache import CachedClient, ResponseCache, parse_policy
+from sinks import NullSink, OutputSink, current_sink
+from telemetry import SessionTelemetry, current_telemetry, span
+from utils import new_house_cells
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NegotiationResult:
+    session_id: str
+    city_source: str
+    seed: Optional[int]
+    rounds: int
+    terminated_by: Optional[str]  # "developer", "resident", "compromise" or None (ran out of rounds)
+    final_cells: List[List[int]]
+    latency_s: float
+    tokens: Dict[str, int] = field(default_factory=dict)
+    timings: List[Dict[str, Any]] = field(default_factory=list)
+    history: Dict[str, Any] = field(default_factory=dict)
+    telemetry: Dict[str, Any] = field(default_factory=dict)
+    restored_stages: int = 0  # agent turns and renders replayed from a checkpoint instead of re-run
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _RunState:
+    """What one negotiation's stages share."""
+    session_id: str
+    sink: OutputSink
+    grid: List[List[int]]  # the base city
+    features: CityFeatures
+    compromise: Optional[Compromise]
+    checkpoint: Optional[Checkpoint]
+    history: NegotiationHistory
+    proposal_grid: List[List[int]]
+    shown_until: Optional[float] = None  # restored stages recorded before this are already in the chat
+    timings: List[Dict[str, Any]] = field(default_factory=list)
+    restored: int = 0
+
+
+class NegotiationEngine:
+    def __init__(self, city_builder=None, developer=None, resident=None, renderer=None,
+                 client: Optional[LLMClient] = None, max_rounds: int = 4,
+                 history_token_budget: int = 1200, post_telemetry: bool = True,
+                 candidates: int = 1, candidate_mode: str = "gather",
+                 compromise_tolerance: Optional[float] = None,
+                 checkpoints: Optional[CheckpointStore] = None,
+                 agents: Optional[AgentRegistry] = None, map_mode: str = "auto"):
+        # Agents passed in directly win over the registry's factories
+        self.agents = agents or AgentRegistry()
+        for role, agent in (("city_builder", city_builder), ("developer", developer),
+                            ("resident", resident), ("renderer", renderer)):
+            if agent is not None:
+                self.agents.add(role, agent)
+        self.client = client or get_client()
+        self.max_rounds = max_rounds
+        self.history_token_budget = history_token_budget
+        # Post the per-stage latency/token summary to the sink when a negotiation ends
+        self.post_telemetry = post_telemetry
+        # Speculative renders: k candidates per render, sampled with n=k or k gathered calls
+        self.candidates = candidates
+        self.candidate_mode = candidate_mode
+        self.compromise_tolerance = compromise_tolerance
+        # Durable per-stage records, so run(resume=True) continues a negotiation
+        self.checkpoints = checkpoints
+        # How maps are posted: "auto", "emoji", "svg" or "full" (see map_render)
+        self.map_mode = map_mode
+
+    @property
+    def city_builder(self):
+        return self.agents.get("city_builder")
+
+    @property
+    def developer(self):
+        return self.agents.get("developer")
+
+    @property
+    def resident(self):
+        return self.agents.get("resident")
+
+    @property
+    def renderer(self):
+        return self.agents.get("renderer")
+
+    async def run(self, sink: Optional[OutputSink] = None, session_id: Optional[str] = None,
+                  city_mode: Optional[str] = None, seed: Optional[int] = None,
+                  resume: bool = False, shown_until: Optional[float] = None) -> NegotiationResult:
+        """
+        resume: continue session_id from its checkpoint (if the engine has a store
+        and one was recorded); completed stages are replayed to the sink, not re-run.
+        shown_until: when the chat's last message was posted (epoch seconds), for a
+        resumed thread whose messages were persisted; restored stages recorded
+        before it are not sent to the sink again.
+        """
+        sink = sink or NullSink()
+        session_id = session_id or uuid.uuid4().hex
+        # All read by the agents / shared client further down this task
+        current_session.set(session_id)
+        current_sink.set(sink)
+        telemetry = SessionTelemetry(session_id)
+        current_telemetry.set(telemetry)
+        start = time.perf_counter()
+        try:
+            checkpoint = None
+            if resume and self.checkpoints is not None:
+                with span("restore") as s:
+                    checkpoint = self.checkpoints.load(session_id)
+                    s.set(stages=len(checkpoint.stages) if checkpoint else 0)
+
+            # 1) Build city (or take it from the checkpoint)
+            if checkpoint is not None and checkpoint.city is not None:
+                city = checkpoint.city
+            else:
+                with span("city_build", role="city_builder", model=self.city_builder.model) as s:
+                    city = await self.city_builder.build_city_json(mode=city_mode, seed=seed)
+                    s.set(source=city.get("source", "llm"))
+                self._checkpoint(session_id, "city", {"grid": city["grid"], "source": city.get("source", "llm"),
+                                                      "seed": city.get("seed")})
+            grid = city["grid"]
+            features = CityFeatures.from_city(city)  # computed once, shared by every stage below
+            compromise = None
+            if self.candidates > 1 or self.compromise_tolerance is not None:
+                with span("compromise"):
+                    compromise = Compromise(features)
+            view = MapView(grid, mode=self.map_mode)
+            current_map.set(view)
+            # The base map is already in every agent payload; history only holds the rounds
+            state = _RunState(session_id, sink, grid, features, compromise, checkpoint,
+                              history=NegotiationHistory(token_budget=self.history_token_budget),
+                              proposal_grid=grid, shown_until=shown_until)
+            restored_city = checkpoint is not None and checkpoint.city is not None
+            await view.show_base(self._replay_sink(state, checkpoint.city_created) if restored_city else sink,
+                                 "city_builder_agent")
+            first_turn = True
+            terminated_by = None
+            rounds = 0
+
+            # 2) Iterative negotiation rounds
+            for round_no in range(self.max_rounds):
+                rounds = round_no + 1
+
+                # Developer
+                developer_reasoning = await self._reason(state, round_no, "developer", self.developer,
+                                                         first_turn=first_turn)
+                if "TERMINATE" in developer_reasoning:
+                    terminated_by = "developer"
+                    break
+
+                agreed = await self._render(state, round_no, "developer", developer_reasoning)
+                first_turn = False
+                if agreed:
+                    terminated_by = "compromise"
+                    break
+
+                # Resident
+                resident_reasoning = await self._reason(state, round_no, "resident", self.resident)
+                if "TERMINATE" in resident_reasoning:
+                    terminated_by = "resident"
+                    break
+
+                agreed = await self._render(state, round_no, "resident", resident_reasoning)
+                if agreed:
+                    terminated_by = "compromise"
+                    break
+
+            if checkpoint is None or checkpoint.done is None:
+                self._checkpoint(session_id, "done", {"rounds": rounds, "terminated_by": terminated_by})
+            if self.checkpoints is not None:
+                self.checkpoints.flush()  # don't leave the session's last records to the next append
+            await sink.status(f"✅ Negotiation finished after {rounds} rounds")
+            if self.post_telemetry:
+                await sink.send("telemetry", telemetry.render())
+
+            result = NegotiationResult(
+                session_id=session_id,
+                city_source=city.get("source", "llm"),
+                seed=city.get("seed"),
+                rounds=rounds,
+                terminated_by=terminated_by,
+                final_cells=new_house_cells(state.proposal_grid),
+                latency_s=time.perf_counter() - start,
+                tokens=self.client.pop_usage(session_id),
+                timings=state.timings,
+                history=state.history.to_dict(),
+                telemetry=telemetry.summary(),
+                restored_stages=state.restored,
+            )
+            # Per-round timings were logged as they happened (see _timing); this closes the session
+            if result.restored_stages:
+                logger.info("Resumed %s: %s stages restored from checkpoint", session_id, result.restored_stages)
+            logger.info("Negotiation %s finished after %s rounds (terminated by %s), %.1fs, tokens %s",
+                        session_id, rounds, terminated_by, result.latency_s, result.tokens)
+            return result
+        finally:
+            # Already popped into the result on success; a session that raised would otherwise
+            # keep its usage entry for the life of the server
+            self.client.pop_usage(session_id)
+
+    def _checkpoint(self, session_id: str, stage: str, record: Dict[str, Any]):
+        if self.checkpoints is not None:
+            self.checkpoints.append(session_id, stage, record)
+
+    @staticmethod
+    def _replay_sink(state: "_RunState", created: Optional[float]) -> OutputSink:
+        """Where a restored stage is replayed: nowhere if the chat already shows it."""
+        if state.shown_until is not None and created is not None and created <= state.shown_until:
+            return NullSink()
+        return state.sink
+
+    async def _reason(self, state: "_RunState", round_no: int, speaker: str, agent, **kwargs) -> str:
+        """One agent turn: from the checkpoint if it completed before, else from the model."""
+        restored = state.checkpoint.get(round_no, speaker, "reasoning") if state.checkpoint else None
+        if restored is not None:
+            reasoning = restored["text"]
+            state.restored += 1
+            await self._replay_sink(state, restored.get("created")).send(agent.author, reasoning)
+        else:
+            with span("reasoning", round=round_no, role=speaker, model=agent.model):
+                result = await agent.reason(
+                    grid=state.proposal_grid,
+                    negotiation_history=state.history.render(),
+                    features=state.features,
+                    base_grid=state.grid,
+                    **kwargs,
+                )
+            reasoning = result.text
+            state.timings.append(self._timing(round_no, speaker, "reasoning", result.total, result.ttft))
+            self._checkpoint(state.session_id, "reasoning", {"round": round_no, "speaker": speaker, "text": reasoning})
+        state.history.add(round_no, speaker, reasoning)
+        return reasoning
+
+    async def _render(self, state: "_RunState", round_no: int, speaker: str, reasoning: str) -> bool:
+        """Updates the proposal grid; returns whether it is close enough to the compromise to stop."""
+        grid, features, compromise = state.grid, state.features, state.compromise
+        restored = state.checkpoint.get(round_no, speaker, "render") if state.checkpoint else None
+        if restored is not None:
+            state.restored += 1
+            proposal = Proposal(cells=restored["cells"], source=restored["source"])
+            # The renderer posts to current_sink; the map view still tracks the proposal either way
+            token = current_sink.set(self._replay_sink(state, restored.get("created")))
+            try:
+                proposal = await self.renderer.replay(grid, proposal)
+            finally:
+                current_sink.reset(token)
+        else:
+            render_start = time.perf_counter()
+            with span("render", round=round_no, role="render", model=self.renderer.model, proposal_of=speaker) as s:
+                if self.candidates > 1:
+                    proposals = await self.renderer.render_candidates(
+                        grid, reasoning, self.candidates, features=features, mode=self.candidate_mode
+                    )
+                    with span("select") as sel:
+                        chosen = select_candidate(features, proposals, compromise, speaker)
+                        sel.set(candidates=len(proposals))
+                    proposal = await self.renderer.publish(grid, chosen.proposal if chosen else proposals[0])
+                else:
+                    proposal = await self.renderer.render_proposal(grid, prosposal_as_text=reasoning, features=features)
+                s.set(source=proposal.source, reasks=proposal.reasks)
+            state.timings.append(self._timing(round_no, speaker, "render", time.perf_counter() - render_start))
+            self._checkpoint(state.session_id, "render", {"round": round_no, "speaker": speaker,
+                                                          "cells": proposal.cells, "source": proposal.source})
+        agreed = False
+        if proposal.ok:  # a failed render keeps the last good grid
+            state.proposal_grid = proposal.grid
+            state.history.set_cells(proposal.cells)
+            if self.compromise_tolerance is not None:
+                agreed = compromise.reached(*objectives(features, proposal.cells), self.compromise_tolerance)
+        await state.history.compact()
+        return agreed
+
+    @staticmethod
+    def _timing(round_no, speaker, stage, total, ttft=None) -> Dict[str, Any]:
+        timing = {"round": round_no, "speaker": speaker, "stage": stage, "total_s": round(total, 4)}
+        if ttft is not None:
+            timing["ttft_s"] = round(ttft, 4)
+        logger.info("Round %s %s %s: %s", round_no, speaker, stage,
+                    f"ttft {ttft:.2f}s, total {total:.2f}s" if ttft is not None else f"total {total:.2f}s")
+        return timing
+
+
+def build_engine(model: str = "gpt-4o-mini", placement_backend: str = "llm", stream: bool = True,
+                 max_rounds: int = 4, history_token_budget: int = 1200,
+                 client: Optional[LLMClient] = None, cache: Optional[ResponseCache] = None,
+                 cache_policy: Optional[Dict[str, str]] = None, candidates: int = 1,
+                 candidate_mode: str = "gather", compromise_tolerance: Optional[float] = None,
+                 checkpoints: Optional[CheckpointStore] = None, map_mode: str = "auto") -> NegotiationEngine:
+    """
+    The standard agent line-up, all on one shared client. With a cache, each
+    agent's calls go through it with that agent's policy (see response_cache).
+    Agents are registered, not built: each one is imported and constructed
+    when a negotiation first needs it.
+    """
+    client = client or get_client()
+    policy = cache_policy or parse_policy(None)
+
+    def client_for(role):
+        if cache is None or policy.get(role, "bypass") == "bypass":
+            return client
+        return CachedClient(client, cache, policy[role])
+
+    def city_builder():
+        from agents.city_builder_agent import CityBuilderAgent
+        return CityBuilderAgent(client=client_for("city_builder"), model=model)
+
+    def developer():
+        from agents.developer_reasoning_agent import DeveloperReasoningAgent
+        return DeveloperReasoningAgent(model=model, client=client_for("developer"), stream=stream)
+
+    def resident():
+        from agents.resident_reasoning_agent import ResidentReasoningAgent
+        return ResidentReasoningAgent(model=model, client=client_for("resident"), stream=stream)
+
+    def renderer():
+        from agents.render_proposal_agent import RenderProposalAgent
+        return RenderProposalAgent(model=model, client=client_for("render"), backend=placement_backend)
+
+    return NegotiationEngine(
+        agents=AgentRegistry({"city_builder": city_builder, "developer": developer,
+                              "resident": resident, "renderer": renderer}),
+        client=client,
+        max_rounds=max_rounds,
+        history_token_budget=history_token_budget,
+        candidates=candidates,
+        candidate_mode=candidate_mode,
+        compromise_tolerance=compromise_tolerance,
+        checkpoints=checkpoints,
+        map_mode=map_mode,
+    )
@@ -0,0 +1,235 @@
+# fake_openai.py
+"""
+Deterministic, in-process stand-in for AsyncOpenAI's chat completions.
+
+    fake = FakeOpenAI(latency=0.2, jitter=0.05, error_rate=0.02, seed=1)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.01))
+
+Each request is routed by its system prompt to one of the four agent roles
+and answered by a simple rule (or by `script`), so whole negotiations run
+offline: the city builder gets a procedural map, the render agent gets a
+valid 8-cell block from the local placement engine, and the developer /
+resident trade fixed positions until the developer accepts after
+`terminate_after` resident turns. Latency, jitter and injected errors
+(raised with a `status_code`, like the SDK's) are drawn from one seeded RNG.
+Streaming (`stream=True`) and usage chunks are supported, and so is `n` for
+non-streamed requests: render choice i (offset by the request's `seed`, if
+any) is the i-th best block, the way sampling gives alternative placements.
+
+Prompt caching is simulated like the provider does it: usage reports as
+`prompt_tokens_details.cached_tokens` the longest message-aligned prefix seen
+before, once it reaches `cache_min_tokens`.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Union
+
+from city_generator import generate_city
+from grid_codec import parse_base_map_message
+from history import estimate_tokens
+from placement import LocalPlacementEngine
+
+ROLES = {
+    "city_builder": "Generate a compact city map",
+    "render": "generates housing proposals",
+    "developer": "developer agent",
+    "resident": "resident of an imaginary village",
+}
+
+DEVELOPER_TEXT = (
+    "- The grass beside the river has the best views.\n"
+    "- It is also close to the existing houses, so access is good.\n"
+    "I recommend the new houses go on the grass right next to the river, near the existing houses."
+)
+DEVELOPER_ACCEPT = "The residents' counter proposal is close enough to houses and water. TERMINATE NEGOTIATION"
+RESIDENT_TEXT = (
+    "- The developer's block would crowd our existing houses.\n"
+    "- We want to protect the river banks.\n"
+    "We propose the new houses go far away from the existing houses, in the far corner of the village."
+)
+
+# Alternative render choices come from this many best blocks
+RANKED_BLOCKS = 32
+
+Script = Union[List[str], Callable[[dict], str]]
+
+
+class FakeAPIError(Exception):
+    """Raised for injected failures; LLMClient retries it like an openai.APIStatusError."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Injected HTTP {status_code}")
+        self.status_code = status_code
+
+
+def role_of(messages: List[dict]) -> str:
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    for role, marker in ROLES.items():
+        if marker in system:
+            return role
+    return "unknown"
+
+
+def _usage(prompt: str, completion: str):
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+def _chunk(content: Optional[str] = None, usage=None):
+    choices = [] if content is None else [SimpleNamespace(delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _FakeStream:
+    def __init__(self, pieces: List[str], usage, delay: float):
+        self.pieces = pieces
+        self.usage = usage
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            if self.closed:
+                return
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield _chunk(piece)
+        yield _chunk(usage=self.usage)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeOpenAI:
+    """
+    latency / jitter: seconds before the response (or first token), +/- uniform jitter
+    token_latency: seconds between streamed chunks
+    error_rate / error_status: probability and HTTP status of an injected failure
+    terminate_after: resident turns seen in the history before the developer accepts
+    script: per-role list of replies (cycled) or callable(request) -> reply, overriding the rules
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, token_latency: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 429, seed: int = 0,
+                 terminate_after: int = 2, script: Optional[Dict[str, Script]] = None,
+                 cache_min_tokens: int = 1024):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.terminate_after = terminate_after
+        self.script = script or {}
+        self.cache_min_tokens = cache_min_tokens
+        self._prefixes: "OrderedDict[int, int]" = OrderedDict()  # hash of message prefix -> tokens
+        self.rng = random.Random(seed)
+        self.placement = LocalPlacementEngine()
+        self._rankings: "OrderedDict[tuple, list]" = OrderedDict()
+        self.calls: Dict[str, int] = {}
+        self.errors = 0
+        self.reply_s = 0.0  # CPU time spent composing replies, so benchmarks can subtract it
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        messages = kwargs.get("messages", [])
+        role = role_of(messages)
+        n = self.calls.get(role, 0)
+        self.calls[role] = n + 1
+
+        delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        failed = self.error_rate and self.rng.random() < self.error_rate
+        if delay:
+            await asyncio.sleep(delay)
+        if failed:
+            self.errors += 1
+            raise FakeAPIError(self.error_status)
+
+        start = time.perf_counter()
+        texts = [self.reply(role, n, kwargs, choice=i) for i in range(kwargs.get("n") or 1)]
+        text = texts[0]
+        self.reply_s += time.perf_counter() - start
+        usage = _usage("".join(str(m.get("content", "")) for m in messages), "".join(texts))
+        usage.prompt_tokens_details = SimpleNamespace(cached_tokens=self._cached_tokens(messages))
+        if kwargs.get("stream"):
+            # Word-sized chunks, the way tokens arrive from the real API
+            return _FakeStream(re.findall(r"\S+\s*|\s+", text), usage, self.token_latency)
+        choices = [SimpleNamespace(index=i, message=SimpleNamespace(role="assistant", content=t), finish_reason="stop")
+                   for i, t in enumerate(texts)]
+        return SimpleNamespace(choices=choices, usage=usage, model=kwargs.get("model"))
+
+    def _cached_tokens(self, messages: List[dict]) -> int:
+        cached, tokens, prefix = 0, 0, []
+        for m in messages:
+            prefix.append(f"{m['role']}\0{m.get('content', '')}")
+            tokens += estimate_tokens(str(m.get("content", "")))
+            key = hash("\0\0".join(prefix))
+            if key in self._prefixes:
+                cached = tokens
+                self._prefixes.move_to_end(key)
+            else:
+                self._prefixes[key] = tokens
+        while len(self._prefixes) > 10000:
+            self._prefixes.popitem(last=False)
+        return cached if cached >= self.cache_min_tokens else 0
+
+    def reply(self, role: str, n: int, request: dict, choice: int = 0) -> str:
+        scripted = self.script.get(role)
+        if callable(scripted):
+            return scripted(request)
+        if scripted:
+            return scripted[n % len(scripted)]
+
+        payload = _user_payload(request)
+        if role == "city_builder":
+            return json.dumps({"grid": generate_city(10, 20, seed=self.rng.randrange(2 ** 31))["grid"]})
+        if role == "render":
+            rank = (request.get("seed") or 0) + choice
+            ranked = self._ranked(request, payload.get("prosposal_as_text"))
+            cells = ranked[min(rank, len(ranked) - 1)] if ranked else None
+            return json.dumps({"cells": [{"row": r, "col": c} for r, c in cells or []],
+                               "justification": "fake placement"})
+        if role == "developer":
+            history = "".join(m["content"] for m in request.get("messages", [])
+                              if m["role"] == "user" and m["content"].startswith("Negotiation history:"))
+            if len(re.findall(r"Round \d+ resident:", history)) >= self.terminate_after:
+                return DEVELOPER_ACCEPT
+            return DEVELOPER_TEXT
+        if role == "resident":
+            return RESIDENT_TEXT
+        return "{}"
+
+
+    def _ranked(self, request: dict, text: Optional[str]) -> List[List[List[int]]]:
+        # Every choice and sample for the same map and text shares one ranking
+        base = _base_map_content(request)
+        key = (base, text)
+        ranked = self._rankings.get(key)
+        if ranked is None:
+            grid = parse_base_map_message(base) if base else []
+            ranked = self.placement.candidates(grid, text, RANKED_BLOCKS, allow_ambiguous=True) or []
+            self._rankings[key] = ranked
+            if len(self._rankings) > 256:
+                self._rankings.popitem(last=False)
+        return ranked
+
+
+def _base_map_content(request: dict) -> str:
+    for m in request.get("messages", []):
+        if m["role"] == "user" and m["content"].startswith("Base city map"):
+            return m["content"]
+    return ""
+
+
+def _user_payload(request: dict) -> dict:
+    user = next((m["content"] for m in reversed(request.get("messages", [])) if m["role"] == "user"), "")
+    try:
+        payload = json.loads(user)
+    except (TypeError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
@@ -0,0 +1,238 @@
+# grid_codec.py
+"""
+Grid encodings for LLM payloads.
+
+    codec = codec_for("gpt-4o-mini")
+    base = codec.encode_base(grid)               # sent once, in its own message
+    proposal = codec.encode_proposal(grid, proposal_grid)
+
+json    nested int lists (the original format)
+rows    one string per row, one glyph per cell: "..HH~~F"
+rle     rows run-length encoded: "2.2H2~F"
+sparse  base map as rows (rle for large maps); a proposal is only its overlay,
+        the new-house cells, since the base map is already in the prompt
+
+Every codec decodes what it encodes, so payloads can be checked round-trip.
+
+codec_for(model) picks, per model, the codec whose payloads cost the fewest
+tokens over a negotiation on the example city: the base map once plus a
+proposal per round, counted with the model's own tokenizer when tiktoken is
+installed and estimated at ~4 characters per token otherwise. MODEL_CODECS
+pins a model to a codec instead, and $GRID_CODEC overrides both.
+"""
+import json
+import os
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from history import estimate_tokens
+from utils import EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS, apply_cells_as_new_houses
+
+GLYPHS = {0: ".", 1: "F", 2: "~", 3: "H", 10: "N"}
+CODES = {glyph: code for code, glyph in GLYPHS.items()}
+NAMES = {0: "grass", 1: "forest", 2: "river", 3: "house", 10: "proposed new house"}
+# Above this many cells, sparse sends the base map run-length encoded
+RLE_ABOVE = 5000
+
+Grid = List[List[int]]
+
+
+class GridCodec:
+    name = "json"
+
+    def __init__(self):
+        self._base_cache: "OrderedDict[int, tuple]" = OrderedDict()
+
+    @property
+    def legend(self) -> Dict[str, str]:
+        return {str(code): name for code, name in NAMES.items()}
+
+    def describe(self, grid: Optional[Grid] = None) -> str:
+        return "a list of rows, each a list of cell codes"
+
+    def symbol(self, code: int) -> Any:
+        """How a cell code is written in this encoding (for legends and constraints)."""
+        return code
+
+    def encode(self, grid: Grid) -> Any:
+        return grid
+
+    def decode(self, payload: Any) -> Grid:
+        return [list(row) for row in payload]
+
+    def dumps(self, grid: Grid) -> str:
+        """As text, e.g. for an example in a system prompt."""
+        payload = self.encode(grid)
+        return payload if isinstance(payload, str) else json.dumps(payload)
+
+    def encode_base(self, grid: Grid) -> Any:
+        # The same base map is encoded every round of a session; memoise by identity
+        cached = self._base_cache.get(id(grid))
+        if cached is not None and cached[0] is grid:
+            self._base_cache.move_to_end(id(grid))
+            return cached[1]
+        payload = self.encode(grid)
+        self._base_cache[id(grid)] = (grid, payload)
+        if len(self._base_cache) > 256:
+            self._base_cache.popitem(last=False)
+        return payload
+
+    def encode_proposal(self, base: Grid, grid: Grid) -> Any:
+        return self.encode(grid)
+
+    def decode_proposal(self, base: Grid, payload: Any) -> Grid:
+        return self.decode(payload)
+
+
+class RowsCodec(GridCodec):
+    name = "rows"
+
+    @property
+    def legend(self) -> Dict[str, str]:
+        return {GLYPHS[code]: name for code, name in NAMES.items()}
+
+    def describe(self, grid: Optional[Grid] = None) -> str:
+        return "one line per row (row 0 first), one character per cell (column 0 first)"
+
+    def symbol(self, code: int) -> str:
+        return GLYPHS[code]
+
+    def encode(self, grid: Grid) -> str:
+        return "\n".join("".join(GLYPHS[v] for v in row) for row in grid)
+
+    def decode(self, payload: str) -> Grid:
+        return [[CODES[ch] for ch in line] for line in payload.split("\n")]
+
+
+class RleCodec(RowsCodec):
+    name = "rle"
+
+    def describe(self, grid: Optional[Grid] = None) -> str:
+        return ("one line per row (row 0 first); each run is an optional repeat count then a character, "
+                "e.g. '3.2~' is three grass cells then two river cells")
+
+    def encode(self, grid: Grid) -> str:
+        lines = []
+        for row in grid:
+            runs, c = [], 0
+            while c < len(row):
+                n = 1
+                while c + n < len(row) and row[c + n] == row[c]:
+                    n += 1
+                runs.append(f"{n if n > 1 else ''}{GLYPHS[row[c]]}")
+                c += n
+            lines.append("".join(runs))
+        return "\n".join(lines)
+
+    def decode(self, payload: str) -> Grid:
+        return [[CODES[glyph] for count, glyph in re.findall(r"(\d*)(\D)", line) for _ in range(int(count or 1))]
+                for line in payload.split("\n")]
+
+
+class SparseCodec(RowsCodec):
+    """Base map as rows/rle text; proposals as overlay cells only."""
+
+    name = "sparse"
+
+    def __init__(self):
+        super().__init__()
+        self.rows, self.rle = RowsCodec(), RleCodec()
+
+    def _base_codec(self, grid: Grid) -> RowsCodec:
+        return self.rle if len(grid) * (len(grid[0]) if grid else 0) > RLE_ABOVE else self.rows
+
+    def describe(self, grid: Optional[Grid] = None) -> str:
+        return self._base_codec(grid or []).describe()
+
+    def encode(self, grid: Grid) -> str:
+        return self._base_codec(grid).encode(grid)
+
+    def decode(self, payload: str) -> Grid:
+        return self.rle.decode(payload)  # plain rows are valid rle with every count omitted
+
+    def encode_proposal(self, base: Grid, grid: Grid) -> Dict[str, Any]:
+        cells = [[r, c] for r, row in enumerate(grid) for c, v in enumerate(row) if v != base[r][c]]
+        return {"new_houses": cells}
+
+    def decode_proposal(self, base: Grid, payload: Dict[str, Any]) -> Grid:
+        grid = [row[:] for row in base]
+        for r, c in payload.get("new_houses", []):
+            grid[r][c] = 10
+        return grid
+
+
+CODECS = {"json": GridCodec, "rows": RowsCodec, "rle": RleCodec, "sparse": SparseCodec}
+# Per-model pins; models not listed get the measured choice (see codec_for)
+MODEL_CODECS: Dict[str, str] = {}
+# Tie-break when codecs cost the same tokens: the overlay-only proposal first
+PREFERENCE = ("sparse", "rle", "rows", "json")
+# Reasoning calls per negotiation, as measured against
+MEASURE_ROUNDS = 8
+
+
+def legend_text(codec: GridCodec, codes=(0, 1, 2, 3, 10)) -> str:
+    """'0=grass, 1=forest, ...' in the codec's symbols, for system prompts."""
+    return ", ".join(f"{codec.symbol(code)}={NAMES[code]}" for code in codes)
+
+
+def base_map_message(codec: GridCodec, grid: Grid) -> Dict[str, str]:
+    """The session's base city as its own user message (identical every round)."""
+    encoded = codec.encode_base(grid)
+    if not isinstance(encoded, str):
+        encoded = json.dumps(encoded)
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    return {"role": "user", "content": f"Base city map, {rows} rows x {cols} columns, {codec.describe(grid)}:\n{encoded}"}
+
+
+def parse_base_map_message(content: str) -> Grid:
+    """Inverse of base_map_message for any codec (json lists, or rows/rle text)."""
+    encoded = content.split(":\n", 1)[1]
+    if encoded.startswith("["):
+        return json.loads(encoded)
+    return RleCodec().decode(encoded)  # plain rows are valid rle with every count omitted
+
+
+def strip_proposal(grid: Grid) -> Grid:
+    """The base map under a proposal grid (new houses only ever go on grass)."""
+    return [[0 if v == 10 else v for v in row] for row in grid]
+
+
+def get_codec(name: str) -> GridCodec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown grid codec: {name}")
+    return CODECS[name]()
+
+
+def token_counter(model: str) -> Tuple[str, Callable[[str], int]]:
+    """(name, count) with the model's tiktoken encoding, or the ~4 chars/token estimate without it."""
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception:  # not installed, unknown model, or the encoding can't be fetched
+        return "estimate", estimate_tokens
+    return encoding.name, lambda text: len(encoding.encode(text))
+
+
+def session_tokens(codec: GridCodec, grid: Grid, proposal_grid: Grid, rounds: int,
+                   count: Callable[[str], int]) -> int:
+    """Grid tokens of a negotiation: the base map message once, plus the proposal payload every round."""
+    base = count(base_map_message(codec, grid)["content"])
+    proposal = count(json.dumps({"proposal_grid": codec.encode_proposal(grid, proposal_grid)}))
+    return base + rounds * proposal
+
+
+@lru_cache(maxsize=None)
+def measured_codec(model: str) -> str:
+    """The codec with the fewest grid tokens for `model` on the example city."""
+    _, count = token_counter(model)
+    proposal_grid = apply_cells_as_new_houses(EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS)
+    tokens = {name: session_tokens(get_codec(name), EXAMPLE_GRID, proposal_grid, MEASURE_ROUNDS, count)
+              for name in CODECS}
+    return min(CODECS, key=lambda name: (tokens[name], PREFERENCE.index(name)))
+
+
+def codec_for(model: str) -> GridCodec:
+    """$GRID_CODEC if set, else the model's pin in MODEL_CODECS, else the measured choice."""
+    return get_codec(os.environ.get("GRID_CODEC") or MODEL_CODECS.get(model) or measured_codec(model))
@@ -0,0 +1,130 @@
+# history.py
+"""
+Structured negotiation history.
+
+Each round is stored as a typed record (speaker, reasoning, proposed cells)
+instead of being appended to one growing string with full grid reprs. The
+proposed cells are the diff against the base city, which every agent already
+receives, so no grid is ever repeated. `render()` produces the text the
+reasoning agents see, and `compact()` folds the oldest rounds into a rolling
+summary whenever the rendered history would exceed its token budget.
+"""
+import asyncio
+import math
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, List, Optional, Union
+
+Summarizer = Callable[[str, List["RoundRecord"]], Union[str, Awaitable[str]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/JSON)."""
+    return math.ceil(len(text) / 4)
+
+
+def format_cells(cells: List[List[int]]) -> str:
+    """Rectangles as 'rows 8-9, cols 15-18'; anything else as a cell list."""
+    if not cells:
+        return "none"
+    rows = sorted({r for r, _ in cells})
+    cols = sorted({c for _, c in cells})
+    if len(rows) * len(cols) == len(cells) and rows == list(range(rows[0], rows[-1] + 1)) \
+            and cols == list(range(cols[0], cols[-1] + 1)):
+        span = lambda v: f"{v[0]}-{v[-1]}" if len(v) > 1 else f"{v[0]}"
+        return f"rows {span(rows)}, cols {span(cols)}"
+    return " ".join(f"({r},{c})" for r, c in sorted(map(tuple, cells)))
+
+
+@dataclass
+class RoundRecord:
+    round_no: int
+    speaker: str  # "developer" or "resident"
+    reasoning: str
+    cells: List[List[int]] = field(default_factory=list)
+
+    def render(self) -> str:
+        text = f"Round {self.round_no} {self.speaker}: {self.reasoning}"
+        if self.cells:
+            text += f"\nProposed new houses at: {format_cells(self.cells)}"
+        return text
+
+
+def _recommendation(reasoning: str) -> str:
+    # The closing sentence is where both agents put their recommendation
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", reasoning) if s.strip()]
+    return sentences[-1] if sentences else ""
+
+
+def summarize_locally(previous: str, records: List[RoundRecord]) -> str:
+    """Default summarizer: keep each folded round's recommendation and cells."""
+    lines = [previous] if previous else []
+    for record in records:
+        line = f"Round {record.round_no} {record.speaker}: {_recommendation(record.reasoning)}"
+        if record.cells:
+            line += f" ({format_cells(record.cells)})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class NegotiationHistory:
+    """
+    token_budget: max estimated tokens of the rendered history
+    keep_recent: most recent records (agent turns) always kept verbatim
+    summarizer: folds old records into the summary; may be async (e.g. an LLM call)
+    """
+
+    def __init__(self, token_budget: int = 1200, keep_recent: int = 2,
+                 summarizer: Optional[Summarizer] = None):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or summarize_locally
+        self.records: List[RoundRecord] = []
+        self.summary = ""
+
+    def __bool__(self) -> bool:
+        return bool(self.records or self.summary)
+
+    def add(self, round_no: int, speaker: str, reasoning: str) -> RoundRecord:
+        record = RoundRecord(round_no, speaker, reasoning)
+        self.records.append(record)
+        return record
+
+    def set_cells(self, cells: List[List[int]]):
+        """Attach the rendered proposal to the most recent record."""
+        if self.records:
+            self.records[-1].cells = [list(rc) for rc in cells]
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier rounds:\n{self.summary}")
+        parts.extend(record.render() for record in self.records)
+        return "\n\n".join(parts)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.render())
+
+    async def compact(self):
+        """Fold the oldest records into the summary until the budget is met."""
+        while self.tokens() > self.token_budget and len(self.records) > self.keep_recent:
+            oldest = self.records.pop(0)
+            summary = self.summarizer(self.summary, [oldest])
+            if asyncio.iscoroutine(summary):
+                summary = await summary
+            self.summary = summary
+        # Still over: the summary itself has grown, so drop its oldest lines
+        lines = self.summary.split("\n")
+        while self.tokens() > self.token_budget and len(lines) > 1:
+            lines.pop(0)
+            self.summary = "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"summary": self.summary, "records": [asdict(r) for r in self.records]}
+
+    @classmethod
+    def from_dict(cls, data: dict, **kwargs) -> "NegotiationHistory":
+        history = cls(**kwargs)
+        history.summary = data.get("summary", "")
+        history.records = [RoundRecord(**r) for r in data.get("records", [])]
+        return history
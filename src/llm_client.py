@@ -0,0 +1,363 @@
+# llm_client.py
+"""
+One shared, connection-pooled OpenAI client for every agent and session.
+
+Calls go through a FairScheduler (global and per-model concurrency budgets,
+served round-robin across sessions so one busy session can't starve the
+rest), optional token-bucket rate limits, and retry with exponential backoff
+and full jitter on 429 / 5xx / connection errors.
+
+Agents keep calling `client.chat.completions.create(...)`; the session a call
+belongs to is taken from the `current_session` context variable, which
+main.start() sets once per Chainlit session.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from telemetry import SpanHandle, current_span
+
+current_session: ContextVar[str] = ContextVar("current_session", default="default")
+
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Waits until `tokens` are available; returns the time spent waiting."""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return now - start
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class FairScheduler:
+    """
+    Concurrency slots with a global and per-model budget. Waiting requests
+    are queued per session and granted round-robin across sessions (FIFO
+    within a session).
+    """
+
+    def __init__(self, max_concurrency: int = 16, per_model: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.per_model = dict(per_model or {})
+        self.active = 0
+        self.active_by_model: Dict[str, int] = defaultdict(int)
+        self.max_queue_depth = 0
+        self._queues: Dict[str, Deque[Tuple[str, asyncio.Future]]] = {}
+        self._order: Deque[str] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _can_run(self, model: str) -> bool:
+        if self.active >= self.max_concurrency:
+            return False
+        limit = self.per_model.get(model)
+        return limit is None or self.active_by_model[model] < limit
+
+    def _take(self, model: str):
+        self.active += 1
+        self.active_by_model[model] += 1
+
+    async def acquire(self, model: str, session: str):
+        if not self._queues and self._can_run(model):
+            self._take(model)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        if session not in self._queues:
+            self._queues[session] = deque()
+            self._order.append(session)
+        self._queues[session].append((model, fut))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Granted and cancelled in the same tick: hand the slot back
+            if fut.done() and not fut.cancelled():
+                self.release(model)
+            else:
+                self._dispatch()
+            raise
+
+    def release(self, model: str):
+        self.active -= 1
+        self.active_by_model[model] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        progressed = True
+        while progressed and self._order:
+            progressed = False
+            for _ in range(len(self._order)):
+                session = self._order.popleft()
+                queue = self._queues[session]
+                model, fut = queue[0]
+                if fut.done():  # cancelled while waiting
+                    queue.popleft()
+                    progressed = True
+                elif self._can_run(model):
+                    queue.popleft()
+                    self._take(model)
+                    fut.set_result(None)
+                    progressed = True
+                # Back of the line either way, so the next grant goes to another session
+                if queue:
+                    self._order.append(session)
+                else:
+                    del self._queues[session]
+                if progressed:
+                    break
+
+
+class SchedulerMetrics:
+    """Counters for the shared client; `snapshot()` is cheap enough to log per round."""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0  # prompt tokens the provider served from its prefix cache
+        self.waits: Deque[float] = deque(maxlen=window)
+
+    def record_wait(self, seconds: float):
+        self.waits.append(seconds)
+
+    def snapshot(self, scheduler: FairScheduler) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+        pct = lambda p: waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "cached_token_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "active": scheduler.active,
+            "queue_depth": scheduler.queue_depth,
+            "max_queue_depth": scheduler.max_queue_depth,
+            "wait_p50_s": pct(0.5),
+            "wait_p95_s": pct(0.95),
+            "wait_max_s": waits[-1] if waits else 0.0,
+        }
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return isinstance(exc, (ConnectionError, asyncio.TimeoutError)) or \
+        type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _pooled_openai_client(max_connections: int, transport: Any = None):
+    """transport: an httpx transport to send requests through instead of the network (tests)."""
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    import httpx
+
+    # Retries are ours (with jitter and fair queueing), so turn the SDK's off
+    return AsyncOpenAI(
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            transport=transport,
+        ),
+    )
+
+
+EMPTY_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "calls": 0}
+
+
+def _cached_tokens(usage: Any) -> int:
+    """usage.prompt_tokens_details.cached_tokens: the prompt prefix served from the provider cache."""
+    if usage is None:
+        return 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    return _usage_field(details, "cached_tokens")
+
+
+def _usage_field(usage: Any, name: str) -> int:
+    if usage is None:
+        return 0
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return value or 0
+
+
+class _ScheduledStream:
+    """Wraps a streamed response so its concurrency slot is released exactly once."""
+
+    def __init__(self, stream, release, on_usage):
+        self._stream = stream
+        self._release = release
+        self._on_usage = on_usage
+
+    def _done(self):
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                if getattr(chunk, "usage", None):
+                    self._on_usage(chunk.usage)
+                yield chunk
+        finally:
+            self._done()
+
+    async def close(self):
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                await close()
+        finally:
+            self._done()
+
+
+class LLMClient:
+    """
+    Drop-in for AsyncOpenAI's `chat.completions.create`, shared across sessions.
+
+    client: any object with `chat.completions.create` (defaults to a pooled AsyncOpenAI)
+    max_concurrency / per_model: in-flight request budgets
+    requests_per_second / per_model_rps: token-bucket rate limits (None = unlimited)
+    """
+
+    def __init__(self, client: Any = None, max_concurrency: int = 16,
+                 per_model: Optional[Dict[str, int]] = None,
+                 requests_per_second: Optional[float] = None,
+                 per_model_rps: Optional[Dict[str, float]] = None,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 20.0):
+        self._client = client
+        self._max_connections = max_concurrency
+        self.scheduler = FairScheduler(max_concurrency, per_model)
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.model_buckets = {m: TokenBucket(r) for m, r in (per_model_rps or {}).items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = SchedulerMetrics()
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _pooled_openai_client(self._max_connections)
+        return self._client
+
+    def backoff(self, attempt: int, exc: Optional[Exception] = None) -> float:
+        hinted = _retry_after(exc) if exc is not None else None
+        if hinted is not None:
+            return min(self.max_delay, hinted)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def create(self, **kwargs):
+        model = kwargs.get("model", "")
+        session = current_session.get()
+        span = current_span.get()  # the agent stage this call belongs to, for tokens/retries
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            if self.bucket:
+                await self.bucket.acquire()
+            if model in self.model_buckets:
+                await self.model_buckets[model].acquire()
+            await self.scheduler.acquire(model, session)
+            self.metrics.record_wait(time.monotonic() - start)
+            self.metrics.requests += 1
+            held = False
+            try:
+                resp = await self.client.chat.completions.create(**kwargs)
+                if kwargs.get("stream"):
+                    # The slot stays taken until the stream is drained or closed
+                    held = True
+                    self.record_usage(session, None)
+                    # Usage arrives in the final chunk (absent if the stream is cut short)
+                    return _ScheduledStream(resp, lambda: self.scheduler.release(model),
+                                            lambda usage: self.record_usage(session, usage, call=False, span=span))
+                self.record_usage(session, getattr(resp, "usage", None), span=span)
+                return resp
+            except Exception as exc:
+                if attempt >= self.max_retries or not _is_retryable(exc):
+                    self.metrics.errors += 1
+                    raise
+                delay = self.backoff(attempt, exc)
+            finally:
+                if not held:
+                    self.scheduler.release(model)
+            self.metrics.retries += 1
+            if span is not None:
+                span.add("retries", 1)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.metrics.snapshot(self.scheduler)
+
+    def record_usage(self, session: str, usage: Any, call: bool = True, span: Optional[SpanHandle] = None):
+        totals = self.usage.setdefault(session, dict(EMPTY_USAGE))
+        totals["calls"] += call
+        prompt, completion = _usage_field(usage, "prompt_tokens"), _usage_field(usage, "completion_tokens")
+        cached = _cached_tokens(usage)
+        totals["prompt_tokens"] += prompt
+        totals["completion_tokens"] += completion
+        totals["cached_tokens"] += cached
+        self.metrics.prompt_tokens += prompt
+        self.metrics.cached_tokens += cached
+        if span is not None:
+            span.add("prompt_tokens", prompt)
+            span.add("completion_tokens", completion)
+            span.add("cached_tokens", cached)
+
+    def pop_usage(self, session: str) -> Dict[str, int]:
+        """Token totals for a session, forgetting them (call once the session ends)."""
+        return self.usage.pop(session, dict(EMPTY_USAGE))
+
+
+_shared: Optional[LLMClient] = None
+
+
+def get_client() -> LLMClient:
+    """The process-wide client every agent uses unless one is passed in."""
+    global _shared
+    if _shared is None:
+        rps = os.environ.get("LLM_REQUESTS_PER_SECOND")
+        _shared = LLMClient(
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "16")),
+            requests_per_second=float(rps) if rps else None,
+        )
+    return _shared
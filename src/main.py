@@ -1,28 +1,55 @@
+import logging
+import os
+from datetime import datetime, timezone
 import chainlit as cl
-from openai import AsyncOpenAI
-from utils import numbers_to_emojis, apply_cells_as_new_houses, update_msg, append_to_history
+from checkpoints import checkpoints_from_env
+from engine import build_engine
+from response_cache import cache_from_env, parse_policy
+from sinks import ChainlitSink
+import telemetry
 
-from agents.city_builder_agent import CityBuilderAgent
-from agents.developer_reasoning_agent import DeveloperReasoningAgent  
-from agents.resident_reasoning_agent import ResidentReasoningAgent
-from agents.render_proposal_agent import RenderProposalAgent
+# One engine (agents + pooled, rate-limited client) shared by every session.
+# Building it is cheap: the agents and the OpenAI client are created by the first session.
+#   PLACEMENT_BACKEND=local places cells with the local engine, LLM only as fallback
+#   STREAM_REASONING=0 waits for whole completions instead of streaming tokens into the chat
+#   MAX_ROUNDS / HISTORY_TOKEN_BUDGET bound the negotiation and the history sent to the agents
+#   LLM_CACHE_PATH / LLM_CACHE_POLICY put a response cache in front of the model (see response_cache)
+#   RENDER_CANDIDATES / CANDIDATE_MODE / COMPROMISE_TOLERANCE turn on speculative renders (see candidates)
+#   CHECKPOINT_PATH records every stage so a resumed chat continues its negotiation (see checkpoints)
+#   MAP_RENDER picks how maps are posted: auto (default), emoji, svg or full (see map_render)
+# Each session's round timings, outcome and tokens are logged by the engine, process-wide stats by report()
+logging.basicConfig()
+logging.getLogger("engine").setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-client = AsyncOpenAI()
-render_proposal = RenderProposalAgent(model="gpt-4o-mini")
-city_builder_agent = CityBuilderAgent(client=client, model="gpt-4o-mini")
-dev_reasoner = DeveloperReasoningAgent(model="gpt-4o-mini")
-resident_reasoner = ResidentReasoningAgent(model="gpt-4o-mini")
+cache = cache_from_env()
+checkpoints = checkpoints_from_env()
+engine = build_engine(
+    model="gpt-4o-mini",
+    placement_backend=os.environ.get("PLACEMENT_BACKEND", "llm"),
+    stream=os.environ.get("STREAM_REASONING", "1") != "0",
+    max_rounds=int(os.environ.get("MAX_ROUNDS", "4")),
+    history_token_budget=int(os.environ.get("HISTORY_TOKEN_BUDGET", "1200")),
+    cache=cache,
+    cache_policy=parse_policy(os.environ.get("LLM_CACHE_POLICY")),
+    candidates=int(os.environ.get("RENDER_CANDIDATES", "1")),
+    candidate_mode=os.environ.get("CANDIDATE_MODE", "gather"),
+    compromise_tolerance=float(os.environ["COMPROMISE_TOLERANCE"]) if os.environ.get("COMPROMISE_TOLERANCE") else None,
+    checkpoints=checkpoints,
+    map_mode=os.environ.get("MAP_RENDER", "auto"),
+)
+
+@cl.set_chat_profiles
+async def chat_profiles():
+    # Picked per session; the profile decides how the map is built
+    return [
+        cl.ChatProfile(name="LLM map", markdown_description="The map builder agent draws the city.", default=True),
+        cl.ChatProfile(name="Procedural map", markdown_description="A seeded local generator draws the city instantly."),
+    ]
 
 @cl.on_chat_start
 async def start():
-    city: dict  # will hold the city data including the grid
-    grid: list[list[int]]  # will hold the numeric grid representation of the city
-    proposal_grid: dict = {}  # will hold the proposed grid from render_proposal
-    emoji_map: str  # will hold the emoji representation of the map
-    developer_reasoning: str  # will hold the reasoning from the developer agent
-    resident_reasoning: str  # will hold the reasoning from the resident agent
-
-    # 1) Build city
     heading = '''
         AGENT CITY 
         ==========
@@ -35,53 +62,48 @@ async def start():
         
         The resident agent negotiates to keep new houses away from existing houses.
     '''
-    await cl.Message(author="city_builder_agent", content=heading).send()    
-    city = await city_builder_agent.build_city_json()
-    grid = city["grid"]
-    emoji_map = numbers_to_emojis(grid)
-    await cl.Message(author="city_builder_agent", content=emoji_map).send()
-    append_to_history(f"Initial city map: {grid}")
-    cl.user_session.set('proposal_grid', grid)
-    cl.user_session.set('first_turn', True)
-
-    # 2) Iterative negotiation rounds
-    for round_no in range(4):  
-
-        # Developer
-        ## Reasoning 
-        developer_reasoning = await dev_reasoner.reason(
-            grid=cl.user_session.get('proposal_grid'),
-            negotiation_history=cl.user_session.get("history"),
-            first_turn=cl.user_session.get('first_turn')
-        )
-        append_to_history(f"Developer reasoning round {round_no}: {developer_reasoning}")
+    await cl.Message(author="city_builder_agent", content=heading).send()
 
-        # Check if developer wants to terminate
-        if "TERMINATE" in developer_reasoning:
-            print("Developer requested termination.")
-            break
+    # Checkpoints are keyed by thread, which outlives the websocket session: after a restart the
+    # browser reconnects with its thread id, so a negotiation recorded for it is continued
+    session_id = cl.context.session.thread_id or cl.user_session.get("id")
+    await engine.run(sink=ChainlitSink(), session_id=session_id, city_mode=_city_mode(),
+                     resume=checkpoints is not None)
+    report()
 
-        ## Propose grid  
-        proposal_grid = await render_proposal.render_proposal(grid, prosposal_as_text=developer_reasoning)
-        cl.user_session.set('proposal_grid', proposal_grid)
-        cl.user_session.set('first_turn', False)
+@cl.on_chat_resume
+async def resume(thread):
+    # Only called with a Chainlit data layer; without checkpoints there is nothing to continue
+    if checkpoints is None:
+        return
+    # The persisted thread already shows what ran before its last message; replay only the rest
+    await engine.run(sink=ChainlitSink(), session_id=thread["id"], city_mode=_city_mode(), resume=True,
+                     shown_until=_last_message_at(thread))
+    report()
 
-        # Resident
-        ## Reasoning 
-        print(cl.user_session.get('proposal_grid'))
-        resident_reasoning = await resident_reasoner.reason(
-            grid=cl.user_session.get('proposal_grid'),
-            negotiation_history=cl.user_session.get("history"),
-        )
-        append_to_history(f"Resident reasoning round {round_no}: {resident_reasoning}")
+@cl.on_chat_end
+async def end():
+    # Commit the buffered checkpoint records of a chat that stopped mid-negotiation
+    if checkpoints is not None:
+        checkpoints.flush()
 
-        # Check if resident wants to terminate
-        if "TERMINATE" in resident_reasoning:
-            print("Resident requested termination.")
-            break
+def _city_mode():
+    return "procedural" if cl.user_session.get("chat_profile") == "Procedural map" else "llm"
 
-        ## Propose grid 
-        proposal_grid = await render_proposal.render_proposal(grid, prosposal_as_text=resident_reasoning)
-        append_to_history(f"Developer proposal grid round {round_no}: {proposal_grid}")
-        cl.user_session.set('proposal_grid', proposal_grid)
+def _last_message_at(thread):
+    # Steps carry ISO UTC "createdAt" stamps; checkpoint records use epoch seconds
+    stamps = [step["createdAt"] for step in thread.get("steps") or [] if step.get("createdAt")]
+    if not stamps:
+        return None
+    last = datetime.fromisoformat(max(stamps).replace("Z", "+00:00"))
+    return (last if last.tzinfo else last.replace(tzinfo=timezone.utc)).timestamp()
 
+def report():
+    # The session's own timings and tokens are logged by the engine; these are process-wide
+    logger.info("LLM client stats: %s", engine.client.stats())
+    logger.info("Proposal render stats: %s", engine.renderer.stats.snapshot())
+    if cache is not None:
+        logger.info("Response cache stats: %s", cache.stats())
+    if checkpoints is not None:
+        logger.info("Checkpoint stats: %s", checkpoints.stats())
+    logger.info("Stage latency across sessions: %s", telemetry.aggregate.snapshot())
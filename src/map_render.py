@@ -0,0 +1,144 @@
+# map_render.py
+"""
+Map messages sized by what changed, not by the map.
+
+Every proposal used to be posted as the whole emoji map again: 200 emoji per
+message on a 10x20 city, 80,000 on a 200x400 one. A MapView renders the base
+city once per session and keeps its emoji rows. After that, each proposal is
+posted as a window of the map around the new cells, in the same emoji, with a
+one-line note of what moved since the previous proposal.
+
+Large bases (more than `svg_cells` cells in "auto" mode) are sent once as an
+SVG image instead of emoji text. The SVG has one path per terrain and one
+short stroke per run of equal cells, with grass as the background.
+
+    view = MapView(grid, mode="auto")
+    current_map.set(view)
+    await view.show_base(sink, "city_builder_agent")
+    await view.show_proposal(sink, "Proposal_render_agent", cells)
+
+mode: "auto" (emoji up to svg_cells, SVG above), "emoji", "svg", or "full"
+(the whole emoji map for the base and every proposal, as before).
+"""
+from contextvars import ContextVar
+from typing import List, Optional, Sequence
+
+from sinks import OutputSink
+from telemetry import span
+from utils import EMOJI, apply_cells_as_new_houses, numbers_to_emojis
+
+MODES = ("auto", "emoji", "svg", "full")
+SVG_GRASS = "#7cc576"
+SVG_COLOURS = {1: "#2e7d32", 2: "#3b82f6", 3: "#a1887f", 10: "#e53935"}
+
+
+def grid_svg(grid: List[List[int]], cell_px: int = 4) -> str:
+    """The grid as an SVG, one unit per cell, drawn `cell_px` pixels wide."""
+    rows, cols = len(grid), len(grid[0]) if grid else 0
+    # Each run of equal cells is a 1-unit stroke along the row centre, placed relative to the
+    # end of the previous run of that terrain so most numbers stay short
+    paths, pens = {}, {}
+    for r, row in enumerate(grid):
+        c = 0
+        while c < cols:
+            value, start = row[c], c
+            while c < cols and row[c] == value:
+                c += 1
+            if value != 0:
+                x, y = pens.get(value, (0, -0.5))
+                paths.setdefault(value, []).append(f"m{start - x} {r - y:g}h{c - start}")
+                pens[value] = (c, r)
+    body = "".join(f'<path stroke="{SVG_COLOURS.get(value, "#000")}" d="{"".join(d)}"/>'
+                   for value, d in sorted(paths.items()))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {cols} {rows}" '
+            f'width="{cols * cell_px}" height="{rows * cell_px}" shape-rendering="crispEdges">'
+            f'<rect width="{cols}" height="{rows}" fill="{SVG_GRASS}"/>{body}</svg>')
+
+
+def _extent(cells: Sequence[Sequence[int]]) -> str:
+    rows = [r for r, _ in cells]
+    cols = [c for _, c in cells]
+    return f"rows {min(rows)}–{max(rows)}, cols {min(cols)}–{max(cols)}"
+
+
+class MapView:
+    """
+    One session's map messages.
+
+    mode: see the module docstring
+    svg_cells: in "auto" mode, bases with more cells than this are sent as SVG
+    context: rows/cols of map shown around a proposal's cells
+    """
+
+    def __init__(self, grid: List[List[int]], mode: str = "auto", svg_cells: int = 2000, context: int = 2):
+        if mode not in MODES:
+            raise ValueError(f"Unknown map render mode: {mode}")
+        self.grid = grid
+        self.mode = mode
+        self.context = context
+        self.svg = mode == "svg" or (mode == "auto" and len(grid) * len(grid[0] if grid else []) > svg_cells)
+        self._glyphs: Optional[List[List[str]]] = None
+        self.previous: List[List[int]] = []
+        self.messages = 0
+        self.bytes_sent = 0
+
+    @property
+    def glyphs(self) -> List[List[str]]:
+        """The base city's emoji, per cell; built once and reused by every proposal."""
+        if self._glyphs is None:
+            self._glyphs = [[EMOJI.get(cell, "❓") for cell in row] for row in self.grid]
+        return self._glyphs
+
+    def base_text(self) -> str:
+        return "\n".join("".join(row) for row in self.glyphs)
+
+    def proposal_text(self, cells: List[List[int]]) -> str:
+        """The proposal as a window of the map around its cells, noting what changed since the last one."""
+        if self.mode == "full":
+            return numbers_to_emojis(apply_cells_as_new_houses(self.grid, cells))
+        new = {(r, c) for r, c in cells}
+        old = {(r, c) for r, c in self.previous}
+        if new == old:
+            return f"Same {len(new)} cells as the previous proposal ({_extent(cells)})."
+        glyphs = self.glyphs
+        r0 = max(0, min(r for r, _ in new) - self.context)
+        r1 = min(len(glyphs) - 1, max(r for r, _ in new) + self.context)
+        c0 = max(0, min(c for _, c in new) - self.context)
+        c1 = min(len(glyphs[0]) - 1, max(c for _, c in new) + self.context)
+        window = "\n".join("".join(EMOJI[10] if (r, c) in new else glyphs[r][c] for c in range(c0, c1 + 1))
+                           for r in range(r0, r1 + 1))
+        note = f"New houses at {_extent(cells)}"
+        if old:
+            kept = len(new & old)
+            note += f" ({kept} kept)" if kept else f", moved from {_extent(self.previous)}"
+        return f"{note}. Map rows {r0}–{r1}, cols {c0}–{c1}:\n{window}"
+
+    async def _send(self, sink: OutputSink, author: str, content: str):
+        self.messages += 1
+        self.bytes_sent += len(content.encode())
+        await sink.send(author, content)
+
+    async def show_base(self, sink: OutputSink, author: str):
+        if self.svg:
+            with span("emoji_render", role="city_builder", format="svg") as s:
+                image = grid_svg(self.grid).encode()
+                s.set(bytes=len(image))
+            self.messages += 1
+            self.bytes_sent += len(image)
+            await sink.image(author, "city.svg", image, "image/svg+xml")
+            return
+        with span("emoji_render", role="city_builder") as s:
+            text = self.base_text()
+            s.set(bytes=len(text.encode()))
+        await self._send(sink, author, text)
+
+    async def show_proposal(self, sink: OutputSink, author: str, cells: List[List[int]]):
+        with span("emoji_render") as s:
+            text = self.proposal_text(cells)
+            s.set(bytes=len(text.encode()))
+        self.previous = [list(cell) for cell in cells]
+        await self._send(sink, author, text)
+
+
+# The session's view, set by the engine; agents used on their own fall back to a fresh one
+current_map: ContextVar[Optional[MapView]] = ContextVar("current_map", default=None)
@@ -0,0 +1,182 @@
+# placement.py
+"""
+Local placement engine: turns developer/resident reasoning text into 8 cells
+without a round trip to the LLM.
+
+The engine enumerates every contiguous 8-cell block that sits entirely on
+grass, parses the spatial intent out of the reasoning text (near water, near
+houses, far from houses, corner/row hints) and picks the best scoring block.
+When the text carries no usable spatial intent, `propose` returns None so the
+caller can fall back to the LLM.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from city_features import CityFeatures
+
+# 8 cells as a rectangle, in both orientations
+BLOCK_SHAPES: Tuple[Tuple[int, int], ...] = ((2, 4), (4, 2))
+
+# keyword -> target the phrase refers to
+_TARGETS = {
+    "water": ("river", "water", "waterfront", "riverside", "riverbank", "stream"),
+    "houses": ("house", "houses", "housing", "homes", "residents", "neighbourhood",
+               "neighborhood", "village", "settlement", "dwellings"),
+}
+_NEAR = ("near", "close to", "next to", "beside", "adjacent", "alongside", "along",
+         "overlooking", "views of", "view of", "by the", "facing", "bordering", "around")
+_FAR = ("away from", "far from", "distance from", "distant from", "removed from",
+        "too close", "too near", "buffer", "keep clear", "separate from", "isolated")
+
+_VERTICAL = {"top": -1.0, "north": -1.0, "upper": -1.0,
+             "bottom": 1.0, "south": 1.0, "lower": 1.0}
+_HORIZONTAL = {"left": -1.0, "west": -1.0, "right": 1.0, "east": 1.0}
+_CENTRE = ("centre", "center", "middle", "central")
+
+
+@dataclass
+class PlacementIntent:
+    """Spatial preferences parsed from a piece of reasoning text.
+
+    Weights are signed: positive means "be close to", negative means
+    "keep away from". Row/column bias is in [-1, 1] (top/left to bottom/right).
+    """
+    water: float = 0.0
+    houses: float = 0.0
+    row_bias: float = 0.0
+    col_bias: float = 0.0
+    centre: float = 0.0
+    signals: List[str] = field(default_factory=list)
+
+    @property
+    def ambiguous(self) -> bool:
+        # Nothing spatial at all, or near/far house cues cancelling out
+        if not self.signals:
+            return True
+        has_location = any([self.row_bias, self.col_bias, self.centre])
+        return self.water == 0 and self.houses == 0 and not has_location
+
+
+def _sentences(text: str) -> List[str]:
+    parts = re.split(r"(?<=[.!?])\s+|\n+", text.lower())
+    return [p.strip(" -*•\t") for p in parts if p.strip(" -*•\t")]
+
+
+def _has_word(sentence: str, word: str) -> bool:
+    return re.search(rf"\b{re.escape(word)}\b", sentence) is not None
+
+
+def parse_intent(text: Optional[str]) -> PlacementIntent:
+    """Extract spatial intent from developer or resident reasoning text."""
+    intent = PlacementIntent()
+    if not text:
+        return intent
+
+    sentences = _sentences(text)
+    for i, sentence in enumerate(sentences):
+        # The closing recommendation carries the decision, so weight it more
+        weight = 2.0 if i >= len(sentences) - 2 else 1.0
+
+        for target, words in _TARGETS.items():
+            if not any(_has_word(sentence, w) for w in words):
+                continue
+            far = any(p in sentence for p in _FAR)
+            near = any(p in sentence for p in _NEAR)
+            if far:
+                delta = -weight
+            elif near:
+                delta = weight
+            else:
+                continue
+            setattr(intent, target, getattr(intent, target) + delta)
+            intent.signals.append(f"{'far' if far else 'near'}:{target}")
+
+        for word, bias in _VERTICAL.items():
+            if _has_word(sentence, word):
+                intent.row_bias += bias * weight
+                intent.signals.append(f"row:{word}")
+        for word, bias in _HORIZONTAL.items():
+            if _has_word(sentence, word):
+                intent.col_bias += bias * weight
+                intent.signals.append(f"col:{word}")
+        if any(_has_word(sentence, w) for w in _CENTRE):
+            intent.centre += weight
+            intent.signals.append("centre")
+
+    # Location hints are a direction, not a strength
+    intent.row_bias = max(-1.0, min(1.0, intent.row_bias))
+    intent.col_bias = max(-1.0, min(1.0, intent.col_bias))
+    return intent
+
+
+def enumerate_blocks(features: CityFeatures) -> List[Tuple[int, int, int, int]]:
+    """All (row, col, height, width) rectangles of 8 cells that lie entirely on grass."""
+    blocks = []
+    for h, w in BLOCK_SHAPES:
+        for r in range(features.rows - h + 1):
+            for c in range(features.cols - w + 1):
+                if features.block_buildable(r, c, h, w):
+                    blocks.append((r, c, h, w))
+    return blocks
+
+
+def block_cells(block: Tuple[int, int, int, int]) -> List[List[int]]:
+    r, c, h, w = block
+    return [[r + i, c + j] for i in range(h) for j in range(w)]
+
+
+class LocalPlacementEngine:
+    """Scores every valid 8-cell block against the parsed intent."""
+
+    def __init__(self):
+        self._grid: Optional[List[List[int]]] = None
+        self._features: Optional[CityFeatures] = None
+
+    def features_for(self, grid: List[List[int]]) -> CityFeatures:
+        # Same base city is rendered many times per session; memoise by identity
+        if grid is not self._grid:
+            self._grid = grid
+            self._features = CityFeatures(grid)
+        return self._features
+
+    def score(self, features: CityFeatures, block, intent: PlacementIntent) -> float:
+        R, C = features.rows, features.cols
+        scale = float(max(R, C))
+        r, c, h, w = block
+        d_water = features.block_mean("water", r, c, h, w) / scale
+        d_house = features.block_mean("houses", r, c, h, w) / scale
+
+        row_pos = ((r + (h - 1) / 2) / max(R - 1, 1)) * 2 - 1  # -1 top, 1 bottom
+        col_pos = ((c + (w - 1) / 2) / max(C - 1, 1)) * 2 - 1  # -1 left, 1 right
+
+        score = -intent.water * d_water - intent.houses * d_house
+        score += intent.row_bias * row_pos + intent.col_bias * col_pos
+        score -= intent.centre * (abs(row_pos) + abs(col_pos)) / 2
+        return score
+
+    def rank(self, features: CityFeatures, intent: PlacementIntent):
+        blocks = enumerate_blocks(features)
+        return sorted(blocks, key=lambda b: (-self.score(features, b, intent), b))
+
+    def propose(self, grid: List[List[int]], text: Optional[str],
+                allow_ambiguous: bool = False,
+                features: Optional[CityFeatures] = None) -> Optional[List[List[int]]]:
+        """
+        Returns 8 [row, col] cells for the best block, or None when the
+        intent is ambiguous (and allow_ambiguous is False) or nothing fits.
+        """
+        best = self.candidates(grid, text, 1, allow_ambiguous, features)
+        return best[0] if best else None
+
+    def candidates(self, grid: List[List[int]], text: Optional[str], k: int,
+                   allow_ambiguous: bool = False,
+                   features: Optional[CityFeatures] = None) -> Optional[List[List[List[int]]]]:
+        """The k best blocks as cell lists, best first; None like `propose`."""
+        intent = parse_intent(text)
+        if intent.ambiguous and not allow_ambiguous:
+            return None
+        ranked = self.rank(features or self.features_for(grid), intent)
+        if not ranked:
+            return None
+        return [block_cells(block) for block in ranked[:k]]
@@ -0,0 +1,49 @@
+# prompt_layout.py
+"""
+Message layout tuned for provider-side prompt caching.
+
+Providers cache the longest previously seen prefix of a prompt, so every agent
+builds its messages stable-first:
+
+    system prompt          identical for every call of the agent
+    legend + constraints   identical for every call of the agent
+    base city              identical for every call in a session
+    history                append-only between compactions
+    current proposal       changes every call
+
+Anything volatile (history, proposal, distances, reasoning text) goes after
+the base city, never inside the stable messages. `PromptLayout.prefix()` is
+what the regression test holds byte-identical across rounds and sessions.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def static_message(content: Dict[str, Any]) -> Dict[str, str]:
+    # sort_keys so the bytes never depend on dict construction order
+    return {"role": "user", "content": json.dumps(content, sort_keys=True)}
+
+
+@dataclass
+class PromptLayout:
+    system: str
+    static: Dict[str, Any]  # legend, constraints, task: the same for every call of the agent
+    base: Optional[Dict[str, str]] = None  # base city message (grid_codec.base_map_message)
+    history: Optional[str] = None
+    current: Dict[str, Any] = field(default_factory=dict)
+
+    def prefix(self) -> List[Dict[str, str]]:
+        """The messages shared by every call of this agent in this session."""
+        messages = [{"role": "system", "content": self.system}, static_message(self.static)]
+        if self.base is not None:
+            messages.append(self.base)
+        return messages
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = self.prefix()
+        if self.history is not None:
+            messages.append({"role": "user", "content": f"Negotiation history:\n{self.history}"})
+        if self.current:
+            messages.append({"role": "user", "content": json.dumps(self.current)})
+        return messages
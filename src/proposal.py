@@ -0,0 +1,156 @@
+# proposal.py
+"""
+Proposal cells: strict output schema, local validation and local repair.
+
+The render agent asks the model for cells under PROPOSAL_SCHEMA (structured
+output, so the shape is always right), then checks them here against the
+rules the prompt can only ask for: 8 unique cells, in bounds, on grass and
+4-connected. Cells that break a rule are snapped to the nearest valid
+8-block (`repair_cells`) before anyone considers asking the model again.
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from city_features import CityFeatures
+from placement import block_cells, enumerate_blocks
+
+CELLS_REQUIRED = 8
+
+PROPOSAL_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "housing_proposal",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "cells": {
+                    "type": "array",
+                    "minItems": CELLS_REQUIRED,
+                    "maxItems": CELLS_REQUIRED,
+                    "items": {
+                        "type": "object",
+                        "properties": {"row": {"type": "integer"}, "col": {"type": "integer"}},
+                        "required": ["row", "col"],
+                        "additionalProperties": False,
+                    },
+                },
+                "justification": {"type": "string"},
+            },
+            "required": ["cells", "justification"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+@dataclass
+class Proposal:
+    """
+    The outcome of one render. `grid` is None when no valid cells could be had,
+    in which case the caller keeps its previous grid.
+
+    source: "local" (placement engine), "llm", "repaired" (snapped locally) or "failed"
+    """
+    cells: List[List[int]]
+    source: str
+    grid: Optional[List[List[int]]] = None
+    justification: str = ""
+    reasks: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.grid is not None
+
+
+def parse_cells(data: Any) -> List[List[int]]:
+    """Cells from a parsed reply: [{"row": r, "col": c}, ...] (schema) or [[r, c], ...] (legacy)."""
+    cells = data.get("cells", []) if isinstance(data, dict) else []
+    parsed = []
+    for cell in cells if isinstance(cells, list) else []:
+        if isinstance(cell, dict) and "row" in cell and "col" in cell:
+            cell = [cell["row"], cell["col"]]
+        if isinstance(cell, (list, tuple)) and len(cell) == 2 and all(isinstance(v, int) for v in cell):
+            parsed.append([cell[0], cell[1]])
+    return parsed
+
+
+def _connected(cells: Sequence[Sequence[int]]) -> bool:
+    remaining = {tuple(rc) for rc in cells}
+    queue = deque([remaining.pop()])
+    while queue:
+        r, c = queue.popleft()
+        for n in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if n in remaining:
+                remaining.remove(n)
+                queue.append(n)
+    return not remaining
+
+
+def validate_cells(features: CityFeatures, cells: Sequence[Sequence[int]]) -> List[str]:
+    """Rule violations (empty when the proposal is valid)."""
+    errors = []
+    if len(cells) != CELLS_REQUIRED:
+        errors.append(f"Expected exactly {CELLS_REQUIRED} cells, got {len(cells)}.")
+    if len({tuple(rc) for rc in cells}) != len(cells):
+        errors.append("Cells must be unique.")
+    for r, c in cells:
+        if not features.in_bounds(r, c):
+            errors.append(f"Cell out of bounds: [{r}, {c}]")
+        elif not features.is_buildable(r, c):
+            errors.append(f"Cell is not buildable grass: [{r}, {c}]")
+    if cells and not errors and not _connected(cells):
+        errors.append("Cells must form one contiguous block.")
+    return errors
+
+
+def repair_cells(features: CityFeatures, cells: Sequence[Sequence[int]]) -> Optional[List[List[int]]]:
+    """
+    Snap to the nearest valid 8-block: the grass rectangle that keeps most of
+    the proposed cells, ties broken by distance between centres. None when
+    nothing usable was proposed or no block fits on the map.
+    """
+    inside = {tuple(rc) for rc in cells if features.in_bounds(*rc)}
+    if not inside:
+        return None
+    blocks = enumerate_blocks(features)
+    if not blocks:
+        return None
+    cr = sum(r for r, _ in inside) / len(inside)
+    cc = sum(c for _, c in inside) / len(inside)
+
+    def cost(block: Tuple[int, int, int, int]):
+        r, c, h, w = block
+        overlap = sum(1 for ir, ic in inside if r <= ir < r + h and c <= ic < c + w)
+        centre = (r + (h - 1) / 2 - cr) ** 2 + (c + (w - 1) / 2 - cc) ** 2
+        return (-overlap, centre)
+
+    return block_cells(min(blocks, key=cost))
+
+
+class ProposalStats:
+    """How often renders needed repair or a re-ask."""
+
+    def __init__(self):
+        self.renders = 0
+        self.valid = 0  # valid as returned (local engine or model)
+        self.repaired = 0
+        self.reasks = 0
+        self.failed = 0
+
+    def add(self, proposal: Proposal):
+        self.renders += 1
+        self.reasks += proposal.reasks
+        if proposal.source == "repaired":
+            self.repaired += 1
+        elif proposal.ok:
+            self.valid += 1
+        else:
+            self.failed += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        n = self.renders or 1
+        return {"renders": self.renders, "repair_rate": self.repaired / n,
+                "reask_rate": self.reasks / n, "failure_rate": self.failed / n}
@@ -0,0 +1,44 @@
+# registry.py
+"""
+Agents built on first use and shared by every session after that.
+
+A registry maps each role to a factory. Nothing is constructed until the
+engine first asks for the role, so a worker can import the app, bind its port
+and answer health checks before any agent (or its client) exists:
+
+    agents = AgentRegistry({"developer": lambda: DeveloperReasoningAgent(model="gpt-4o-mini")})
+    agents.get("developer")   # built here, then returned as-is for every later session
+
+Ready-made agents can be passed as keyword arguments and are used directly.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+ROLES = ("city_builder", "developer", "resident", "renderer")
+
+
+class AgentRegistry:
+    def __init__(self, factories: Optional[Dict[str, Callable[[], Any]]] = None, **agents):
+        self._factories: Dict[str, Callable[[], Any]] = dict(factories or {})
+        self._agents: Dict[str, Any] = {role: agent for role, agent in agents.items() if agent is not None}
+
+    def register(self, role: str, factory: Callable[[], Any]):
+        """Build `role` with `factory` on first use (replacing any agent not yet built)."""
+        self._factories[role] = factory
+
+    def add(self, role: str, agent: Any):
+        """Use an already built agent for `role`."""
+        self._agents[role] = agent
+
+    def get(self, role: str) -> Any:
+        agent = self._agents.get(role)
+        if agent is None:
+            factory = self._factories.get(role)
+            if factory is None:
+                raise KeyError(f"No agent registered for role: {role}")
+            agent = self._agents[role] = factory()
+        return agent
+
+    def built(self) -> List[str]:
+        """Roles whose agent exists, in ROLES order."""
+        return [role for role in ROLES if role in self._agents] + \
+               sorted(role for role in self._agents if role not in ROLES)
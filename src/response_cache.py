@@ -0,0 +1,254 @@
+# response_cache.py
+"""
+Content-addressed cache for chat completions.
+
+Requests are keyed on a sha256 of the model, messages and sampling params
+(not on `stream`, so a recorded reply can be replayed streamed or not). An
+in-memory LRU sits in front of an optional sqlite file, so the cache survives
+restarts and can be shared by batch runs. An n>1 request (speculative
+candidates) is stored as one entry holding every choice.
+
+Each agent gets its own CachedClient with a policy:
+    bypass        always call the model, never store
+    read_through  serve hits, call and store on a miss
+    record        always call the model and store (overwrites)
+    replay        serve hits only; a miss raises CacheMiss (no network at all)
+
+    cache = ResponseCache("responses.sqlite")
+    renderer = RenderProposalAgent(client=CachedClient(get_client(), cache, "read_through"))
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from telemetry import current_span
+
+POLICIES = ("bypass", "read_through", "record", "replay")
+# Request fields that change the reply; everything else (stream, timeouts...) is ignored
+KEY_FIELDS = ("model", "messages", "temperature", "top_p", "n", "max_tokens", "max_completion_tokens",
+              "stop", "seed", "response_format", "presence_penalty", "frequency_penalty", "tools")
+DEFAULT_POLICY = {"city_builder": "bypass", "developer": "bypass", "resident": "bypass",
+                  "render": "read_through"}
+
+
+class CacheMiss(LookupError):
+    """Replay mode found no recorded response for a request."""
+
+
+def cache_key(request: Dict[str, Any]) -> str:
+    keyed = {k: request[k] for k in KEY_FIELDS if k in request}
+    blob = json.dumps(keyed, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def parse_policy(spec: Optional[str]) -> Dict[str, str]:
+    """'replay' (every agent) or 'render=read_through,developer=bypass' on top of the defaults."""
+    policy = dict(DEFAULT_POLICY)
+    if not spec:
+        return policy
+    if "=" not in spec:
+        policy = {role: spec.strip() for role in policy}
+    else:
+        for part in spec.split(","):
+            role, _, value = part.partition("=")
+            policy[role.strip()] = value.strip()
+    for value in policy.values():
+        if value not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {value}")
+    return policy
+
+
+class ResponseCache:
+    """
+    path: sqlite file (None = memory only)
+    max_entries: LRU size held in memory
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.tokens_saved = 0
+        self.db = None
+        if path:
+            import sqlite3  # only workers with a disk cache pay for it
+            self.db = sqlite3.connect(path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                            "key TEXT PRIMARY KEY, model TEXT, content TEXT, usage TEXT, created REAL)")
+            self.db.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute("SELECT content, usage FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = {"content": row[0], "usage": json.loads(row[1]) if row[1] else None}
+                self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, model: str, content: str, usage: Optional[dict] = None):
+        entry = {"content": content, "usage": usage}
+        self._remember(key, entry)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, model, content, json.dumps(usage) if usage else None, time.time()))
+            self.db.commit()
+
+    def _remember(self, key: str, entry: dict):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def record_hit(self, request: Dict[str, Any], entry: dict):
+        self.hits += 1
+        # What never went over the wire: the request body and the reply
+        self.bytes_saved += len(json.dumps(request.get("messages", []))) + len(entry["content"].encode())
+        usage = entry.get("usage") or {}
+        self.tokens_saved += usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+            "entries": len(self.entries),
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+def _usage_dict(usage: Any) -> Optional[dict]:
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    return {"prompt_tokens": get("prompt_tokens") or 0, "completion_tokens": get("completion_tokens") or 0}
+
+
+def _response(content: str, model: Optional[str], n: int = 1):
+    # n>1 entries hold the JSON list of every choice's text
+    contents = json.loads(content) if n > 1 else [content]
+    choices = [SimpleNamespace(index=i, message=SimpleNamespace(role="assistant", content=text), finish_reason="stop")
+               for i, text in enumerate(contents)]
+    return SimpleNamespace(choices=choices, usage=None, model=model, cached=True)
+
+
+class _CachedStream:
+    """Replays a cached reply as a single-chunk stream."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+    async def __aiter__(self):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.content))], usage=None)
+
+    async def close(self):
+        pass
+
+
+class _RecordingStream:
+    """
+    Passes a live stream through and stores its text once drained, or when
+    closed after the caller marked it `completed` (e.g. cut at TERMINATE).
+    """
+
+    def __init__(self, stream, store):
+        self._stream = stream
+        self._store = store
+        self.completed = False
+        self._parts: List[str] = []
+        self._usage = None
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            if getattr(chunk, "usage", None):
+                self._usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                self._parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        # Only a completed (or deliberately closed) stream is stored, never a failed one
+        self._save()
+
+    def _save(self):
+        if self._store is not None:
+            store, self._store = self._store, None
+            store("".join(self._parts), _usage_dict(self._usage))
+
+    async def close(self):
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            await close()
+        # Cut short on purpose: what was streamed is all the caller used. Otherwise the
+        # stream failed part way and nothing is stored
+        if self.completed:
+            self._save()
+
+
+class CachedClient:
+    """`chat.completions.create` through a ResponseCache with one agent's policy."""
+
+    def __init__(self, client: Any, cache: ResponseCache, policy: str = "read_through"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.client = client
+        self.cache = cache
+        self.policy = policy
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        n = kwargs.get("n") or 1
+        if self.policy == "bypass":
+            return await self.client.chat.completions.create(**kwargs)
+
+        key = cache_key(kwargs)
+        # A recorded stream holds only its first choice, so streamed n>1 sampling is never cached
+        if n > 1 and kwargs.get("stream"):
+            if self.policy == "replay":
+                raise CacheMiss(f"Streamed n={n} requests are not recorded ({key[:12]})")
+            return await self.client.chat.completions.create(**kwargs)
+
+        if self.policy in ("read_through", "replay"):
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.cache.record_hit(kwargs, entry)
+                span = current_span.get()
+                if span is not None:
+                    span.set(cache="hit")
+                if kwargs.get("stream"):
+                    return _CachedStream(entry["content"])
+                return _response(entry["content"], kwargs.get("model"), n)
+            self.cache.misses += 1
+            if self.policy == "replay":
+                raise CacheMiss(f"No recorded response for {kwargs.get('model')} request {key[:12]}")
+
+        model = kwargs.get("model", "")
+        resp = await self.client.chat.completions.create(**kwargs)
+        store = lambda content, usage: self.cache.put(key, model, content, usage)
+        if kwargs.get("stream"):
+            return _RecordingStream(resp, store)
+        contents = [choice.message.content or "" for choice in resp.choices]
+        store(contents[0] if n == 1 else json.dumps(contents), _usage_dict(getattr(resp, "usage", None)))
+        return resp
+
+
+def cache_from_env() -> Optional[ResponseCache]:
+    """ResponseCache at $LLM_CACHE_PATH (":memory:" for memory only), or None when unset."""
+    path = os.environ.get("LLM_CACHE_PATH")
+    if not path:
+        return None
+    size = int(os.environ.get("LLM_CACHE_SIZE", "1024"))
+    return ResponseCache(None if path == ":memory:" else path, max_entries=size)
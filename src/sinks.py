@@ -0,0 +1,113 @@
+# sinks.py
+"""
+Output sinks: where the agents post their messages.
+
+Agents never talk to Chainlit directly; they post to `current_sink.get()`,
+which the NegotiationEngine sets for the negotiation it is running. The
+Chainlit app uses ChainlitSink, the batch runner uses LogSink or NullSink, so
+simulations run without a browser session.
+"""
+import logging
+from contextvars import ContextVar
+
+logger = logging.getLogger("agent_city")
+
+
+class StreamHandle:
+    """A message being streamed token by token."""
+
+    async def token(self, text: str):
+        pass
+
+    async def end(self):
+        pass
+
+
+class OutputSink:
+    """Base sink; discards everything."""
+
+    async def send(self, author: str, content: str):
+        pass
+
+    async def status(self, content: str):
+        """Transient progress note, e.g. '⏳ Building map'."""
+
+    async def image(self, author: str, name: str, content: bytes, mime: str):
+        """An inline image, e.g. the SVG city map on large grids."""
+
+    def stream(self, author: str) -> StreamHandle:
+        return StreamHandle()
+
+
+class NullSink(OutputSink):
+    """Drops all output; for batch runs where only the result matters."""
+
+
+class _LogStream(StreamHandle):
+    def __init__(self, author: str):
+        self.author = author
+        self.parts = []
+
+    async def token(self, text: str):
+        self.parts.append(text)
+
+    async def end(self):
+        logger.info("%s: %s", self.author, "".join(self.parts))
+
+
+class LogSink(OutputSink):
+    """Writes messages to the 'agent_city' logger (streams are logged once complete)."""
+
+    async def send(self, author: str, content: str):
+        logger.info("%s: %s", author, content)
+
+    async def status(self, content: str):
+        logger.debug(content)
+
+    async def image(self, author: str, name: str, content: bytes, mime: str):
+        logger.info("%s: [%s, %s, %d bytes]", author, name, mime, len(content))
+
+    def stream(self, author: str) -> StreamHandle:
+        return _LogStream(author)
+
+
+class _ChainlitStream(StreamHandle):
+    def __init__(self, message):
+        self.message = message
+
+    async def token(self, text: str):
+        await self.message.stream_token(text)
+
+    async def end(self):
+        await self.message.send()
+
+
+class ChainlitSink(OutputSink):
+    """Posts to the current Chainlit session."""
+
+    def __init__(self):
+        import chainlit as cl
+        self.cl = cl
+        self._status = None
+
+    async def send(self, author: str, content: str):
+        await self.cl.Message(author=author, content=content).send()
+
+    async def status(self, content: str):
+        # One status message per session, edited in place instead of a new one per step
+        if self._status is None:
+            self._status = self.cl.Message(content=content)
+            await self._status.send()
+        else:
+            self._status.content = content
+            await self._status.update()
+
+    async def image(self, author: str, name: str, content: bytes, mime: str):
+        element = self.cl.Image(name=name, content=content, mime=mime, display="inline")
+        await self.cl.Message(author=author, content="", elements=[element]).send()
+
+    def stream(self, author: str) -> StreamHandle:
+        return _ChainlitStream(self.cl.Message(author=author, content=""))
+
+
+current_sink: ContextVar[OutputSink] = ContextVar("current_sink", default=NullSink())
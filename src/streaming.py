@@ -0,0 +1,74 @@
+# streaming.py
+"""
+Streamed chat completions for the reasoning agents.
+
+Tokens are handed to `on_token` as they arrive (e.g. cl.Message.stream_token),
+and the stream is cancelled as soon as the stop marker shows up, so we stop
+paying for tokens that would be thrown away. Timing (time to first token and
+total latency) is returned with the text.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+TERMINATE_MARKER = "TERMINATE"
+
+
+@dataclass
+class StreamResult:
+    text: str
+    total: float  # seconds from request to last token
+    ttft: Optional[float] = None  # seconds to first token; None when not streamed
+    terminated: bool = False  # stop marker seen, rest of the generation cancelled
+    usage: Any = None
+
+    def timing(self) -> str:
+        ttft = f"{self.ttft:.2f}s" if self.ttft is not None else "n/a"
+        return f"ttft {ttft}, total {self.total:.2f}s" + (" (cut at TERMINATE)" if self.terminated else "")
+
+
+async def stream_chat(client, on_token: Callable[[str], Awaitable[None]],
+                      stop_marker: Optional[str] = TERMINATE_MARKER, **kwargs) -> StreamResult:
+    """Streams `client.chat.completions.create(**kwargs)` into on_token."""
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(
+        stream=True, stream_options={"include_usage": True}, **kwargs
+    )
+    text, ttft, terminated, usage = "", None, False, None
+    completed = False
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if not token:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            text += token
+            await on_token(token)
+            # The marker may straddle chunks, so look a little further back
+            if stop_marker and stop_marker in text[-(len(token) + len(stop_marker)):]:
+                terminated = True
+                break
+        completed = True
+    finally:
+        # Drained or cut at the marker on purpose, not failed; a recording stream only keeps those
+        if completed and hasattr(stream, "completed"):
+            stream.completed = True
+        close = getattr(stream, "close", None)
+        if close is not None:
+            await close()
+    return StreamResult(text=text, total=time.perf_counter() - start, ttft=ttft,
+                        terminated=terminated, usage=usage)
+
+
+async def complete_chat(client, **kwargs) -> StreamResult:
+    """Non-streamed call with the same result shape."""
+    start = time.perf_counter()
+    resp = await client.chat.completions.create(**kwargs)
+    text = resp.choices[0].message.content or ""
+    return StreamResult(text=text, total=time.perf_counter() - start,
+                        terminated=TERMINATE_MARKER in text, usage=getattr(resp, "usage", None))
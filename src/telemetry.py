@@ -0,0 +1,195 @@
+# telemetry.py
+"""
+Per-stage spans: OpenTelemetry when it's installed, plus a local aggregator.
+
+    with span("render", round=2, role="developer", model="gpt-4o-mini") as s:
+        ...
+        s.set(cells=8)
+
+Every span is timed into the session's SessionTelemetry (set by the engine),
+which gives the end-of-negotiation summary (slowest stage, p50/p95 by agent),
+and into a process-wide aggregate for production load. LLMClient adds prompt/
+completion tokens and retries to the innermost open span; inner spans inherit
+round and role from their parent.
+
+OpenTelemetry is configured lazily on the first span. TELEMETRY_EXPORTER
+picks the exporter: "console" (default, one JSON span per line to stderr or
+TELEMETRY_FILE), "otlp" (OTEL_EXPORTER_OTLP_* env vars) or "none". If a
+tracer provider is already configured (e.g. by traceloop), it is used as is.
+"""
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+INHERITED = ("round", "role", "model")
+COUNTERS = ("prompt_tokens", "completion_tokens", "cached_tokens", "retries")
+
+_tracer = None
+_tracer_ready = False
+
+
+def _configure_tracer():
+    """The OTel tracer, or None when OpenTelemetry isn't installed / is switched off."""
+    global _tracer, _tracer_ready
+    if _tracer_ready:
+        return _tracer
+    _tracer_ready = True
+    exporter_name = os.environ.get("TELEMETRY_EXPORTER", "console")
+    if exporter_name == "none":
+        return None
+    try:
+        from opentelemetry import trace
+
+        if type(trace.get_tracer_provider()).__name__ == "ProxyTracerProvider":
+            # The API alone can be installed without the SDK; then spans stay local only
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+            if exporter_name == "otlp":
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                exporter = OTLPSpanExporter()
+            else:
+                # stderr, so span JSON never mixes with results written to stdout (batch.py --out -)
+                path = os.environ.get("TELEMETRY_FILE")
+                exporter = ConsoleSpanExporter(
+                    out=open(path, "a") if path else sys.stderr,
+                    formatter=lambda s: s.to_json(indent=None) + "\n",
+                )
+            provider = TracerProvider(resource=Resource.create({"service.name": "agent_city"}))
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+            trace.set_tracer_provider(provider)
+    except ImportError:
+        return None
+
+    try:
+        # Adds the SDK-level request spans (requirements.txt ships the instrumentation)
+        from opentelemetry.instrumentation.openai import OpenAIInstrumentor
+        OpenAIInstrumentor().instrument()
+    except Exception:
+        pass
+
+    _tracer = trace.get_tracer("agent_city")
+    return _tracer
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def stage_key(record: Dict[str, Any]) -> str:
+    """'reasoning:developer', 'parse:render', 'render'..."""
+    role = record.get("role")
+    return f"{record['name']}:{role}" if role and role != record["name"] else record["name"]
+
+
+class SpanHandle:
+    def __init__(self, name: str, attrs: Dict[str, Any], otel_span=None):
+        self.name = name
+        self.attrs = attrs
+        self.otel_span = otel_span
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, name: str, value: int):
+        """Accumulate a counter (tokens, retries) over every call made inside the span."""
+        self.attrs[name] = self.attrs.get(name, 0) + value
+
+    def record(self) -> Dict[str, Any]:
+        return {"name": self.name, "duration_s": self.duration, **self.attrs}
+
+
+class SessionTelemetry:
+    """Span records of one negotiation, and their summary."""
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]):
+        self.records.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = {}
+        for r in self.records:
+            stage = stages.setdefault(stage_key(r), {"count": 0, "durations": [], **{c: 0 for c in COUNTERS}})
+            stage["count"] += 1
+            stage["durations"].append(r["duration_s"])
+            for c in COUNTERS:
+                stage[c] += r.get(c, 0)
+        for stage in stages.values():
+            durations = stage.pop("durations")
+            stage.update(total_s=sum(durations), p50_s=percentile(durations, 0.5),
+                         p95_s=percentile(durations, 0.95), max_s=max(durations))
+        slowest = max(stages, key=lambda k: stages[k]["total_s"]) if stages else None
+        return {"session_id": self.session_id, "slowest_stage": slowest, "stages": stages}
+
+    def render(self) -> str:
+        """Markdown table for the chat."""
+        summary = self.summary()
+        lines = ["| stage | calls | p50 | p95 | total | tokens in/out | cached | retries |",
+                 "|---|---|---|---|---|---|---|---|"]
+        for key, s in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(f"| {key} | {s['count']} | {s['p50_s']:.2f}s | {s['p95_s']:.2f}s | {s['total_s']:.2f}s "
+                         f"| {s['prompt_tokens']}/{s['completion_tokens']} | {s['cached_tokens']} | {s['retries']} |")
+        return f"Slowest stage: **{summary['slowest_stage']}**\n\n" + "\n".join(lines)
+
+
+class TelemetryAggregate:
+    """Process-wide p50/p95 per stage over the last `window` spans of each."""
+
+    def __init__(self, window: int = 5000):
+        self.window = window
+        self.durations: Dict[str, deque] = {}
+
+    def add(self, record: Dict[str, Any]):
+        self.durations.setdefault(stage_key(record), deque(maxlen=self.window)).append(record["duration_s"])
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {key: {"count": len(d), "p50_s": percentile(list(d), 0.5), "p95_s": percentile(list(d), 0.95)}
+                for key, d in sorted(self.durations.items())}
+
+
+aggregate = TelemetryAggregate()
+current_telemetry: ContextVar[Optional[SessionTelemetry]] = ContextVar("current_telemetry", default=None)
+current_span: ContextVar[Optional[SpanHandle]] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    parent = current_span.get()
+    if parent is not None:
+        for key in INHERITED:
+            if key not in attrs and key in parent.attrs:
+                attrs[key] = parent.attrs[key]
+
+    tracer = _configure_tracer()
+    otel_cm = tracer.start_as_current_span(name) if tracer is not None else None
+    handle = SpanHandle(name, attrs, otel_cm.__enter__() if otel_cm is not None else None)
+    token = current_span.set(handle)
+    start = time.perf_counter()
+    try:
+        yield handle
+    except BaseException as exc:
+        handle.set(error=type(exc).__name__)
+        raise
+    finally:
+        handle.duration = time.perf_counter() - start
+        current_span.reset(token)
+        if otel_cm is not None:
+            for key, value in handle.attrs.items():
+                if value is not None:
+                    handle.otel_span.set_attribute(f"agent_city.{key}", value)
+            otel_cm.__exit__(None, None, None)
+        record = handle.record()
+        session = current_telemetry.get()
+        if session is not None:
+            session.add(record)
+        aggregate.add(record)
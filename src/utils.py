@@ -1,17 +1,33 @@
-from typing import List, Dict
-import chainlit as cl
+from typing import List
+
+# The example city used in the agents' system prompts
+EXAMPLE_GRID = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 2, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 2, 2, 2, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0, 0, 0, 2, 0, 0, 2, 2],
+    [0, 0, 0, 3, 3, 3, 3, 0, 0, 0, 1, 1, 1, 1, 0, 0, 2, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0],
+    [0, 0, 0, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0, 2, 2, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 0, 2, 2, 0, 0],
+    [0, 0, 0, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
+EXAMPLE_PROPOSAL_CELLS = [[8, 15], [8, 16], [8, 17], [8, 18], [9, 15], [9, 16], [9, 17], [9, 18]]
+
+
+EMOJI = {
+    0: "🟩",  # grass
+    1: "🌳",  # forest
+    2: "🟦",  # river
+    3: "🏠",  # house
+    10: "🟥"  # new houses (red overlay)
+}
 
 
 def numbers_to_emojis(grid: list[list[int]]) -> str:
     """Convert a numeric grid into a single emoji string with newlines."""
-    mapping = {
-        0: "🟩",  # grass
-        1: "🌳",  # forest
-        2: "🟦",  # river
-        3: "🏠",  # house
-        10: "🟥"  # new houses (red overlay)
-    }
-    rows = ["".join(mapping.get(cell, "❓") for cell in row) for row in grid]
+    rows = ["".join(EMOJI.get(cell, "❓") for cell in row) for row in grid]
     return "\n".join(rows)
 
 def apply_cells_as_new_houses(grid: List[List[int]], cells: List[List[int]]) -> List[List[int]]:
@@ -20,11 +36,6 @@ def apply_cells_as_new_houses(grid: List[List[int]], cells: List[List[int]]) ->
         new_grid[r][c] = 10  # new houses
     return new_grid
 
-async def update_msg(msg): 
-    reasoning_spinner = cl.Message(content=msg)
-    await reasoning_spinner.send()
-
-def append_to_history(new_entry: str): 
-    previous_history = cl.user_session.get("history", "")
-    updated_history = f"{previous_history}\n\n{new_entry}"
-    cl.user_session.set("history", updated_history)
\ No newline at end of file
+def new_house_cells(grid: List[List[int]]) -> List[List[int]]:
+    """[row, col] of every proposed new house (code 10) in the grid."""
+    return [[r, c] for r, row in enumerate(grid) for c, cell in enumerate(row) if cell == 10]
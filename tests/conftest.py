@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Mirror the Procfile: modules under src/ are imported top-level (PYTHONPATH=src)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
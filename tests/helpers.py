@@ -0,0 +1,22 @@
+from sinks import OutputSink
+
+
+class RecordingSink(OutputSink):
+    """Keeps everything posted to it: (author, content) messages, status notes and images."""
+
+    def __init__(self):
+        self.messages = []
+        self.statuses = []
+        self.images = []
+
+    async def send(self, author, content):
+        self.messages.append((author, content))
+
+    async def status(self, content):
+        self.statuses.append(content)
+
+    async def image(self, author, name, content, mime):
+        self.images.append((author, name, content, mime))
+
+    def authors(self):
+        return [author for author, _ in self.messages]
@@ -0,0 +1,73 @@
+import asyncio
+
+from candidates import Compromise, Scored, objectives, pareto_front, select_candidate
+from city_features import CityFeatures
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+from proposal import Proposal
+from response_cache import CachedClient, ResponseCache
+
+GRID = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 3, 3, 0, 0, 0, 0, 2, 2],
+    [0, 0, 3, 3, 0, 0, 0, 0, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
+NEAR = [[r, c] for r in (1, 2) for c in range(4, 8)]   # by the river and the houses
+FAR = [[r, c] for r in (0, 1) for c in range(0, 4)]    # top left corner
+
+
+def test_objectives_and_pareto_front():
+    features = CityFeatures(GRID)
+    near, far = objectives(features, NEAR), objectives(features, FAR)
+    assert near[0] > far[0]  # the developer prefers the river side
+    a, b = Scored(None, 1.0, 0.0), Scored(None, 0.0, 1.0)
+    assert pareto_front([a, b, Scored(None, 0.0, 0.0)]) == [a, b]
+
+
+def test_select_candidate_and_compromise():
+    features = CityFeatures(GRID)
+    compromise = Compromise(features)
+    assert len(compromise.cells) == 8 and 0 <= compromise.developer <= 1
+    assert compromise.reached(*objectives(features, compromise.cells), tolerance=0.0)
+
+    proposals = [Proposal(cells=NEAR, source="llm"), Proposal(cells=FAR, source="llm"),
+                 Proposal(cells=[], source="failed")]
+    chosen = select_candidate(features, proposals, compromise, "developer")
+    assert chosen.proposal in proposals[:2]
+    assert select_candidate(features, proposals[2:], compromise, "resident") is None
+
+
+def test_engine_renders_candidates_in_both_modes():
+    for mode in ("n", "gather"):
+        fake = FakeOpenAI(terminate_after=2)
+        engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False,
+                              candidates=4, candidate_mode=mode)
+        result = asyncio.run(engine.run(session_id="s", city_mode="procedural", seed=1))
+        assert result.terminated_by == "developer" and len(result.final_cells) == 8
+        renders = fake.calls["render"]
+        assert renders == (4 if mode == "n" else 16)
+        assert engine.renderer.stats.renders == 4
+        assert engine.renderer.stats.snapshot()["failure_rate"] == 0.0
+
+
+def test_compromise_tolerance_ends_negotiation_early():
+    fake = FakeOpenAI(terminate_after=3)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False, compromise_tolerance=1.0)
+    result = asyncio.run(engine.run(session_id="s", city_mode="procedural", seed=1))
+    assert result.terminated_by == "compromise" and result.rounds == 1
+
+
+def test_n_samples_are_cached_with_every_choice():
+    fake = FakeOpenAI()
+    cache = ResponseCache(None)
+    client = CachedClient(fake, cache, "read_through")
+    request = {"model": "m", "messages": [{"role": "system", "content": "generates housing proposals"}], "n": 3}
+    resp = asyncio.run(client.chat.completions.create(**request))
+    again = asyncio.run(client.chat.completions.create(**request))
+    assert cache.stats()["entries"] == 1 and sum(fake.calls.values()) == 1
+    assert [c.message.content for c in again.choices] == [c.message.content for c in resp.choices]
+    assert len(again.choices) == 3
@@ -0,0 +1,103 @@
+import asyncio
+
+from checkpoints import CheckpointStore
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from helpers import RecordingSink
+from llm_client import LLMClient
+
+
+def make_engine(fake, store):
+    return build_engine(client=LLMClient(fake, base_delay=0.001), stream=False, checkpoints=store)
+
+
+def test_interrupted_session_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = CheckpointStore(path)
+
+    def resident_down(request):
+        raise RuntimeError("dyno restarting")
+
+    first = make_engine(FakeOpenAI(script={"resident": resident_down}), store)
+    try:
+        asyncio.run(first.run(session_id="t1", city_mode="procedural", seed=4))
+    except RuntimeError:
+        pass
+    store.close()
+
+    store = CheckpointStore(path)
+    assert store.unfinished() == ["t1"]
+    fake, sink = FakeOpenAI(terminate_after=1), RecordingSink()
+    result = asyncio.run(make_engine(fake, store).run(sink=sink, session_id="t1", resume=True))
+
+    # City and the developer's first turn come from the checkpoint, not the model
+    assert "city_builder" not in fake.calls
+    assert fake.calls["developer"] == 1 and fake.calls["resident"] == 1
+    assert result.restored_stages == 2
+    assert sink.authors()[:3] == ["city_builder_agent", "Developer Agent", "Proposal_render_agent"]
+    assert result.terminated_by == "developer" and store.unfinished() == []
+
+
+def test_finished_session_replays_without_llm_calls():
+    store = CheckpointStore()
+    done = asyncio.run(make_engine(FakeOpenAI(), store).run(session_id="t2"))
+
+    fake, sink = FakeOpenAI(), RecordingSink()
+    again = asyncio.run(make_engine(fake, store).run(sink=sink, session_id="t2", resume=True))
+    assert fake.calls == {}
+    assert again.final_cells == done.final_cells
+    assert (again.rounds, again.terminated_by) == (done.rounds, done.terminated_by)
+    assert again.history == done.history
+    assert sink.authors().count("Proposal_render_agent") == 2 * (done.rounds - 1)
+
+
+def test_restores_hundreds_of_sessions_in_one_scan(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    store = CheckpointStore(path, batch_size=256)
+    engine = make_engine(FakeOpenAI(), store)
+
+    async def run_all(n):
+        return await asyncio.gather(*(engine.run(session_id=f"s{i:03}", city_mode="procedural", seed=i)
+                                      for i in range(n)))
+    results = asyncio.run(run_all(20))
+    # Copy the real records out to 500 sessions
+    recorded = store.load_many()
+    for i in range(20, 500):
+        source = recorded[f"s{i % 20:03}"]
+        store.append(f"s{i:03}", "city", source.city)
+        for record in source.stages:
+            store.append(f"s{i:03}", record["stage"], {k: v for k, v in record.items() if k not in ("stage", "created")})
+        store.append(f"s{i:03}", "done", source.done)
+    stats = store.stats()
+    assert stats["flushes"] < stats["writes"] / 4  # batched, not one commit per stage
+    store.close()
+
+    # Restore speed is measured in benchmarks/bench_checkpoints.py
+    store = CheckpointStore(path)
+    checkpoints = store.load_many()
+    assert len(checkpoints) == 500 and all(c.done is not None for c in checkpoints.values())
+    renders = [s for s in checkpoints["s027"].stages if s["stage"] == "render"]
+    assert renders[-1]["cells"] == results[7].final_cells
+
+    # A copied session resumes to the same outcome, each stage replayed once and none re-run
+    fake, sink = FakeOpenAI(), RecordingSink()
+    resumed = asyncio.run(make_engine(fake, store).run(sink=sink, session_id="s427", resume=True))
+    assert fake.calls == {} and resumed.restored_stages == len(checkpoints["s427"].stages)
+    assert (resumed.rounds, resumed.final_cells) == (results[7].rounds, results[7].final_cells)
+    replayed = [a for a in sink.authors() if a not in ("city_builder_agent", "telemetry")]
+    assert len(replayed) == len(checkpoints["s427"].stages)
+
+
+def test_finished_session_is_flushed_and_resume_skips_stages_the_chat_shows():
+    store = CheckpointStore(batch_size=1000, max_delay=3600)
+    asyncio.run(make_engine(FakeOpenAI(terminate_after=2), store).run(session_id="t3"))
+    assert store.stats()["pending"] == 0
+
+    checkpoint = store.load("t3")
+    cut = checkpoint.stages[1]["created"]  # the chat shows the city, the first turn and its render
+    sink = RecordingSink()
+    result = asyncio.run(make_engine(FakeOpenAI(), store).run(sink=sink, session_id="t3", resume=True,
+                                                              shown_until=cut))
+    replayed = [a for a in sink.authors() if a != "telemetry"]
+    assert len(replayed) == len(checkpoint.stages) - 2 and replayed[0].startswith("Resident Agent")
+    assert result.restored_stages == len(checkpoint.stages)
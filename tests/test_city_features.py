@@ -0,0 +1,37 @@
+import json
+import os
+
+from city_features import CityFeatures
+
+CITY = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "data", "example_city.json")
+
+
+def load_grid():
+    with open(CITY) as f:
+        return json.load(f)["grid"]
+
+
+def brute_distance(grid, codes, r, c):
+    return min(
+        (max(abs(r - rr), abs(c - cc)) for rr, row in enumerate(grid) for cc, v in enumerate(row) if v in codes),
+        default=len(grid) + len(grid[0]),
+    )
+
+
+def test_distance_fields_match_brute_force():
+    grid = load_grid()
+    features = CityFeatures(grid)
+    for r in range(len(grid)):
+        for c in range(len(grid[0])):
+            assert features.dist("water", r, c) == brute_distance(grid, (2,), r, c)
+            assert features.dist("houses", r, c) == brute_distance(grid, (3, 10), r, c)
+
+
+def test_rect_sum_and_buildable_blocks():
+    grid = load_grid()
+    features = CityFeatures(grid)
+    assert features.block_buildable(8, 15, 2, 4)
+    assert not features.block_buildable(4, 2, 2, 4)  # covers houses
+    assert not features.block_buildable(9, 18, 2, 4)  # off the map
+    expected = sum(features.dist("water", r, c) for r in range(2, 6) for c in range(3, 8))
+    assert features.rect_sum("water", 2, 3, 4, 5) == expected
@@ -0,0 +1,29 @@
+import pytest
+
+from city_generator import generate_city, validate_city
+
+
+def test_same_seed_same_map():
+    assert generate_city(10, 20, seed=7) == generate_city(10, 20, seed=7)
+    assert generate_city(10, 20, seed=7)["grid"] != generate_city(10, 20, seed=8)["grid"]
+
+
+@pytest.mark.parametrize("rows,cols", [(10, 20), (30, 12), (100, 200)])
+def test_generated_maps_follow_the_rules(rows, cols):
+    for seed in range(5):
+        grid = generate_city(rows, cols, seed)["grid"]
+        assert validate_city(grid, rows, cols) == []
+
+
+def test_validator_catches_broken_maps():
+    grid = generate_city(10, 20, seed=1)["grid"]
+    assert validate_city(grid[:9], rows=10, cols=20)
+
+    no_river = [[0 if v == 2 else v for v in row] for row in grid]
+    assert any("river" in e for e in validate_city(no_river))
+
+    bad_code = [row[:] for row in grid]
+    bad_code[0][0] = 7
+    assert validate_city(bad_code) == ["grid may only contain the codes 0, 1, 2, 3"]
+
+    assert validate_city("not a grid") == ["grid must be a non-empty list of rows"]
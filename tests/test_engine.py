@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from engine import build_engine
+from fake_openai import FakeOpenAI, role_of
+from helpers import RecordingSink
+from llm_client import LLMClient, current_session
+
+
+def run(fake, **kwargs):
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), **kwargs)
+    return asyncio.run(engine.run(session_id="s"))
+
+
+def test_offline_negotiation_runs_to_termination():
+    for stream in (True, False):
+        fake = FakeOpenAI(seed=1, terminate_after=2)
+        result = run(fake, stream=stream)
+        assert result.terminated_by == "developer"
+        assert result.rounds == 3
+        assert len(result.final_cells) == 8
+        assert result.tokens["calls"] == sum(fake.calls.values()) == 10
+        assert result.tokens["prompt_tokens"] > 0
+        json.dumps(result.to_dict())
+
+
+def test_engine_posts_to_its_sink():
+    sink = RecordingSink()
+    engine = build_engine(client=LLMClient(FakeOpenAI(terminate_after=1)), stream=False)
+    asyncio.run(engine.run(sink=sink, city_mode="procedural", seed=3))
+    assert sink.authors()[0] == "city_builder_agent"
+    assert sink.authors().count("Proposal_render_agent") == 2
+
+
+def test_injected_errors_are_retried():
+    fake = FakeOpenAI(seed=2, error_rate=0.3, error_status=503)
+    client = LLMClient(fake, base_delay=0.001, max_retries=20)
+    engine = build_engine(client=client, stream=False)
+    result = asyncio.run(engine.run(session_id="s"))
+    assert result.terminated_by == "developer"
+    assert fake.errors > 0 and client.stats()["retries"] == fake.errors
+
+
+def test_scripted_replies_and_determinism():
+    script = {"developer": ["Build near the river. TERMINATE"]}
+    result = run(FakeOpenAI(script=script), stream=False)
+    assert result.rounds == 1 and result.final_cells == []
+
+    first = run(FakeOpenAI(seed=7, jitter=0.001), stream=False)
+    second = run(FakeOpenAI(seed=7, jitter=0.001), stream=False)
+    assert first.final_cells == second.final_cells
+
+
+def test_concurrent_sessions_keep_their_own_reasoning_timings():
+    fake = FakeOpenAI(terminate_after=1)
+    create = fake.chat.completions.create
+    fast_done = asyncio.Event()
+
+    async def slow_for_one_session(**kwargs):
+        # The slow session's developer turn stays open until the fast session has finished
+        if current_session.get() == "slow" and role_of(kwargs["messages"]) == "developer":
+            await fast_done.wait()
+        return await create(**kwargs)
+
+    fake.chat.completions.create = slow_for_one_session
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False)
+
+    async def run_fast():
+        try:
+            return await engine.run(session_id="fast")
+        finally:
+            fast_done.set()
+
+    async def both():
+        return await asyncio.gather(engine.run(session_id="slow"), run_fast())
+
+    slow, fast = asyncio.run(both())
+    reasoning = lambda result: [t["total_s"] for t in result.timings if t["stage"] == "reasoning"]
+    # Every fast reasoning turn ran inside the slow session's first turn, so that turn is at least
+    # as long as all of them together (timings are rounded to 0.1ms)
+    assert reasoning(fast) and reasoning(slow)[0] >= sum(reasoning(fast)) - 0.001
+    assert not hasattr(engine.developer, "last_result")
+
+
+def test_failed_session_does_not_keep_its_token_usage():
+    def resident_down(request):
+        raise RuntimeError("resident unavailable")
+
+    client = LLMClient(FakeOpenAI(script={"resident": resident_down}), base_delay=0.001)
+    engine = build_engine(client=client, stream=False)
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.run(session_id="broken"))
+    assert "broken" not in client.usage
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from agents.developer_reasoning_agent import DeveloperReasoningAgent
+from city_generator import generate_city
+from fake_openai import FakeOpenAI
+import grid_codec
+from grid_codec import (CODECS, RleCodec, base_map_message, codec_for, get_codec,
+                        parse_base_map_message)
+from utils import EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS, apply_cells_as_new_houses
+
+GRID = generate_city(12, 24, seed=4)["grid"]
+PROPOSAL = apply_cells_as_new_houses(GRID, [[0, 0], [0, 1], [1, 0], [1, 1]])
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codecs_round_trip(name):
+    codec = get_codec(name)
+    assert codec.decode(codec.encode(GRID)) == GRID
+    assert codec.decode_proposal(GRID, codec.encode_proposal(GRID, PROPOSAL)) == PROPOSAL
+    assert parse_base_map_message(base_map_message(codec, GRID)["content"]) == GRID
+
+
+def test_rle_and_sparse_forms():
+    assert RleCodec().encode([[0, 0, 0, 2, 2, 1]]) == "3.2~F"
+    assert get_codec("sparse").encode_proposal(GRID, PROPOSAL) == {"new_houses": [[0, 0], [0, 1], [1, 0], [1, 1]]}
+
+
+def test_base_map_encoded_once_per_grid():
+    codec = get_codec("rows")
+    assert codec.encode_base(GRID) is codec.encode_base(GRID)
+
+
+def test_codec_per_model_is_the_cheapest_measured(monkeypatch):
+    _, count = grid_codec.token_counter("gpt-4o-mini")
+    proposal_grid = apply_cells_as_new_houses(EXAMPLE_GRID, EXAMPLE_PROPOSAL_CELLS)
+    tokens = {name: grid_codec.session_tokens(get_codec(name), EXAMPLE_GRID, proposal_grid,
+                                              grid_codec.MEASURE_ROUNDS, count) for name in CODECS}
+    picked = codec_for("gpt-4o-mini").name
+    assert tokens[picked] == min(tokens.values()) and tokens[picked] < tokens["json"]
+
+    monkeypatch.setitem(grid_codec.MODEL_CODECS, "gpt-4o-mini", "json")
+    assert codec_for("gpt-4o-mini").name == "json"
+    monkeypatch.setenv("GRID_CODEC", "rle")
+    assert codec_for("gpt-4o-mini").name == "rle"
+
+
+def test_reasoning_payload_sends_base_map_once_and_proposal_as_overlay():
+    seen = []
+    fake = FakeOpenAI()
+    create = fake.create
+
+    async def spy(**kwargs):
+        seen.append(kwargs)
+        return await create(**kwargs)
+
+    fake.chat.completions.create = spy
+    agent = DeveloperReasoningAgent(model="gpt-4o-mini", client=fake, stream=False)
+    asyncio.run(agent.reason(PROPOSAL, "", first_turn=False, base_grid=GRID))
+
+    system, static, base, history, payload = seen[0]["messages"]
+    assert "grid" not in json.loads(static["content"])
+    assert history["content"].startswith("Negotiation history:")
+    assert parse_base_map_message(base["content"]) == GRID
+    payload = json.loads(payload["content"])
+    assert "grid" not in payload
+    assert payload["proposal_grid"] == {"new_houses": [[0, 0], [0, 1], [1, 0], [1, 1]]}
+    assert "[[0, 0, 0" not in system["content"]
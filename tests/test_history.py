@@ -0,0 +1,51 @@
+import asyncio
+
+from history import NegotiationHistory, format_cells
+
+BLOCK = [[8, 15], [8, 16], [8, 17], [8, 18], [9, 15], [9, 16], [9, 17], [9, 18]]
+
+
+def test_cells_render_as_rectangles():
+    assert format_cells(BLOCK) == "rows 8-9, cols 15-18"
+    assert format_cells([[0, 0], [2, 2]]) == "(0,0) (2,2)"
+
+
+def test_render_has_no_grids():
+    history = NegotiationHistory()
+    history.add(0, "developer", "Build by the river. I recommend the bottom right.")
+    history.set_cells(BLOCK)
+    text = history.render()
+    assert "Round 0 developer" in text
+    assert "rows 8-9, cols 15-18" in text
+    assert "[[" not in text
+
+
+def test_compact_stays_within_budget_and_keeps_recent():
+    history = NegotiationHistory(token_budget=150, keep_recent=2)
+
+    async def run():
+        for round_no in range(10):
+            for speaker in ("developer", "resident"):
+                history.add(round_no, speaker, "Some long argument about views and access. " * 5
+                            + f"We propose option {round_no}.")
+                history.set_cells(BLOCK)
+                await history.compact()
+                assert history.tokens() <= 150 or len(history.records) <= 2
+
+    asyncio.run(run())
+    assert [r.round_no for r in history.records] == [9, 9]
+    assert "option 8" in history.summary
+
+
+def test_async_summarizer_and_round_trip():
+    async def summarize(previous, records):
+        return f"{len(records)} older rounds"
+
+    history = NegotiationHistory(token_budget=10, keep_recent=1, summarizer=summarize)
+    history.add(0, "developer", "a" * 100)
+    history.add(0, "resident", "b" * 100)
+    asyncio.run(history.compact())
+    assert history.summary == "1 older rounds"
+
+    restored = NegotiationHistory.from_dict(history.to_dict())
+    assert restored.render() == history.render()
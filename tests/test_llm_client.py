@@ -0,0 +1,226 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_client import LLMClient, TokenBucket, _pooled_openai_client, _retry_after, current_session
+from streaming import stream_chat
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubCompletions:
+    """Stands in for the OpenAI endpoint: records concurrency, fails on demand."""
+
+    def __init__(self, latency=0.01, failures=()):
+        self.latency = latency
+        self.failures = list(failures)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.failures:
+                status = self.failures.pop(0)
+                if status:
+                    raise StatusError(status)
+            return SimpleNamespace(session=kwargs.get("tag"))
+        finally:
+            self.in_flight -= 1
+
+
+def stub_client(**kwargs):
+    stub = StubCompletions(**kwargs)
+    return stub, SimpleNamespace(chat=SimpleNamespace(completions=stub))
+
+
+def test_retries_429_and_5xx_then_succeeds():
+    stub, backend = stub_client(failures=[429, 503, None])
+    client = LLMClient(backend, base_delay=0.001)
+    asyncio.run(client.chat.completions.create(model="m"))
+    assert len(stub.calls) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    stub, backend = stub_client(failures=[400])
+    client = LLMClient(backend, base_delay=0.001)
+    with pytest.raises(StatusError):
+        asyncio.run(client.chat.completions.create(model="m"))
+    assert len(stub.calls) == 1
+    assert client.stats()["errors"] == 1
+
+
+def test_global_and_per_model_budgets():
+    stub, backend = stub_client()
+    client = LLMClient(backend, max_concurrency=4, per_model={"small": 2})
+
+    async def run():
+        await asyncio.gather(*(client.create(model="small") for _ in range(10)))
+        assert stub.max_in_flight == 2
+        stub.max_in_flight = 0
+        await asyncio.gather(*(client.create(model="big") for _ in range(10)))
+        assert stub.max_in_flight == 4
+
+    asyncio.run(run())
+    assert client.stats()["max_queue_depth"] > 0
+
+
+def test_sessions_are_served_round_robin():
+    stub, backend = stub_client(latency=0.005)
+    client = LLMClient(backend, max_concurrency=1)
+    order = []
+
+    async def call(session, tag):
+        current_session.set(session)
+        await client.create(model="m", tag=tag)
+        order.append(session)
+
+    async def run():
+        # Session "busy" queues 6 calls before "quiet" asks for one
+        busy = [asyncio.create_task(call("busy", i)) for i in range(6)]
+        await asyncio.sleep(0)
+        quiet = asyncio.create_task(call("quiet", 0))
+        await asyncio.gather(*busy, quiet)
+
+    asyncio.run(run())
+    assert order.index("quiet") <= 2
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(run()) >= 0.04
+
+
+def test_streamed_responses_hold_their_slot_until_closed():
+    class Stream:
+        async def __aiter__(self):
+            yield "a"
+            yield "b"
+
+        async def close(self):
+            pass
+
+    async def create(**kwargs):
+        return Stream()
+
+    client = LLMClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    async def run():
+        stream = await client.create(model="m", stream=True)
+        assert client.scheduler.active == 1
+        async for _ in stream:
+            break
+        await stream.close()
+        assert client.scheduler.active == 0
+
+    asyncio.run(run())
+
+
+# Through the real SDK: AsyncOpenAI + httpx, with the HTTP exchange served by a MockTransport
+
+def completion(content):
+    return {"id": "c1", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6}}
+
+
+def sse(*chunks):
+    events = [{"id": "c2", "object": "chat.completion.chunk", "created": 0, "model": "m", **chunk} for chunk in chunks]
+    return "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+
+
+def mock_openai(monkeypatch, responses):
+    """A pooled SDK client whose requests are answered, in order, by `responses`."""
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return responses.pop(0)(httpx)
+
+    return _pooled_openai_client(4, transport=httpx.MockTransport(handler)), requests
+
+
+def rate_limited(httpx):
+    return httpx.Response(429, headers={"retry-after": "0.01"},
+                          json={"error": {"message": "slow down", "type": "rate_limit_exceeded"}})
+
+
+def test_sdk_rate_limit_is_retried_by_us_after_retry_after(monkeypatch):
+    sdk, requests = mock_openai(monkeypatch, [rate_limited, lambda httpx: httpx.Response(200, json=completion("hi"))])
+    client = LLMClient(sdk, base_delay=5.0)  # only the Retry-After hint keeps this fast
+
+    async def call():
+        current_session.set("s")
+        return await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "x"}])
+
+    start = time.monotonic()
+    resp = asyncio.run(call())
+    assert resp.choices[0].message.content == "hi"
+    assert 0.01 <= time.monotonic() - start < 1.0
+    # max_retries=0: the SDK made one attempt per call and the retry was ours
+    assert len(requests) == 2 and client.stats()["retries"] == 1
+    assert requests[0].url.path == "/v1/chat/completions"
+    assert client.pop_usage("s")["prompt_tokens"] == 5
+
+
+def test_retry_after_reads_the_sdk_error(monkeypatch):
+    from openai import RateLimitError
+    sdk, _ = mock_openai(monkeypatch, [rate_limited])
+    with pytest.raises(RateLimitError) as caught:
+        asyncio.run(sdk.chat.completions.create(model="m", messages=[]))
+    assert caught.value.status_code == 429 and _retry_after(caught.value) == 0.01
+    assert sdk.max_retries == 0
+
+
+def test_pooled_sdk_client_settings(monkeypatch):
+    pytest.importorskip("openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    sdk = LLMClient(max_concurrency=3).client
+    pool = sdk._client._transport._pool  # httpx's connection pool
+    assert sdk.max_retries == 0
+    assert pool._max_connections == 3 and pool._max_keepalive_connections == 3
+
+
+def test_sdk_stream_through_the_client(monkeypatch):
+    body = sse({"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Hel"}, "finish_reason": None}]},
+               {"choices": [{"index": 0, "delta": {"content": "lo"}, "finish_reason": "stop"}]},
+               {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2, "total_tokens": 9}})
+    sdk, requests = mock_openai(monkeypatch, [
+        lambda httpx: httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body.encode())])
+    client = LLMClient(sdk, base_delay=0.001)
+    tokens = []
+
+    async def on_token(token):
+        tokens.append(token)
+
+    async def call():
+        current_session.set("s")
+        return await stream_chat(client, on_token, model="m", messages=[{"role": "user", "content": "x"}])
+
+    result = asyncio.run(call())
+    assert tokens == ["Hel", "lo"] and result.text == "Hello" and result.ttft is not None
+    assert json.loads(requests[0].content)["stream"] is True
+    assert client.pop_usage("s")["completion_tokens"] == 2
+    assert client.scheduler.active == 0  # slot released once the stream finished
@@ -0,0 +1,76 @@
+import asyncio
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from agents.city_builder_agent import CityBuilderAgent
+from city_generator import generate_city
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from helpers import RecordingSink
+from llm_client import LLMClient
+from map_render import MapView, grid_svg
+from utils import EMOJI, apply_cells_as_new_houses, numbers_to_emojis
+
+
+def block(r, c):
+    return [[r + i, c + j] for i in range(2) for j in range(4)]
+
+
+def test_proposals_show_only_the_cells_around_them():
+    grid = generate_city(40, 80, seed=3)["grid"]
+    view, sink = MapView(grid, mode="emoji"), RecordingSink()
+    asyncio.run(view.show_base(sink, "city"))
+    assert sink.messages[0][1] == numbers_to_emojis(grid)
+
+    asyncio.run(view.show_proposal(sink, "render", block(10, 20)))
+    first = sink.messages[-1][1]
+    header, window = first.split(":\n")
+    assert header == "New houses at rows 10–11, cols 20–23. Map rows 8–13, cols 18–25"
+    assert window.count(EMOJI[10]) == 8 and len(window.split("\n")) == 6
+    assert len(first.encode()) < len(numbers_to_emojis(grid).encode()) / 20
+
+    asyncio.run(view.show_proposal(sink, "render", block(10, 20)))
+    assert sink.messages[-1][1].startswith("Same 8 cells")
+    asyncio.run(view.show_proposal(sink, "render", block(11, 20)))
+    assert sink.messages[-1][1].startswith("New houses at rows 11–12, cols 20–23 (4 kept)")
+    asyncio.run(view.show_proposal(sink, "render", block(30, 60)))
+    assert "moved from rows 11–12, cols 20–23" in sink.messages[-1][1]
+    assert view.messages == 5 and view.bytes_sent == sum(len(m.encode()) for _, m in sink.messages)
+
+
+def test_full_mode_keeps_whole_maps_and_unknown_modes_fail():
+    grid = generate_city(seed=1)["grid"]
+    view, sink = MapView(grid, mode="full"), RecordingSink()
+    asyncio.run(view.show_proposal(sink, "render", block(0, 0)))
+    assert sink.messages[0][1] == numbers_to_emojis(apply_cells_as_new_houses(grid, block(0, 0)))
+    with pytest.raises(ValueError):
+        MapView(grid, mode="png")
+
+
+def test_large_bases_go_out_as_svg():
+    grid = generate_city(100, 200, seed=2)["grid"]
+    assert not MapView(generate_city(seed=2)["grid"]).svg and MapView(grid).svg
+    svg = grid_svg(grid)
+    root = ET.fromstring(svg)
+    assert root.get("viewBox") == "0 0 200 100"
+    assert len(svg.encode()) < len(numbers_to_emojis(grid).encode()) / 4
+
+    sink = RecordingSink()
+    asyncio.run(MapView(grid).show_base(sink, "city"))
+    assert sink.messages == [] and sink.images[0][1:] == ("city.svg", svg.encode(), "image/svg+xml")
+
+
+def test_engine_sends_base_once_then_diffs():
+    fake = FakeOpenAI(terminate_after=3)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False)
+    engine.agents.add("city_builder", CityBuilderAgent(client=engine.client, rows=30, cols=60))
+    sink = RecordingSink()
+    result = asyncio.run(engine.run(sink=sink, session_id="m", city_mode="procedural", seed=5))
+
+    maps = [content for author, content in sink.messages if author == "Proposal_render_agent"]
+    assert len(maps) >= 2 and all(len(m) < 30 * 60 for m in maps)
+    assert sink.statuses[-1].startswith("✅ Negotiation finished")
+    last = maps[-1]
+    if not last.startswith("Same"):
+        assert last.split(":\n")[1].count(EMOJI[10]) == len(result.final_cells) == 8
@@ -0,0 +1,41 @@
+from city_features import CityFeatures
+from placement import LocalPlacementEngine, enumerate_blocks, parse_intent
+
+GRID = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 3, 3, 0, 0, 1, 1, 2, 2],
+    [0, 0, 3, 3, 0, 0, 1, 1, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
+
+
+def test_blocks_only_on_grass():
+    for r, c, h, w in enumerate_blocks(CityFeatures(GRID)):
+        assert h * w == 8
+        assert all(GRID[r + i][c + j] == 0 for i in range(h) for j in range(w))
+
+
+def test_parse_intent_near_and_far():
+    dev = parse_intent("I recommend building close to the existing houses, next to the river.")
+    assert dev.houses > 0 and dev.water > 0
+    res = parse_intent("The houses are too close to existing houses. Put them in the top left corner.")
+    assert res.houses < 0
+    assert res.row_bias < 0 and res.col_bias < 0
+
+
+def test_ambiguous_text_returns_none():
+    engine = LocalPlacementEngine()
+    assert engine.propose(GRID, "Please be sensible.") is None
+    assert engine.propose(GRID, "Please be sensible.", allow_ambiguous=True) is not None
+
+
+def test_far_from_houses_beats_near():
+    engine = LocalPlacementEngine()
+    near = engine.propose(GRID, "Build right next to the existing houses.")
+    far = engine.propose(GRID, "Keep the block far from the existing houses.")
+    assert len(near) == 8 and len(far) == 8
+    houses = [(r, c) for r, row in enumerate(GRID) for c, v in enumerate(row) if v == 3]
+    dist = lambda cells: sum(min(max(abs(r - hr), abs(c - hc)) for hr, hc in houses) for r, c in cells)
+    assert dist(near) < dist(far)
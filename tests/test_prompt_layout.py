@@ -0,0 +1,70 @@
+import asyncio
+from collections import defaultdict
+
+from engine import build_engine
+from fake_openai import ROLES, FakeOpenAI
+from llm_client import LLMClient
+from prompt_layout import PromptLayout
+
+
+def role_of(messages):
+    system = messages[0]["content"]
+    return next(role for role, marker in ROLES.items() if marker in system)
+
+
+def record_calls(fake):
+    calls = []
+    create = fake.chat.completions.create
+
+    async def spy(**kwargs):
+        calls.append(kwargs["messages"])
+        return await create(**kwargs)
+
+    fake.chat.completions.create = spy
+    return calls
+
+
+def test_layout_puts_volatile_parts_after_the_prefix():
+    layout = PromptLayout("sys", {"b": 1, "a": 2}, base={"role": "user", "content": "Base city map:\n.."},
+                          history="Round 1 developer: hi", current={"proposal_grid": {"new_houses": []}})
+    messages = layout.messages()
+    assert messages[:3] == layout.prefix()
+    assert messages[1]["content"] == '{"a": 2, "b": 1}'
+    assert messages[3]["content"].startswith("Negotiation history:")
+    assert "proposal_grid" in messages[4]["content"]
+
+
+def test_prefix_is_byte_identical_across_rounds_and_sessions():
+    fake = FakeOpenAI(terminate_after=3, cache_min_tokens=0)
+    calls = record_calls(fake)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False)
+    by_session = []
+    for seed in (1, 2):
+        del calls[:]
+        asyncio.run(engine.run(city_mode="procedural", seed=seed, session_id=f"s{seed}"))
+        by_role = defaultdict(list)
+        for messages in calls:
+            by_role[role_of(messages)].append(messages)
+        by_session.append(by_role)
+
+    for role in ("developer", "resident", "render"):
+        sessions = [by_role[role] for by_role in by_session]
+        assert all(len(calls) >= 2 for calls in sessions)
+        # system prompt + legend/constraints: the same bytes for every call of the agent, in every session
+        static = {(m[0]["content"], m[1]["content"]) for calls in sessions for m in calls}
+        assert len(static) == 1, role
+        # base city: the same bytes for every round of a session
+        for calls in sessions:
+            assert len({m[2]["content"] for m in calls}) == 1, role
+            assert calls[0][2]["content"].startswith("Base city map")
+            assert all("Base city map" not in m["content"] for messages in calls for m in messages[3:])
+        assert sessions[0][0][2] != sessions[1][0][2]
+
+
+def test_repeated_prefix_is_reported_as_cached_tokens():
+    fake = FakeOpenAI(terminate_after=2, cache_min_tokens=0)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001), stream=False)
+    result = asyncio.run(engine.run(session_id="s"))
+    assert 0 < result.tokens["cached_tokens"] < result.tokens["prompt_tokens"]
+    stages = result.telemetry["stages"]
+    assert stages["reasoning:developer"]["cached_tokens"] > 0
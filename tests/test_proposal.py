@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from agents.render_proposal_agent import RenderProposalAgent
+from city_features import CityFeatures
+from fake_openai import FakeOpenAI
+from proposal import parse_cells, repair_cells, validate_cells
+
+GRID = [
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 2, 2],
+    [0, 0, 3, 3, 0, 0, 1, 1, 2, 2],
+    [0, 0, 3, 3, 0, 0, 1, 1, 2, 2],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+]
+BLOCK = [[0, c] for c in range(4)] + [[1, c] for c in range(4)]
+
+
+def reply(cells):
+    return json.dumps({"cells": [{"row": r, "col": c} for r, c in cells], "justification": "x"})
+
+
+def render(script, max_reasks=1):
+    fake = FakeOpenAI(script={"render": script})
+    agent = RenderProposalAgent(model="m", client=fake, max_reasks=max_reasks)
+    return asyncio.run(agent.render_proposal(GRID, "top left")), agent, fake
+
+
+def test_validate_catches_terrain_duplicates_and_gaps():
+    features = CityFeatures(GRID)
+    assert validate_cells(features, BLOCK) == []
+    assert any("not buildable" in e for e in validate_cells(features, BLOCK[:7] + [[3, 2]]))
+    assert any("unique" in e for e in validate_cells(features, BLOCK[:7] + [[0, 0]]))
+    assert any("contiguous" in e for e in validate_cells(features, BLOCK[:7] + [[5, 9]]))
+    assert any("exactly 8" in e for e in validate_cells(features, BLOCK[:5]))
+
+
+def test_parse_accepts_schema_and_legacy_pairs():
+    assert parse_cells(json.loads(reply(BLOCK))) == BLOCK
+    assert parse_cells({"cells": BLOCK}) == BLOCK
+    assert parse_cells({"cells": [["a", 1], {"row": 2}]}) == []
+
+
+def test_repair_snaps_to_nearest_valid_block():
+    features = CityFeatures(GRID)
+    # One cell lands on an existing house: keep as much of the proposal as possible
+    cells = [[r, c] for r in (3, 4) for c in (0, 1, 2, 3)]
+    repaired = repair_cells(features, cells)
+    assert validate_cells(features, repaired) == []
+    assert len({tuple(rc) for rc in repaired} & {tuple(rc) for rc in cells}) >= 4
+    assert repair_cells(features, [[50, 50]]) is None
+
+
+def test_invalid_cells_are_repaired_without_reasking():
+    proposal, agent, fake = render([reply(BLOCK[:7] + [[3, 2]])])
+    assert proposal.ok and proposal.source == "repaired" and proposal.reasks == 0
+    assert fake.calls["render"] == 1
+    assert agent.stats.snapshot()["repair_rate"] == 1.0
+
+
+def test_unusable_reply_is_reasked_then_gives_up():
+    proposal, agent, fake = render(["not json", reply(BLOCK)])
+    assert proposal.ok and proposal.source == "llm" and proposal.reasks == 1
+
+    proposal, agent, fake = render(["{}"], max_reasks=2)
+    assert not proposal.ok and proposal.grid is None
+    assert fake.calls["render"] == 3
+    assert agent.stats.snapshot()["failure_rate"] == 1.0
+
+
+def test_valid_renders_are_not_counted_as_failed():
+    fake = FakeOpenAI(script={"render": [reply(BLOCK)] * 3})
+    agent = RenderProposalAgent(model="m", client=fake)
+
+    async def run():
+        return [await agent.render_proposal(GRID, "top left") for _ in range(3)]
+
+    assert all(p.ok for p in asyncio.run(run()))
+    snapshot = agent.stats.snapshot()
+    assert snapshot["renders"] == 3 and snapshot["failure_rate"] == 0.0 and snapshot["repair_rate"] == 0.0
+    assert agent.stats.valid == 3
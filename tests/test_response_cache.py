@@ -0,0 +1,151 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agents.city_builder_agent import CityBuilderAgent
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+from streaming import stream_chat
+from response_cache import CacheMiss, CachedClient, ResponseCache, cache_key, parse_policy
+
+REQUEST = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.2}
+
+
+class Offline:
+    """A backend that fails the test if anything reaches it."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        raise AssertionError("network call in replay mode")
+
+
+def test_key_covers_sampling_params_but_not_transport():
+    assert cache_key(REQUEST) == cache_key({**REQUEST, "stream": True, "timeout": 5})
+    assert cache_key(REQUEST) != cache_key({**REQUEST, "temperature": 1})
+    assert cache_key(REQUEST) != cache_key({**REQUEST, "model": "other"})
+
+
+def test_lru_eviction_falls_back_to_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=2)
+    for i in range(3):
+        cache.put(f"k{i}", "m", f"reply {i}")
+    assert list(cache.entries) == ["k1", "k2"]
+    assert cache.get("k0")["content"] == "reply 0"
+    cache.close()
+    assert ResponseCache(path).get("k2")["content"] == "reply 2"
+
+
+def test_read_through_serves_repeats_from_cache():
+    fake = FakeOpenAI(script={"unknown": ["one", "two"]})
+    cache = ResponseCache()
+    client = CachedClient(fake, cache, "read_through")
+
+    async def run():
+        return [(await client.create(**REQUEST)).choices[0].message.content for _ in range(3)]
+
+    assert asyncio.run(run()) == ["one"] * 3
+    assert fake.calls["unknown"] == 1
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    assert stats["bytes_saved"] > 0 and stats["tokens_saved"] > 0
+
+
+def test_recorded_negotiation_replays_without_network(tmp_path):
+    path = str(tmp_path / "run.sqlite")
+    for stream in (False, True):
+        recorder = ResponseCache(path)
+        engine = build_engine(client=LLMClient(FakeOpenAI(seed=5)), stream=stream,
+                              cache=recorder, cache_policy=parse_policy("record"))
+        recorded = asyncio.run(engine.run(session_id="rec"))
+        recorder.close()
+
+        replayer = ResponseCache(path)
+        engine = build_engine(client=LLMClient(Offline()), stream=stream,
+                              cache=replayer, cache_policy=parse_policy("replay"))
+        replayed = asyncio.run(engine.run(session_id="rep"))
+        assert replayed.final_cells == recorded.final_cells
+        assert replayed.rounds == recorded.rounds
+        assert replayer.stats()["misses"] == 0
+
+
+class Chunks:
+    """A backend streaming fixed chunks, optionally failing after them."""
+
+    def __init__(self, parts, error=None):
+        self.parts, self.error = parts, error
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        async def stream():
+            for part in self.parts:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+            if self.error is not None:
+                raise self.error
+        return stream()
+
+
+async def _noop(token):
+    pass
+
+
+def test_failed_stream_is_not_stored():
+    cache = ResponseCache()
+    client = CachedClient(Chunks(["partial "], ConnectionError("reset")), cache, "read_through")
+    with pytest.raises(ConnectionError):
+        asyncio.run(stream_chat(client, _noop, **REQUEST))
+    assert cache.get(cache_key(REQUEST)) is None and not cache.entries
+
+
+def test_stream_cut_at_terminate_is_stored():
+    cache = ResponseCache()
+    client = CachedClient(Chunks(["ok ", "TERMINATE", " never read"]), cache, "record")
+    result = asyncio.run(stream_chat(client, _noop, **REQUEST))
+    assert result.terminated
+    assert cache.get(cache_key(REQUEST))["content"] == "ok TERMINATE"
+
+
+def test_replay_miss_raises():
+    client = CachedClient(Offline(), ResponseCache(), "replay")
+    with pytest.raises(CacheMiss):
+        asyncio.run(client.create(**REQUEST))
+
+
+def test_speculative_candidates_replay_every_choice(tmp_path):
+    path = str(tmp_path / "run.sqlite")
+    options = dict(stream=False, candidates=3, candidate_mode="n")
+    recorder = ResponseCache(path)
+    engine = build_engine(client=LLMClient(FakeOpenAI(seed=5)), cache=recorder,
+                          cache_policy=parse_policy("record"), **options)
+    recorded = asyncio.run(engine.run(session_id="rec"))
+    recorder.close()
+
+    replayer = ResponseCache(path)
+    engine = build_engine(client=LLMClient(Offline()), cache=replayer,
+                          cache_policy=parse_policy("replay"), **options)
+    replayed = asyncio.run(engine.run(session_id="rep"))
+    assert replayed.final_cells == recorded.final_cells
+    assert replayer.stats()["misses"] == 0
+
+    client = CachedClient(Offline(), ResponseCache(), "replay")
+    with pytest.raises(CacheMiss):
+        asyncio.run(client.create(**REQUEST, n=3))
+
+
+def test_city_builder_does_not_hide_a_replay_miss():
+    builder = CityBuilderAgent(client=CachedClient(Offline(), ResponseCache(), "replay"))
+    with pytest.raises(CacheMiss):
+        asyncio.run(builder.build_city_json(mode="llm"))
+
+
+def test_policy_spec():
+    assert set(parse_policy("replay").values()) == {"replay"}
+    assert parse_policy("developer=record")["developer"] == "record"
+    assert parse_policy(None)["render"] == "read_through"
+    with pytest.raises(ValueError):
+        parse_policy("render=sometimes")
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from llm_client import LLMClient
+from registry import AgentRegistry
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# Loaded on the first model call or span, never at import (timings: benchmarks/bench_startup.py)
+HEAVY = ("openai", "httpx", "opentelemetry")
+
+
+def loaded_after(code):
+    """Which of `modules` (defined by `code`) a fresh interpreter has loaded once `code` has run."""
+    out = subprocess.run([sys.executable, "-c", code + "\nimport sys\n"
+                          "print(sorted(m for m in modules if m in sys.modules))"],
+                         env={**os.environ, "PYTHONPATH": SRC}, capture_output=True, text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def test_cold_start_loads_no_sdk_and_builds_no_agent():
+    code = ("import utils, grid_codec, engine\n"
+            "e = engine.build_engine()\n"
+            "assert e.agents.built() == []\n"
+            f"modules = {HEAVY + ('chainlit', 'sqlite3', 'agents')!r}")
+    assert loaded_after(code) == "[]"
+
+
+def test_importing_the_app_loads_no_sdk():
+    pytest.importorskip("chainlit")
+    assert loaded_after(f"import main\nmodules = {HEAVY!r}") == "[]"
+
+
+def test_agents_are_built_once_on_first_use_and_shared():
+    built = []
+    registry = AgentRegistry({"developer": lambda: built.append("developer") or object()})
+    assert registry.built() == []
+    assert registry.get("developer") is registry.get("developer")
+    assert built == ["developer"] and registry.built() == ["developer"]
+    with pytest.raises(KeyError):
+        registry.get("resident")
+
+    engine = build_engine(client=LLMClient(FakeOpenAI(), base_delay=0.001), stream=False)
+    assert engine.agents.built() == []
+    renderer = engine.renderer
+    assert engine.agents.built() == ["renderer"] and engine.renderer is renderer
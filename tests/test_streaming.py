@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+from streaming import complete_chat, stream_chat
+
+
+def chunk(text=None, usage=None):
+    choices = [] if text is None else [SimpleNamespace(delta=SimpleNamespace(content=text))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class StubStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        for c in self.chunks:
+            self.sent += 1
+            yield c
+
+    async def close(self):
+        self.closed = True
+
+
+def stub_client(stream):
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_tokens_are_forwarded_and_timed():
+    stream = StubStream([chunk("We "), chunk("agree."), chunk(usage={"completion_tokens": 2})])
+    seen = []
+
+    async def on_token(token):
+        seen.append(token)
+
+    result = asyncio.run(stream_chat(stub_client(stream), on_token, model="m", messages=[]))
+    assert seen == ["We ", "agree."]
+    assert result.text == "We agree."
+    assert result.ttft is not None and result.ttft <= result.total
+    assert result.usage == {"completion_tokens": 2}
+    assert not result.terminated
+
+
+def test_stream_is_cut_at_terminate_marker_split_across_chunks():
+    stream = StubStream([chunk("Fine. {TERM"), chunk("INATE NEGOTIATION]"), chunk(" and more"), chunk(" text")])
+
+    async def on_token(token):
+        pass
+
+    result = asyncio.run(stream_chat(stub_client(stream), on_token, model="m", messages=[]))
+    assert result.terminated
+    assert "TERMINATE" in result.text
+    assert stream.sent == 2 and stream.closed
+
+
+def test_complete_chat_shape():
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="TERMINATE"))], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    result = asyncio.run(complete_chat(client, model="m", messages=[]))
+    assert result.terminated and result.ttft is None
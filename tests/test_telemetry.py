@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import types
+
+from engine import build_engine
+from fake_openai import FakeOpenAI
+from helpers import RecordingSink
+from llm_client import LLMClient
+import telemetry
+from telemetry import SessionTelemetry, aggregate, current_telemetry, span
+
+
+def test_inner_spans_inherit_round_and_role():
+    telemetry = SessionTelemetry("s")
+    current_telemetry.set(telemetry)
+    with span("render", round=3, role="render"):
+        with span("parse") as inner:
+            pass
+    current_telemetry.set(None)
+    assert inner.attrs == {"round": 3, "role": "render"}
+    assert [r["name"] for r in telemetry.records] == ["parse", "render"]
+
+
+def test_negotiation_summary_has_every_stage_with_tokens_and_retries():
+    fake = FakeOpenAI(seed=3, error_rate=0.2, error_status=503)
+    engine = build_engine(client=LLMClient(fake, base_delay=0.001, max_retries=20), stream=False)
+    sink = RecordingSink()
+    result = asyncio.run(engine.run(sink=sink, session_id="s"))
+
+    stages = result.telemetry["stages"]
+    for key in ("city_build:city_builder", "parse:city_builder", "validate:city_builder",
+                "reasoning:developer", "reasoning:resident", "render", "parse:render",
+                "validate:render", "emoji_render:render"):
+        assert key in stages, key
+    assert stages["reasoning:developer"]["count"] == result.rounds
+    assert stages["reasoning:developer"]["prompt_tokens"] > 0
+    assert sum(s["retries"] for s in stages.values()) == fake.errors > 0
+    assert result.telemetry["slowest_stage"] in stages
+    assert "Slowest stage" in dict(sink.messages)["telemetry"]
+    assert aggregate.snapshot()["reasoning:developer"]["count"] >= result.rounds
+
+
+def test_otel_api_without_the_sdk_keeps_spans_local(monkeypatch):
+    class ProxyTracerProvider:
+        pass
+
+    api = types.ModuleType("opentelemetry")
+    api.trace = types.SimpleNamespace(get_tracer_provider=ProxyTracerProvider)
+    monkeypatch.setitem(sys.modules, "opentelemetry", api)
+    monkeypatch.setitem(sys.modules, "opentelemetry.sdk", None)  # not installed
+    monkeypatch.setenv("TELEMETRY_EXPORTER", "console")
+    monkeypatch.setattr(telemetry, "_tracer", None)
+    monkeypatch.setattr(telemetry, "_tracer_ready", False)
+
+    with span("render") as s:
+        s.set(cells=8)
+    assert telemetry._tracer is None and s.otel_span is None and s.attrs == {"cells": 8}